@@ -12,12 +12,15 @@
 #   on the more expensive one, staying net zero.
 #
 # - A predictive flow factor lowers the threshold 
-#   if one side’s order size jumps quickly.
+#   when either venue shows strong order-flow 
+#   imbalance or its top-of-book queue is draining.
 #
 # - It automatically stops after tick 299 and 
 #   closes positions.
 ########################################################
 
+import os
+import sys
 import requests
 import signal
 import time
@@ -25,12 +28,28 @@ import statistics
 import threading
 from collections import deque
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Tools'))
+from recorder import SessionRecorder
+from latency import LatencyMonitor
+from mdhub import MarketDataClient
+from fastjson import decode_book, decode_securities
+from orderbook import OrderBook
+from flow import OrderFlow
+from asynclog import get_logger
+
 ########################################################
 # API
 ########################################################
 API_KEY = {'X-API-Key': 'QDSFW62B'}
+RECORD_DIR = 'recordings'   # set to None to disable session recording
+LATENCY_STATS = True        # set to False to disable API latency instrumentation
+LOG_DIR = 'logs'            # set to None to log to the console only
+LOG_LEVELS = {}             # per-category levels, e.g. {'orders': asynclog.WARNING}
+MARKET_DATA_HUB = None      # e.g. ('localhost', 9998) to read market data from mdhub.py
 shutdown = False
 
+log = get_logger('arbitrage')
+
 class ApiException(Exception):
     pass
 
@@ -41,6 +60,17 @@ def signal_handler(signum, frame):
 
 signal.signal(signal.SIGINT, signal_handler)
 
+########################################################
+# Parameters
+########################################################
+BASE_CROSS = 0.01       # cross needed before volatility/time adjustments
+FLOW_SCALE = 5000       # order-flow pressure (shares) that maxes out the flow factor
+DEPLETION_HORIZON = 0.35  # seconds of top-of-book queue depletion counted as pressure
+ROLLING_WINDOW = 5      # recent bids/asks kept for the volatility estimate
+
+ORDER_BOOKS = {}        # ticker -> OrderBook, updated in place each loop
+ORDER_FLOW = {}         # ticker -> OrderFlow features, updated from each new book
+
 ########################################################
 # Helper functions
 ########################################################
@@ -51,19 +81,23 @@ def get_tick(session):
     return resp.json()['tick']
 
 def get_order_book(session, ticker):
+    """The ticker's OrderBook, moved to the latest snapshot."""
     resp = session.get(f'http://localhost:9999/v1/securities/book', 
                        params={'ticker': ticker})
     if not resp.ok:
         raise ApiException(f"Error fetching book for {ticker}")
-    return resp.json()
+    book = ORDER_BOOKS.get(ticker)
+    if book is None:
+        book = ORDER_BOOKS[ticker] = OrderBook(ticker)
+    return book.apply(decode_book(resp))
 
 def get_position(session, ticker):
     resp = session.get('http://localhost:9999/v1/securities')
     if not resp.ok:
         raise ApiException("Error fetching positions")
-    for security in resp.json():
-        if security['ticker'] == ticker:
-            return security['position']
+    security = decode_securities(resp).get(ticker)
+    if security is not None:
+        return security.position
     return 0
 
 def submit_market_order(session, ticker, action, quantity):
@@ -83,7 +117,7 @@ def submit_market_order(session, ticker, action, quantity):
         resp = session.post('http://localhost:9999/v1/orders', params=order)
         if not resp.ok:
             raise ApiException(f"Failed to submit {action} MARKET order on {ticker}")
-        print(f"Placed {action} MARKET order: {trade_size} shares of {ticker}")
+        log.info('orders', "Placed {} MARKET order: {} shares of {}", action, trade_size, ticker)
         shares_left -= trade_size
 
 def submit_market_orders_pair(session, ticker_buy, ticker_sell, 
@@ -135,27 +169,28 @@ def _submit_single_market_chunk(session, ticker, action, quantity):
     resp = session.post('http://localhost:9999/v1/orders', params=order)
     if not resp.ok:
         raise ApiException(f"Failed to submit {action} MARKET order on {ticker}")
-    print(f"[Threaded] Placed {action} MARKET order: {quantity} on {ticker}")
+    log.info('orders', "[Threaded] Placed {} MARKET order: {} on {}", action, quantity, ticker)
 
 def close_positions(session):
     """Final liquidation of any remaining inventory before trading ends."""
     securities = ["CRZY_M", "CRZY_A"]
-    print("Closing all positions before trading ends.")
+    log.info('session', "Closing all positions before trading ends.")
     for ticker in securities:
         inventory = get_position(session, ticker)
         if inventory != 0:
             action = "SELL" if inventory > 0 else "BUY"
-            best_bid_m, best_ask_m, best_bid_a, best_ask_a, _, _, _, _ = get_order_book(session, ticker)
+            main = get_order_book(session, "CRZY_M")
+            alt = get_order_book(session, "CRZY_A")
 
             # Select the best market to place market orders
             if action == "SELL":
-                destination = "M" if best_bid_m > best_bid_a else "A"
-                ticker = f"{ticker[0:4]}_{destination}"
+                destination = "M" if (main.best_bid or 0) >= (alt.best_bid or 0) else "A"
             else:  # action == "BUY"
-                destination = "M" if best_ask_m > best_ask_a else "A"
-                ticker = f"{ticker[0:4]}_{destination}"
+                destination = "M" if (alt.best_ask is None or
+                                      (main.best_ask is not None and main.best_ask <= alt.best_ask)) else "A"
+            ticker = f"{ticker[0:4]}_{destination}"
 
-            submit_market_order(session, ticker, abs(inventory), action)
+            submit_market_order(session, ticker, action, abs(inventory))
 
 ########################################################
 # Dynamic threshold
@@ -195,27 +230,23 @@ def compute_dynamic_threshold(rolling_data, ticker_main, ticker_alt,
 ########################################################
 # Predictive trade flow
 ########################################################
-def detect_large_order_flow(rolling_data, ticker, current_ask_qty, current_bid_qty):
+def update_order_flow(ticker, book):
+    flow = ORDER_FLOW.get(ticker)
+    if flow is None:
+        flow = ORDER_FLOW[ticker] = OrderFlow(ticker)
+    return flow.update(book, time.time())
+
+def detect_large_order_flow(flow):
     """
-    Looks for big changes in ask or bid quantity since last time.
-    Returns a flow_factor (0 to 1) that indicates how large the change is.
+    Looks at the venue's streaming order flow: smoothed order-flow imbalance
+    and how fast the top-of-book queues are being eaten.
+    Returns a flow_factor (0 to 1) that indicates how strong the pressure is.
     """
-    if 'last_ask_qty' not in rolling_data[ticker]:
-        rolling_data[ticker]['last_ask_qty'] = current_ask_qty
-    if 'last_bid_qty' not in rolling_data[ticker]:
-        rolling_data[ticker]['last_bid_qty'] = current_bid_qty
-
-    delta_ask = abs(current_ask_qty - rolling_data[ticker]['last_ask_qty'])
-    delta_bid = abs(current_bid_qty - rolling_data[ticker]['last_bid_qty'])
-
-    # If delta_ask or delta_bid > 5000 => factor near 1
-    scale = 5000
-    flow_factor = min(max(delta_ask, delta_bid) / scale, 1.0)
-
-    rolling_data[ticker]['last_ask_qty'] = current_ask_qty
-    rolling_data[ticker]['last_bid_qty'] = current_bid_qty
+    depletion = DEPLETION_HORIZON * max(flow.bid_depletion, flow.ask_depletion)
+    pressure = max(abs(flow.ofi_ewma), depletion)
 
-    return flow_factor
+    # If pressure > FLOW_SCALE => factor near 1
+    return min(pressure / FLOW_SCALE, 1.0)
 
 ########################################################
 # Arbitrage
@@ -235,31 +266,30 @@ def arbitrage(session, rolling_data, max_position=25000):
     current_position = pos_main + pos_alt
 
     if abs(current_position) >= max_position:
-        print("Max position reached; skipping new trades.")
+        log.info('risk', "Max position reached; skipping new trades.")
         return
 
     book_main = get_order_book(session, ticker_main)
     book_alt  = get_order_book(session, ticker_alt)
 
-    if (not book_main['bids'] or not book_main['asks'] or
-        not book_alt['bids'] or not book_alt['asks']):
+    if book_main.spread is None or book_alt.spread is None:
         return
 
-    best_bid_main = book_main['bids'][0]['price']
-    best_ask_main = book_main['asks'][0]['price']
-    best_bid_alt  = book_alt['bids'][0]['price']
-    best_ask_alt  = book_alt['asks'][0]['price']
+    best_bid_main = book_main.best_bid
+    best_ask_main = book_main.best_ask
+    best_bid_alt  = book_alt.best_bid
+    best_ask_alt  = book_alt.best_ask
 
-    main_bid_qty = book_main['bids'][0]['quantity']
-    main_ask_qty = book_main['asks'][0]['quantity']
-    alt_bid_qty  = book_alt['bids'][0]['quantity']
-    alt_ask_qty  = book_alt['asks'][0]['quantity']
+    main_bid_qty = book_main.bid_size
+    main_ask_qty = book_main.ask_size
+    alt_bid_qty  = book_alt.bid_size
+    alt_ask_qty  = book_alt.ask_size
 
     # Initialize rolling_data if needed
     if ticker_main not in rolling_data:
-        rolling_data[ticker_main] = {'asks': deque(maxlen=5), 'bids': deque(maxlen=5)}
+        rolling_data[ticker_main] = {'asks': deque(maxlen=ROLLING_WINDOW), 'bids': deque(maxlen=ROLLING_WINDOW)}
     if ticker_alt not in rolling_data:
-        rolling_data[ticker_alt] = {'asks': deque(maxlen=5), 'bids': deque(maxlen=5)}
+        rolling_data[ticker_alt] = {'asks': deque(maxlen=ROLLING_WINDOW), 'bids': deque(maxlen=ROLLING_WINDOW)}
 
     # Record recent ask/bid prices
     rolling_data[ticker_main]['asks'].append(best_ask_main)
@@ -273,13 +303,13 @@ def arbitrage(session, rolling_data, max_position=25000):
         rolling_data, 
         ticker_main, 
         ticker_alt,
-        base_cross=0.01,
+        base_cross=BASE_CROSS,
         tick=current_tick
     )
 
     # Predictive arbitrage
-    flow_factor_main = detect_large_order_flow(rolling_data, ticker_main, main_ask_qty, main_bid_qty)
-    flow_factor_alt  = detect_large_order_flow(rolling_data, ticker_alt, alt_ask_qty, alt_bid_qty)
+    flow_factor_main = detect_large_order_flow(update_order_flow(ticker_main, book_main))
+    flow_factor_alt  = detect_large_order_flow(update_order_flow(ticker_alt, book_alt))
     biggest_flow_factor = max(flow_factor_main, flow_factor_alt)
     cross_threshold -= cross_threshold * 0.5 * biggest_flow_factor
     cross_threshold = max(cross_threshold, 0.0001)
@@ -305,6 +335,13 @@ def arbitrage(session, rolling_data, max_position=25000):
 def main():
     with requests.Session() as session:
         session.headers.update(API_KEY)
+        log.configure(LOG_DIR, levels=LOG_LEVELS)
+        if RECORD_DIR:
+            SessionRecorder(RECORD_DIR, 'arbitrage').attach(session)
+        if MARKET_DATA_HUB:
+            MarketDataClient(MARKET_DATA_HUB).attach(session)
+        if LATENCY_STATS:
+            LatencyMonitor('arbitrage').attach(session)
         rolling_data = {}
 
         while not shutdown:
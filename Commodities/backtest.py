@@ -0,0 +1,461 @@
+# backtest.py
+#
+# Event-driven COM5 simulator. SimMarket answers the same REST paths the
+# models hit through RITSession (/case, /securities, /news, /orders, /leases)
+# from an in-memory market, so MasterController and every model run unchanged
+# with no HTTP, no JSON and no sleeping. The simulation covers:
+#
+#   - CL / CL-AK / CL-NYC spot, CL-1F / CL-2F futures and HO / RB products
+#   - storage tanks (10 contracts each) required to hold spot crude
+#   - pipelines with a per-lease cost and a 30 tick transit
+#   - the refinery (30 CL in, 10 HO + 20 RB out after 45 ticks)
+#   - CL-1F expiring at tick 600 and CL-2F at 1200, cash settled against CL
+#   - EIA reports, pipeline cost changes and headline news with price impacts
+#   - gross / net trading limits, with orders over the limits rejected
+#
+# Usage:
+#   python backtest.py --sessions 200 --seed 1
+
+import argparse
+import contextlib
+import io
+import math
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+import refinery
+from event_scheduler import EIA_TICK_RANGES, TICKS_PER_PERIOD, NUM_PERIODS
+from helpers import RITSession, log
+from risk import RiskEngine, CRUDE_TICKERS, PRODUCT_TICKERS, GROSS_LIMIT, NET_LIMIT
+from asynclog import INFO, OFF
+from master import MasterController
+
+MULTIPLIER = {'CL': 1000, 'CL-AK': 1000, 'CL-NYC': 1000, 'CL-1F': 1000, 'CL-2F': 1000,
+              'HO': 42000, 'RB': 42000}
+
+STORAGE_FOR = {'CL': 'CL-STORAGE', 'CL-AK': 'AK-STORAGE', 'CL-NYC': 'NYC-STORAGE'}
+TANK_CAPACITY = 10
+
+LEASES = {
+    'CL-STORAGE': {'cost': 500, 'ticks': 30},
+    'AK-STORAGE': {'cost': 500, 'ticks': 30},
+    'NYC-STORAGE': {'cost': 500, 'ticks': 30},
+    'AK-CS-PIPE': {'from': 'CL-AK', 'to': 'CL', 'ticks': 30},
+    'CS-NYC-PIPE': {'from': 'CL', 'to': 'CL-NYC', 'ticks': 30},
+    'CL-REFINERY': {'cost': 300000, 'ticks': 45, 'input': ('CL', 30), 'output': {'HO': 10, 'RB': 20}}
+}
+
+PIPELINE_ROUTES = {'AK-CS-PIPE': 'ALASKA TO CUSHING', 'CS-NYC-PIPE': 'CUSHING TO NYC'}
+
+# (headline, CL price impact in $/bbl) -- phrased so FundamentalModel recognises them
+HEADLINES = [
+    ('TRAFFIC SLOWS THROUGH THE STRAIT OF HORMUZ', 0.2),
+    ('US NAVY READY TO DEFEND THE STRAIT OF HORMUZ', -0.2),
+    ('OFFSHORE DRILLING FACES HIGHER INSURANCE PREMIUMS', 0.3),
+    ('NEW OIL PROJECT IN NORTHWEST TERRITORIES APPROVED', -0.1),
+    ('INFLATION SLOWS DOWN ACROSS OECD', 0.3),
+    ('UNREST IN PUNTLAND STATE OF SOMALIA', 0.2),
+    ('OPEC INCREASES OIL DEMAND FORECAST', 0.1),
+    ('PEMEX INCREASES OUTPUT', 0.1),
+    ('EURO RECOVERS AGAINST THE DOLLAR', 0.4),
+    ('GLOBAL STOCKS TUMBLE', -0.4),
+    ('FLASH CRASH HITS ENERGY MARKETS', -0.2),
+    ('PIRATES ATTACK TANKER OFF THE HORN OF AFRICA', 0.15),
+    ('LARGE OIL WELLS FOUND OFFSHORE', -0.5)
+]
+
+class SimResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def json(self):
+        return self.payload
+
+class SimMarket:
+    def __init__(self, seed=0, ticks_per_period=TICKS_PER_PERIOD, num_periods=NUM_PERIODS,
+                 volatility=0.04, news_rate=1 / 40, commission=1.0):
+        self.rng = random.Random(seed)
+        self.ticks_per_period = ticks_per_period
+        self.num_periods = num_periods
+        self.volatility = volatility
+        self.news_rate = news_rate
+        self.commission = commission
+
+        self.period = 1
+        self.tick = 1
+        self.finished = False
+
+        self.cl = 50.0
+        self.ak_discount = 4.3
+        self.nyc_premium = 2.3
+        self.ho_crack = 1.30
+        self.rb_crack = 1.25
+        self.impacts = []   # [ticks_left, $/tick]
+        self.pipeline_costs = {'AK-CS-PIPE': 40000, 'CS-NYC-PIPE': 20000}
+        self.prices = {}
+        self._reprice()
+
+        self.positions = {t: 0 for t in MULTIPLIER}
+        self.cash = 0.0
+        self.costs = 0.0
+        self.news = []
+        self.next_news_id = 1
+        self.leases = {}
+        self.lease_due = {}    # lease id -> absolute tick of the next lease charge
+        self.next_lease_id = 1
+        self.next_order_id = 1
+        self.deliveries = []   # (abs_tick, ticker, qty, lease_id)
+        self.orders = 0
+        self.rejected = 0
+        self.volume = 0
+        self.nlv_history = []
+        self._securities = None
+
+    ###########################################################################
+    # Market dynamics
+    ###########################################################################
+    @property
+    def abs_tick(self):
+        return (self.period - 1) * self.ticks_per_period + self.tick
+
+    def _reprice(self):
+        expiry_1 = self.ticks_per_period
+        expiry_2 = self.ticks_per_period * self.num_periods
+        carry = 0.05 / 30
+        self.prices = {
+            'CL': round(self.cl, 2),
+            'CL-AK': round(self.cl - self.ak_discount, 2),
+            'CL-NYC': round(self.cl + self.nyc_premium, 2),
+            'CL-1F': round(self.cl + carry * max(expiry_1 - self.abs_tick, 0), 2),
+            'CL-2F': round(self.cl + carry * max(expiry_2 - self.abs_tick, 0), 2),
+            'HO': round(self.cl / 42 * self.ho_crack, 4),
+            'RB': round(self.cl / 42 * self.rb_crack, 4)
+        }
+        self._securities = None
+
+    def _publish(self, headline):
+        self.news.insert(0, {'news_id': self.next_news_id, 'period': self.period, 'tick': self.tick,
+                             'ticker': '', 'headline': headline, 'body': ''})
+        self.next_news_id += 1
+
+    def _impact(self, delta, ticks=5):
+        self.impacts.append([ticks, delta / ticks])
+
+    def _generate_news(self):
+        if self.tick in {start + 1 for start, _ in EIA_TICK_RANGES}:
+            forecast = self.rng.randint(-6, 6)
+            actual = forecast + self.rng.randint(-5, 5)
+            word = lambda x: 'DRAW' if x < 0 else 'BUILD'
+            week = self.tick // 150 + 1 + (self.period - 1) * 4
+            self._publish(f"WEEK {week} EIA REPORT: ACTUAL {word(actual)} {abs(actual)} MILLION BARRELS, "
+                          f"FORECAST {word(forecast)} {abs(forecast)} MILLION BARRELS")
+            self._impact(-(actual - forecast) * 0.10 * self.rng.uniform(0.7, 1.3))
+
+        if self.rng.random() < self.news_rate:
+            headline, impact = self.rng.choice(HEADLINES)
+            self._publish(headline.upper())
+            self._impact(impact * self.rng.uniform(0.5, 1.5), ticks=10)
+
+        if self.rng.random() < self.news_rate / 4:
+            pipe = self.rng.choice(list(PIPELINE_ROUTES))
+            old = self.pipeline_costs[pipe]
+            new = max(10000, old + self.rng.choice([-10000, 10000]))
+            self.pipeline_costs[pipe] = new
+            action = 'GOING UP TO' if new > old else 'GOING DOWN TO'
+            self._publish(f"PIPELINE COST FOR {PIPELINE_ROUTES[pipe]} {action} ${new:,} PER LEASE")
+            # The spread between hubs drifts toward the new shipping cost
+            if pipe == 'AK-CS-PIPE':
+                self.ak_discount += (new - old) / 10000
+            else:
+                self.nyc_premium += (new - old) / 10000
+
+    def advance(self):
+        """Move the market forward one tick."""
+        self.nlv_history.append(self.nlv())
+        if self.abs_tick >= self.ticks_per_period * self.num_periods:
+            self._expire('CL-2F')
+            self.finished = True
+            self.nlv_history.append(self.nlv())
+            return
+
+        if self.tick >= self.ticks_per_period:
+            if self.period == 1:
+                self._expire('CL-1F')
+            self.period += 1
+            self.tick = 1
+        else:
+            self.tick += 1
+
+        drift = 0.0
+        for impact in self.impacts:
+            drift += impact[1]
+            impact[0] -= 1
+        self.impacts = [x for x in self.impacts if x[0] > 0]
+        self.cl = max(1.0, self.cl + drift + self.rng.gauss(0, self.volatility))
+        # Hub spreads mean-revert to the shipping cost plus a small premium
+        ak_fair = self.pipeline_costs['AK-CS-PIPE'] / 10000 + 0.3
+        nyc_fair = self.pipeline_costs['CS-NYC-PIPE'] / 10000 + 0.3
+        self.ak_discount += 0.05 * (ak_fair - self.ak_discount) + self.rng.gauss(0, 0.08)
+        self.nyc_premium += 0.05 * (nyc_fair - self.nyc_premium) + self.rng.gauss(0, 0.08)
+        self.ho_crack += 0.05 * (1.30 - self.ho_crack) + self.rng.gauss(0, 0.004)
+        self.rb_crack += 0.05 * (1.25 - self.rb_crack) + self.rng.gauss(0, 0.004)
+        self._generate_news()
+        self._reprice()
+        self._settle_leases()
+
+    def _expire(self, ticker):
+        qty = self.positions[ticker]
+        if qty:
+            self.cash += qty * self.prices['CL'] * MULTIPLIER[ticker]
+            self.positions[ticker] = 0
+            self._securities = None
+
+    def _settle_leases(self):
+        now = self.abs_tick
+        base = (self.period - 1) * self.ticks_per_period
+        for lease in self.leases.values():
+            spec = LEASES[lease['ticker']]
+            if 'from' in spec:
+                continue
+            if now >= self.lease_due[lease['id']]:
+                self.costs += spec['cost']
+                self.lease_due[lease['id']] += spec['ticks']
+            # RIT reports lease ticks relative to the current period
+            lease['next_lease_tick'] = self.lease_due[lease['id']] - base
+
+        arrived = [d for d in self.deliveries if d[0] <= now]
+        for abs_tick, ticker, qty, lease_id in arrived:
+            self.positions[ticker] += qty
+            self.deliveries.remove((abs_tick, ticker, qty, lease_id))
+            lease = self.leases.get(lease_id)
+            if lease and LEASES[lease['ticker']].get('from'):
+                self._drop_lease(lease_id)
+            elif lease:
+                lease['containment_usage'] = 0
+        if arrived:
+            self._securities = None
+
+    ###########################################################################
+    # Accounting
+    ###########################################################################
+    def nlv(self):
+        marked = sum(qty * self.prices[t] * MULTIPLIER[t] for t, qty in self.positions.items())
+        in_transit = sum(qty * self.prices[t] * MULTIPLIER[t] for _, t, qty, _ in self.deliveries)
+        return self.cash + marked + in_transit - self.costs
+
+    def limits_after(self, ticker, signed_qty):
+        positions = dict(self.positions)
+        positions[ticker] += signed_qty
+        gross = sum(abs(positions[t]) for t in CRUDE_TICKERS + PRODUCT_TICKERS)
+        net_crude = sum(positions[t] for t in CRUDE_TICKERS)
+        net_product = sum(positions[t] for t in PRODUCT_TICKERS)
+        return gross <= GROSS_LIMIT and abs(net_crude) <= NET_LIMIT and abs(net_product) <= NET_LIMIT
+
+    def storage_capacity(self, ticker):
+        storage = STORAGE_FOR.get(ticker)
+        if storage is None:
+            return None
+        return TANK_CAPACITY * sum(1 for l in self.leases.values() if l['ticker'] == storage)
+
+    def results(self):
+        peak, drawdown = -math.inf, 0.0
+        for value in self.nlv_history:
+            peak = max(peak, value)
+            drawdown = max(drawdown, peak - value)
+        return {'pnl': self.nlv(), 'max_drawdown': drawdown, 'orders': self.orders,
+                'rejected': self.rejected, 'volume': self.volume, 'lease_costs': self.costs}
+
+    ###########################################################################
+    # REST stand-in (what RITSession.session talks to)
+    ###########################################################################
+    def _path(self, url):
+        return url.split('/v1/', 1)[1].split('?', 1)[0].split('/')
+
+    def get(self, url, params=None, **kwargs):
+        path = self._path(url)
+        if path[0] == 'case':
+            return SimResponse({'period': self.period, 'tick': self.tick,
+                                'ticks_per_period': self.ticks_per_period,
+                                'total_periods': self.num_periods,
+                                'status': 'STOPPED' if self.finished else 'ACTIVE'})
+        if path[0] == 'securities':
+            if self._securities is None:
+                self._securities = [{'ticker': t, 'position': self.positions[t], 'last': p}
+                                    for t, p in self.prices.items()]
+            return SimResponse(self._securities)
+        if path[0] == 'news':
+            return SimResponse(self.news)
+        if path[0] == 'leases':
+            ticker = (params or {}).get('ticker')
+            self._fill_tanks()
+            return SimResponse([dict(l) for l in self.leases.values() if ticker in (None, l['ticker'])])
+        return SimResponse({'code': 'NOT_FOUND'}, 404)
+
+    def _fill_tanks(self):
+        for ticker, storage in STORAGE_FOR.items():
+            held = max(self.positions[ticker], 0)
+            for lease in self.leases.values():
+                if lease['ticker'] == storage:
+                    lease['containment_usage'] = min(held, TANK_CAPACITY)
+                    held -= lease['containment_usage']
+
+    def _reject(self, message):
+        self.rejected += 1
+        return SimResponse({'code': 'REJECTED', 'message': message}, 400)
+
+    def post(self, url, params=None, **kwargs):
+        path = self._path(url)
+        params = params or {}
+        if path[0] == 'orders':
+            return self._order(params['ticker'], params['action'], int(params['quantity']))
+        if path[0] == 'leases' and len(path) == 1:
+            return self._lease(params)
+        if path[0] == 'leases':
+            return self._use_lease(int(path[1]), params)
+        return SimResponse({'code': 'NOT_FOUND'}, 404)
+
+    def delete(self, url, params=None, **kwargs):
+        path = self._path(url)
+        if path[0] == 'leases' and len(path) == 2:
+            self._fill_tanks()
+            lease = self.leases.get(int(path[1]))
+            if lease is None or lease['containment_usage'] or 'from' in LEASES[lease['ticker']]:
+                return SimResponse({'code': 'NOT_FOUND'}, 404)
+            self._drop_lease(lease['id'])
+            return SimResponse({'success': True})
+        return SimResponse({'code': 'NOT_FOUND'}, 404)
+
+    def _order(self, ticker, action, qty):
+        self.orders += 1
+        if ticker not in self.prices or qty <= 0:
+            return self._reject(f"Unknown ticker {ticker}")
+        signed = qty if action == 'BUY' else -qty
+        if not self.limits_after(ticker, signed):
+            return self._reject("Trading limits exceeded")
+        capacity = self.storage_capacity(ticker)
+        if capacity is not None and not 0 <= self.positions[ticker] + signed <= capacity:
+            return self._reject("Insufficient storage")
+
+        price = self.prices[ticker]
+        self.positions[ticker] += signed
+        self.cash -= signed * price * MULTIPLIER[ticker]
+        self.costs += self.commission * qty
+        self.volume += qty
+        self._securities = None
+        order_id = self.next_order_id
+        self.next_order_id += 1
+        return SimResponse({'order_id': order_id, 'ticker': ticker, 'action': action, 'quantity': qty,
+                            'quantity_filled': qty, 'vwap': price, 'status': 'TRANSACTED'})
+
+    def _new_lease(self, ticker, usage=0):
+        spec = LEASES[ticker]
+        lease = {'id': self.next_lease_id, 'ticker': ticker, 'containment_usage': usage,
+                 'start_lease_tick': self.tick, 'next_lease_tick': self.tick + spec['ticks']}
+        self.next_lease_id += 1
+        self.leases[lease['id']] = lease
+        self.lease_due[lease['id']] = self.abs_tick + spec['ticks']
+        return lease
+
+    def _drop_lease(self, lease_id):
+        del self.leases[lease_id]
+        del self.lease_due[lease_id]
+
+    def _lease(self, params):
+        ticker = params['ticker']
+        spec = LEASES.get(ticker)
+        if spec is None:
+            return self._reject(f"Unknown lease {ticker}")
+
+        if 'from' in spec:
+            source, qty = params.get('from1'), int(params.get('quantity1', 0))
+            if source != spec['from'] or qty <= 0 or self.positions[source] < qty:
+                return self._reject("Nothing to ship")
+            self.positions[source] -= qty
+            self.costs += self.pipeline_costs[ticker]
+            lease = self._new_lease(ticker, qty)
+            self.deliveries.append((self.abs_tick + spec['ticks'], spec['to'], qty, lease['id']))
+            self._securities = None
+            return SimResponse(dict(lease))
+
+        if ticker == 'CL-REFINERY' and any(l['ticker'] == ticker for l in self.leases.values()):
+            return self._reject("Refinery already leased")
+        self.costs += spec['cost']
+        return SimResponse(dict(self._new_lease(ticker)))
+
+    def _use_lease(self, lease_id, params):
+        lease = self.leases.get(lease_id)
+        spec = LEASES.get(lease['ticker']) if lease else None
+        if not spec or 'input' not in spec:
+            return self._reject(f"Lease {lease_id} cannot be used")
+        source, qty = spec['input']
+        if lease['containment_usage'] or params.get('from1') != source or int(params.get('quantity1', 0)) != qty \
+                or self.positions[source] < qty:
+            return self._reject("Refinery input rejected")
+        self.positions[source] -= qty
+        lease['containment_usage'] = qty
+        for product, out in spec['output'].items():
+            self.deliveries.append((self.abs_tick + spec['ticks'], product, out, lease_id))
+        self._securities = None
+        return SimResponse(dict(lease))
+
+class SimRITSession(RITSession):
+    """RITSession whose HTTP session is the simulated market."""
+    def __init__(self, market):
+        self.session = market
+        self.risk = RiskEngine(self.get_positions)
+
+    def place_orders(self, trades):
+        # The simulated market is single-threaded; fill the batch in order
+        return [self.place_order(t['ticker'], t['action'], t['qty']) for t in trades]
+
+def run_session(seed=0, loops_per_tick=1, quiet=True, **market_kwargs):
+    market = SimMarket(seed, **market_kwargs)
+    controller = MasterController(None, 0, session=SimRITSession(market))
+    log.configure(level=OFF if quiet else INFO)
+
+    out = io.StringIO() if quiet else None
+    started = time.perf_counter()
+    # The refinery's retry sleeps are skipped only for this run
+    live_time = refinery.time
+    refinery.time = SimpleNamespace(sleep=lambda seconds: None)
+    try:
+        with contextlib.redirect_stdout(out) if quiet else contextlib.nullcontext():
+            while not market.finished:
+                for _ in range(loops_per_tick):
+                    controller.step()
+                market.advance()
+            controller.profiler.close()
+    finally:
+        refinery.time = live_time
+    result = market.results()
+    result['stages'] = controller.profiler.summary()
+    result['seed'] = seed
+    result['ticks_per_second'] = market.abs_tick / (time.perf_counter() - started)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the COM5 models on simulated sessions")
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--loops-per-tick', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    results = []
+    for i in range(args.sessions):
+        result = run_session(args.seed + i, args.loops_per_tick, quiet=not args.verbose)
+        results.append(result)
+        print(f"seed {result['seed']:>5}  pnl {result['pnl']:>14,.2f}  max dd {result['max_drawdown']:>12,.2f}  "
+              f"orders {result['orders']:>5}  rejected {result['rejected']:>4}  "
+              f"{result['ticks_per_second']:,.0f} ticks/s")
+
+    pnls = [r['pnl'] for r in results]
+    print(f"\n{len(results)} sessions  mean pnl {statistics.mean(pnls):,.2f}  "
+          f"stdev {statistics.pstdev(pnls):,.2f}  min {min(pnls):,.2f}  max {max(pnls):,.2f}")
+
+if __name__ == '__main__':
+    main()
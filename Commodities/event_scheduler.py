@@ -1,3 +1,7 @@
+# event_scheduler.py
+
+from helpers import log
+
 EIA_TICK_RANGES = [
     (89, 92),
     (239, 242),
@@ -5,33 +9,152 @@ EIA_TICK_RANGES = [
     (539, 542)
 ]
 
+TICKS_PER_PERIOD = 600
+NUM_PERIODS = 2
+
+HEDGE_ROLL_TICK = 584         # period 1 tick where CL-1F starts rolling into CL-2F
+HEDGE_ROLL_DEADLINE = 598     # ... and by which the whole roll has been sent
+REFINERY_CUTOFF_TICK = 1170   # absolute tick after which no new refinery batches start
+FLATTEN_TICKS = 10            # ticks at the end of each period to flatten in
+
+# Calendar event flags, OR'ed together into one bitmask per absolute tick
+EIA_WINDOW       = 1 << 0
+EIA_WINDOW_START = 1 << 1
+EIA_WINDOW_END   = 1 << 2
+FUTURES_EXPIRY   = 1 << 3
+HEDGE_ROLL       = 1 << 4
+REFINERY_CUTOFF  = 1 << 5
+FLATTEN          = 1 << 6
+
+EVENT_NAMES = {
+    EIA_WINDOW: 'EIA_WINDOW',
+    EIA_WINDOW_START: 'EIA_WINDOW_START',
+    EIA_WINDOW_END: 'EIA_WINDOW_END',
+    FUTURES_EXPIRY: 'FUTURES_EXPIRY',
+    HEDGE_ROLL: 'HEDGE_ROLL',
+    REFINERY_CUTOFF: 'REFINERY_CUTOFF',
+    FLATTEN: 'FLATTEN'
+}
+
+# Single-tick events that are still delivered if the loop skips over their tick
+EDGE_EVENTS = EIA_WINDOW_START | EIA_WINDOW_END | FUTURES_EXPIRY
+
 class EventScheduler:
-    def __init__(self):
+    def __init__(self, ticks_per_period=TICKS_PER_PERIOD, num_periods=NUM_PERIODS):
+        self.ticks_per_period = ticks_per_period
+        self.session_ticks = ticks_per_period * num_periods
         self.eia_windows = list(EIA_TICK_RANGES)
         self.aggression_mode = False
         self.current_window = None
         self.eia_tick_log = []
+        self.subscribers = []
+        self.last_abs_tick = None
+        self.compile(num_periods)
+
+    def compile(self, num_periods):
+        """
+        Lay every known calendar event out in a per-tick lookup table spanning
+        the whole session, so any calendar question is a single list index.
+        """
+        size = self.session_ticks + 1
+        self.calendar = [0] * size
+        self.window_at = [None] * size
+
+        for period in range(1, num_periods + 1):
+            base = (period - 1) * self.ticks_per_period
+            for start, end in self.eia_windows:
+                for t in range(base + start, min(base + end, self.session_ticks) + 1):
+                    self.calendar[t] |= EIA_WINDOW
+                    self.window_at[t] = (start, end)
+                if base + start < size:
+                    self.calendar[base + start] |= EIA_WINDOW_START
+                if base + end + 1 < size:
+                    self.calendar[base + end + 1] |= EIA_WINDOW_END
+            self.calendar[base + self.ticks_per_period] |= FUTURES_EXPIRY
+            end = base + self.ticks_per_period
+            for t in range(max(end - FLATTEN_TICKS + 1, 0), min(end, self.session_ticks) + 1):
+                self.calendar[t] |= FLATTEN
+
+        for t in range(min(HEDGE_ROLL_TICK, size), min(self.ticks_per_period, self.session_ticks) + 1):
+            self.calendar[t] |= HEDGE_ROLL
+        for t in range(min(REFINERY_CUTOFF_TICK, size), size):
+            self.calendar[t] |= REFINERY_CUTOFF
+
+        # next_at[flag][t] is the first absolute tick >= t carrying that flag
+        self.next_at = {}
+        for flag in EVENT_NAMES:
+            upcoming = None
+            next_ticks = [None] * size
+            for t in range(size - 1, -1, -1):
+                if self.calendar[t] & flag:
+                    upcoming = t
+                next_ticks[t] = upcoming
+            self.next_at[flag] = next_ticks
+
+    def abs_tick(self, tick, period):
+        t = (period - 1) * self.ticks_per_period + tick
+        return min(max(t, 0), self.session_ticks)
+
+    def split_tick(self, abs_tick):
+        period = max(1, (abs_tick - 1) // self.ticks_per_period + 1)
+        return abs_tick - (period - 1) * self.ticks_per_period, period
+
+    def subscribe(self, events, callback):
+        """
+        Call callback(events, tick, period) once per tick on which any of the
+        given event flags is active.
+        """
+        self.subscribers.append((events, callback))
+
+    def unsubscribe(self, callback):
+        self.subscribers = [(events, cb) for events, cb in self.subscribers if cb != callback]
+
+    def notify(self, flags, abs_tick):
+        tick, period = self.split_tick(abs_tick)
+        for events, callback in self.subscribers:
+            hit = flags & events
+            if hit:
+                callback(hit, tick, period)
 
     def update(self, tick, period):
-        for window in self.eia_windows:
-            if window[0] <= tick <= window[1]:
-                if self.current_window != window:
-                    print(f"[p{period}][tick {tick}] Aggression Mode ACTIVATED (EIA window {window})")
-                    self.aggression_mode = True
-                    self.current_window = window
-                    self.eia_tick_log.append((period, tick))
-                return
-
-        if self.aggression_mode and self.current_window:
-            print(f"[p{period}][tick {tick}] Aggression Mode DEACTIVATED")
+        now = self.abs_tick(tick, period)
+        if now == self.last_abs_tick:
+            return
+
+        # Deliver single-tick events from any ticks the loop skipped
+        if self.last_abs_tick is not None and self.last_abs_tick < now:
+            for t in range(self.last_abs_tick + 1, now):
+                edges = self.calendar[t] & EDGE_EVENTS
+                if edges:
+                    self.notify(edges, t)
+        self.last_abs_tick = now
+
+        window = self.window_at[now]
+        if window:
+            if self.current_window != window:
+                log.info('events', "[p{}][tick {}] Aggression Mode ACTIVATED (EIA window {})", period, tick, window)
+                self.aggression_mode = True
+                self.current_window = window
+                self.eia_tick_log.append((period, tick))
+        elif self.aggression_mode and self.current_window:
+            log.info('events', "[p{}][tick {}] Aggression Mode DEACTIVATED", period, tick)
             self.aggression_mode = False
             self.current_window = None
 
+        self.notify(self.calendar[now], now)
+
+    def flags(self, tick, period):
+        return self.calendar[self.abs_tick(tick, period)]
+
+    def next_event(self, event, tick, period):
+        """Absolute tick of the next occurrence of event at or after (tick, period), or None."""
+        return self.next_at[event][self.abs_tick(tick, period)]
+
     def aggression_mode_active(self):
         return self.aggression_mode
 
-    def is_eia_tick(self, tick):
-        return any(start <= tick <= end for start, end in self.eia_windows)
+    def is_eia_tick(self, tick, period=1):
+        return bool(self.calendar[self.abs_tick(tick, period)] & EIA_WINDOW)
 
     def last_eia_tick(self):
         return self.eia_tick_log[-1] if self.eia_tick_log else (None, None)
@@ -3,6 +3,8 @@
 import re
 import math
 
+from signal_model import SignalModel
+
 PIPELINE_PATTERN = re.compile(
     r'PIPELINE COST FOR (.+?) (GOING UP TO|GOING DOWN TO|BACK TO) \$(\d{1,3}(?:,\d{3})*|\d+) PER LEASE',
     re.IGNORECASE
@@ -13,7 +15,7 @@ ROUTE_TO_TICKER = {
     'CUSHING TO NYC': 'CS-NYC-PIPE'
 }
 
-class FundamentalModel:
+class FundamentalModel(SignalModel):
     def __init__(self, session, market_state, lease_manager):
         self.session = session
         self.market_state = market_state
@@ -92,11 +94,9 @@ class FundamentalModel:
                 })
                                 
                 prices = self.session.get_prices()
-                gross, net_crude, net_prod = self.session.get_limits(
-                    ['CL', 'CL-AK', 'CL-NYC', 'CL-1F', 'CL-2F'], ['HO', 'RB']
-                )
+                gross_room, crude_room, _ = self.session.risk.headroom()
 
-                available_lots = min((500 - gross) // 10, (100 - abs(net_crude)) // 10)
+                available_lots = min(gross_room // 10, crude_room // 10)
                 if available_lots <= 0:
                     return
 
@@ -340,6 +340,23 @@ class FundamentalModel:
                 return self.signals.pop(i)
         return None
 
+    def on_fill(self, trade, filled):
+        """
+        An entry that fell short shrinks the position it opened; anything
+        else is handled as in SignalModel.
+        """
+        if filled >= trade['qty']:
+            return
+        if 'tick_created' in trade:
+            for pos in self.positions:
+                if (pos['ticker'] == trade['ticker'] and pos['side'] == trade['action']
+                        and pos['tick_entered'] == trade['tick_created'] and pos['qty'] == trade['qty']):
+                    pos['qty'] = filled
+                    break
+            self.positions = [pos for pos in self.positions if pos['qty'] > 0]
+        else:
+            super().on_fill(trade, filled)
+
     def expected_profit(self):
         if not self.signals:
             return 0, 0
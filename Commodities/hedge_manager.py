@@ -1,47 +1,83 @@
 # hedge_manager.py
 
+import math
+
+from event_scheduler import HEDGE_ROLL, HEDGE_ROLL_DEADLINE
+from helpers import log, quantity_filled
+
+# (minimum certainty, hedge %), checked in order; anything below is fully hedged
+HEDGE_BUCKETS = [
+    (0.95, 0.1),  # EIA surprise level certainty
+    (0.8, 0.6),
+    (0.6, 0.8)
+]
+
 class HedgeManager:
-    def __init__(self, session):
+    def __init__(self, session, event_scheduler):
         self.session = session
         self.active_hedges = {}
         self.last_tick = -1
+        self.rolled = 0           # CL-1F lots moved into CL-2F this session
+        event_scheduler.subscribe(HEDGE_ROLL, self.on_roll)
 
     def manage(self, tick, period, prices):
-        self.last_tick = self.session.get_tick()
+        self.last_tick = tick
 
-        if period == 1 and tick >= 595:
-            self.rollover_cl1f_to_cl2f()
+    def on_roll(self, event, tick, period):
+        self.last_tick = tick
+        self.rollover_cl1f_to_cl2f(tick)
 
-    def rollover_cl1f_to_cl2f(self):
-        positions = self.session.session.get('http://localhost:9999/v1/securities').json()
-
-        cl1f_pos = 0
-        for sec in positions:
-            if sec['ticker'] == 'CL-1F':
-                cl1f_pos = sec['position']
-                break
-
-        if cl1f_pos != 0:
-            print(f"[tick {self.last_tick}] ROLLING {cl1f_pos} CL-1F --> CL-2F")
+    def roll_slice(self, position, tick):
+        """
+        CL-1F lots to roll at tick: what is left spread evenly over the ticks
+        remaining to HEDGE_ROLL_DEADLINE, all of it from the deadline on.
+        """
+        ticks_left = HEDGE_ROLL_DEADLINE - tick + 1
+        if ticks_left <= 1:
+            return abs(position)
+        return math.ceil(abs(position) / ticks_left)
+
+    def rollover_cl1f_to_cl2f(self, tick):
+        # One child per tick, sized from the in-memory position, so progress
+        # is tracked without re-reading /securities
+        cl1f_pos = self.session.risk.position('CL-1F')
+        want = self.roll_slice(cl1f_pos, tick)
+        if want == 0:
+            return
 
+        risk = self.session.risk
+        side = 'BUY' if cl1f_pos < 0 else 'SELL'
+        qty = risk.fit('CL-1F', side, want)
+        filled = quantity_filled(self.session.place_order('CL-1F', side, qty)) if qty else 0
+        reopened = 0
+        if filled:
+            # Reopen in CL-2F what actually left CL-1F, as far as the limits allow
             new_side = 'SELL' if cl1f_pos < 0 else 'BUY'
-            self.session.place_order('CL-2F', new_side, abs(cl1f_pos))
-
-            side = 'BUY' if cl1f_pos < 0 else 'SELL'
-            self.session.place_order('CL-1F', side, abs(cl1f_pos))
+            reopen = risk.fit('CL-2F', new_side, filled)
+            if reopen:
+                reopened = quantity_filled(self.session.place_order('CL-2F', new_side, reopen))
+            self.rolled += reopened
+        log.info('hedge', "[tick {}] ROLLING {}/{} CL-1F --> CL-2F, reopened {} ({} rolled so far)",
+                 tick, filled, abs(cl1f_pos), reopened, self.rolled)
 
     def hedge_position(self, quantity, certainty=1.0):
         hedge_strength = self.calculate_hedge_strength(certainty)
         hedge_qty = int(abs(quantity) * hedge_strength)
 
         if hedge_qty == 0:
-            print(f"[tick {self.last_tick}] Skipping hedge due to high certainty ({certainty:.2f})")
-            return
+            log.info('hedge', "[tick {}] Skipping hedge due to high certainty ({:.2f})", self.last_tick, certainty)
+            return 0
 
         hedge_ticker = 'CL-2F'
         action = 'SELL' if quantity > 0 else 'BUY'
+        wanted = hedge_qty
+        hedge_qty = self.session.risk.fit(hedge_ticker, action, hedge_qty)
+        if hedge_qty < wanted:
+            log.info('hedge', "[tick {}] Hedge cut from {} to {} contracts by limits", self.last_tick, wanted, hedge_qty)
+        if hedge_qty == 0:
+            return 0
 
-        print(f"[tick {self.last_tick}] Hedging {hedge_qty} contracts on {hedge_ticker} (certainty={certainty:.2f})")
+        log.info('hedge', "[tick {}] Hedging {} contracts on {} (certainty={:.2f})", self.last_tick, hedge_qty, hedge_ticker, certainty)
 
         self.session.place_order(hedge_ticker, action, hedge_qty)
 
@@ -52,11 +88,7 @@ class HedgeManager:
         Given a certainty, return hedge % to apply.
         """
 
-        if certainty >= 0.95:
-            return 0.1  # EIA surprise level certainty
-        elif certainty >= 0.8:
-            return 0.6
-        elif certainty >= 0.6:
-            return 0.8
-        else:
-            return 1.0  # Fully hedge uncertain positions
+        for min_certainty, strength in HEDGE_BUCKETS:
+            if certainty >= min_certainty:
+                return strength
+        return 1.0  # Fully hedge uncertain positions
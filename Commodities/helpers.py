@@ -1,9 +1,34 @@
+import os
+import sys
 import requests
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Tools'))
+from recorder import SessionRecorder
+from latency import LatencyMonitor
+from mdhub import MarketDataClient
+from fastjson import decode_securities, payload
+from asynclog import get_logger
+from risk import RiskEngine
+
+log = get_logger('commodities')
+
+MAX_ORDER_WORKERS = 8     # concurrent POST /orders in place_orders()
+
+def quantity_filled(resp):
+    return payload(resp).get('quantity_filled', 0) if resp.ok else 0
 
 class RITSession:
-    def __init__(self, api_key):
+    def __init__(self, api_key, record_dir=None, latency_stats=False, market_data_hub=None):
         self.session = requests.Session()
         self.session.headers.update({'X-API-Key': api_key})
+        if record_dir:
+            SessionRecorder(record_dir, 'commodities').attach(self.session)
+        if market_data_hub:
+            MarketDataClient(market_data_hub).attach(self.session)
+        if latency_stats:
+            LatencyMonitor('commodities').attach(self.session)
+        self.risk = RiskEngine(self.get_positions)
 
     def get_tick(self):
         return self.session.get('http://localhost:9999/v1/case').json()['tick']
@@ -13,55 +38,55 @@ class RITSession:
 
     def get_prices(self):
         resp = self.session.get('http://localhost:9999/v1/securities')
-        return {x['ticker']: x['last'] for x in resp.json()}
+        securities = decode_securities(resp)
+        self.risk.sync({ticker: sec.position for ticker, sec in securities.items()})
+        if self.risk.resting:
+            # After the positions, so a fill is never missing from both
+            self.risk.sync_orders(self.session.get('http://localhost:9999/v1/orders', params={'status': 'OPEN'}).json())
+        return {ticker: sec.last for ticker, sec in securities.items()}
+
+    def get_positions(self):
+        resp = self.session.get('http://localhost:9999/v1/securities')
+        return {ticker: sec.position for ticker, sec in decode_securities(resp).items()}
 
     def get_position(self, ticker):
-        resp = self.session.get('http://localhost:9999/v1/securities')
-        for sec in resp.json():
-            if sec['ticker'] == ticker:
-                return sec['position']
-        return 0
+        return self.risk.position(ticker)
 
     def place_order(self, ticker, side, qty, order_type='MARKET', price=0):
-        return self.session.post('http://localhost:9999/v1/orders', params={
+        self.risk.reserve(ticker, side, qty)
+        resp = self.session.post('http://localhost:9999/v1/orders', params={
             'ticker': ticker,
             'type': order_type,
             'quantity': qty,
             'action': side,
             'price': price
         })
+        body = payload(resp) if resp.ok else {}
+        self.risk.settle(ticker, side, qty, body.get('quantity_filled', 0),
+                         body.get('order_id'), body.get('status') == 'OPEN')
+        return resp
+
+    def cancel_order(self, order_id):
+        resp = self.session.delete(f'http://localhost:9999/v1/orders/{order_id}')
+        if resp.ok:
+            self.risk.release(order_id)
+        return resp
+
+    def place_orders(self, trades):
+        """Send a batch of MARKET orders ({'ticker', 'action', 'qty'}) concurrently."""
+        if len(trades) <= 1:
+            return [self.place_order(t['ticker'], t['action'], t['qty']) for t in trades]
+        with ThreadPoolExecutor(max_workers=min(len(trades), MAX_ORDER_WORKERS)) as pool:
+            return list(pool.map(lambda t: self.place_order(t['ticker'], t['action'], t['qty']), trades))
 
     def lease(self, ticker, **kwargs):
+        # Leases that take inputs (pipelines, refinery) move positions
+        self.risk.invalidate()
         return self.session.post('http://localhost:9999/v1/leases', params={'ticker': ticker, **kwargs})
 
+    def use_lease(self, lease_id, **kwargs):
+        self.risk.invalidate()
+        return self.session.post(f'http://localhost:9999/v1/leases/{lease_id}', params=kwargs)
+
     def release_lease(self, lease_id):
         return self.session.delete('http://localhost:9999/v1/leases/{}'.format(lease_id))
-
-    def get_limits(self, CRUDE_TICKERS, PRODUCT_TICKERS):
-        resp = self.session.get('http://localhost:9999/v1/securities')
-        positions = {x['ticker']: x['position'] for x in resp.json()}
-
-        gross = sum(abs(positions.get(tkr, 0)) for tkr in CRUDE_TICKERS + PRODUCT_TICKERS)
-        net_crude = sum(positions.get(tkr, 0) for tkr in CRUDE_TICKERS)
-        net_product = sum(positions.get(tkr, 0) for tkr in PRODUCT_TICKERS)
-
-        return gross, net_crude, net_product
-
-    def within_limits(self, ticker, action, qty, CRUDE_TICKERS, PRODUCT_TICKERS, GROSS_LIMIT, NET_LIMIT):
-        gross, net_crude, net_product = self.get_limits(CRUDE_TICKERS, PRODUCT_TICKERS)
-
-        sign = 1 if action == 'BUY' else -1
-
-        if ticker in CRUDE_TICKERS:
-            net_crude += sign * qty
-        elif ticker in PRODUCT_TICKERS:
-            net_product += sign * qty
-
-        gross += qty
-
-        if gross > GROSS_LIMIT:
-            return False
-        if abs(net_crude) > NET_LIMIT or abs(net_product) > NET_LIMIT:
-            return False
-
-        return True
@@ -1,5 +1,7 @@
 # lease_manager.py
 
+from helpers import log
+
 class LeaseManager:
     def __init__(self, session):
         self.session = session
@@ -15,7 +17,7 @@ class LeaseManager:
                 lease_info = response.json()
                 self.mark_reserved(lease_info['id'])
                 active_tanks += 1
-                print(f"Leasing {ticker} storage {lease_info['id']}")
+                log.info('leases', "Leasing {} storage {}", ticker, lease_info['id'])
 
     def mark_reserved(self, lease_id):
         self.reserved_lease_ids.add(lease_id)
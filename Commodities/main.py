@@ -1,13 +1,24 @@
 # main.py
 
 from master import MasterController
+from helpers import log
 
 API_KEY = 'QDSFW62B'
 
 sleep_time = 0.1
+record_dir = 'recordings'   # set to None to disable session recording
+latency_stats = True        # set to False to disable API latency instrumentation
+profile_dir = 'profiles'    # per-tick stage profile records; None to disable
+sample_interval = None      # e.g. 0.005 to attach the sampling profiler
+log_dir = 'logs'            # set to None to log to the console only
+log_levels = {}             # per-category levels, e.g. {'hedge': asynclog.WARNING}
+market_data_hub = None      # e.g. ('localhost', 9998) to read market data from mdhub.py
 
 def main():
-    controller = MasterController(API_KEY, sleep_time)
+    log.configure(log_dir, levels=log_levels)
+    controller = MasterController(API_KEY, sleep_time, record_dir, latency_stats,
+                                  profile_dir=profile_dir, sample_interval=sample_interval,
+                                  market_data_hub=market_data_hub)
     controller.run()
 
 if __name__ == "__main__":
@@ -4,72 +4,118 @@ from fundamental import FundamentalModel
 from storage import StorageModel
 from transport import TransportModel
 from refinery import RefineryModel
-from helpers import RITSession
+from helpers import RITSession, log, quantity_filled
+from netting import net_trades
+from profiler import StageProfiler, SamplingProfiler
 import hedge_manager
 import lease_manager
 import event_scheduler
 import time
 
-CRUDE_TICKERS = ['CL', 'CL-AK', 'CL-NYC', 'CL-1F', 'CL-2F']
-PRODUCT_TICKERS = ['HO', 'RB']
-
-GROSS_LIMIT = 500
-NET_LIMIT = 100
-
 class MasterController:
-    def __init__(self, api_key, sleep_time):
-        self.session = RITSession(api_key)
+    def __init__(self, api_key, sleep_time, record_dir=None, latency_stats=False, session=None,
+                 profile_dir=None, sample_interval=None, market_data_hub=None):
+        self.session = session or RITSession(api_key, record_dir, latency_stats, market_data_hub)
         self.market_state = {
             'pipeline_costs': {
                 'AK-CS-PIPE': 40000,
                 'CS-NYC-PIPE': 20000
             }
         }
+        self.event_scheduler = event_scheduler.EventScheduler()
         self.lease_manager = lease_manager.LeaseManager(self.session)
-        self.hedge_manager = hedge_manager.HedgeManager(self.session)
+        self.hedge_manager = hedge_manager.HedgeManager(self.session, self.event_scheduler)
 
         self.fundamental_model = FundamentalModel(self.session, self.market_state, self.lease_manager)
 
         self.models = [
             self.fundamental_model,
-            # StorageModel(self.session, self.lease_manager),
+            # StorageModel(self.session, self.lease_manager, self.event_scheduler),
             TransportModel(self.session, self.market_state, self.lease_manager, self.fundamental_model.get_cl_prediction),
-            RefineryModel(self.session, self.lease_manager, self.hedge_manager, self.fundamental_model.get_cl_forecast)
+            RefineryModel(self.session, self.lease_manager, self.hedge_manager, self.event_scheduler, self.fundamental_model.get_cl_forecast)
         ]
 
-        self.hedge_manager = hedge_manager.HedgeManager(self.session)
-        self.event_scheduler = event_scheduler.EventScheduler()
         self.sleep_time = sleep_time
 
+        # Per-stage timing of step(); per-tick records go to profile_dir if set
+        self.profiler = StageProfiler('commodities', profile_dir)
+        self.profiler.attach(self.session.session)
+        self.model_stages = [f"{type(model).__name__}.update" for model in self.models]
+        self.sampler = None
+        if sample_interval:
+            self.sampler = SamplingProfiler(f"{profile_dir or 'profiles'}/commodities-{time.strftime('%Y%m%d-%H%M%S')}.stacks",
+                                            sample_interval)
+
     def run(self):
         while True:
+            self.step()
+            time.sleep(self.sleep_time)
+
+    def step(self):
+        stage = self.profiler.stage
+
+        with stage('snapshot'):
             tick = self.session.get_tick()
             period = self.session.get_period()
             prices = self.session.get_prices()
 
+        with stage('event_scheduler.update'):
             self.event_scheduler.update(tick, period)
 
-            for model in self.models:
+        for model, name in zip(self.models, self.model_stages):
+            with stage(name):
                 model.update(tick, period)
 
+        with stage('rank'):
+            # Every signal each model has ready, scored with the model's
+            # estimate as of its first one
             trade_candidates = []
+            sources = {}
             for model in self.models:
                 trade = model.best_trade()
                 if trade:
                     est_profit, certainty = model.expected_profit()
                     score = est_profit * certainty
-                    trade_candidates.append((score, trade))
+                    while trade:
+                        trade_candidates.append((score, trade))
+                        sources[id(trade)] = model
+                        trade = model.best_trade()
 
-            trade_candidates.sort(reverse=True, key=lambda x: x[0])
+        with stage('allocate'):
+            selected = self.session.risk.allocate(trade_candidates)
+        if len(selected) < len(trade_candidates):
+            # Trades that don't fit this step stay queued in their model
+            chosen = {id(trade) for _, trade in selected}
+            held = {}
+            for _, trade in trade_candidates:
+                if id(trade) not in chosen:
+                    log.debug('orders', "[p{}][tick {}] Held (limits): {}", period, tick, trade)
+                    held.setdefault(sources[id(trade)], []).append(trade)
+            for model, trades in held.items():
+                model.requeue(trades)
 
-            for score, trade in trade_candidates:
-                if self.session.within_limits(
-                    trade['ticker'], trade['action'], trade['qty'],
-                    CRUDE_TICKERS, PRODUCT_TICKERS, GROSS_LIMIT, NET_LIMIT):
-                    print(f"[p{period}][tick {tick}] Executing: {trade}")
-                    self.session.place_order(trade['ticker'], trade['action'], trade['qty'])
+        for score, trade in selected:
+            log.info('orders', "[p{}][tick {}] Executing: {}", period, tick, trade)
+        if selected:
+            with stage('net'):
+                orders = net_trades([(sources[id(trade)], trade) for _, trade in selected])
+                for order in orders:
+                    if order.crossed:
+                        log.info('orders', "[p{}][tick {}] Crossed {} {} internally, sending {} {}",
+                                 period, tick, order.crossed, order.ticker, order.action, order.qty)
+                to_send = [order for order in orders if order.qty]
+            with stage('place_orders'):
+                responses = self.session.place_orders([{'ticker': o.ticker, 'action': o.action, 'qty': o.qty}
+                                                       for o in to_send])
+                filled = {id(o): quantity_filled(resp) for o, resp in zip(to_send, responses)}
+            # Each model books its share, internal crosses included
+            for order in orders:
+                for model, trade, done in order.attribute(filled.get(id(order), 0)):
+                    model.on_fill(trade, done)
 
+        with stage('hedge_manager.manage'):
             self.hedge_manager.manage(tick, period, prices)
+        with stage('lease_manager.optimize'):
             self.lease_manager.optimize(tick, prices)
 
-            time.sleep(self.sleep_time)
+        self.profiler.end_loop(tick, period)
@@ -0,0 +1,52 @@
+# netting.py
+#
+# Internal crossing of the models' trades before they reach RIT. When one
+# model buys a ticker in the same step another sells it, the overlap is
+# crossed between them and only the difference is sent:
+#
+#   orders = net_trades([(model, trade), ...])
+#   for order in orders:
+#       if order.qty:
+#           filled = <quantity_filled of the order sent for order.qty>
+#       for model, trade, qty in order.attribute(filled):
+#           model.on_fill(trade, qty)
+#
+# The crossed quantity counts as filled for both sides. What RIT fills of the
+# net order goes to the trades on that side in the order they were given
+# (best score first, as allocate() returns them), so each model is credited
+# with what was actually done for it.
+#
+# HedgeManager's hedges and roll legs are not netted: they are sent inside
+# the step that decides them (RefineryModel books the hedge size that comes
+# back, and each roll leg is sized from the previous one's fill), so they
+# cannot wait for this stage.
+
+class NetOrder:
+    __slots__ = ('ticker', 'action', 'qty', 'crossed', 'legs')
+
+    def __init__(self, ticker, legs):
+        self.ticker = ticker
+        self.legs = legs          # [(source, trade)] for this ticker
+        buys = sum(t['qty'] for _, t in legs if t['action'] == 'BUY')
+        sells = sum(t['qty'] for _, t in legs if t['action'] == 'SELL')
+        self.action = 'BUY' if buys >= sells else 'SELL'
+        self.qty = abs(buys - sells)
+        self.crossed = min(buys, sells)
+
+    def attribute(self, filled):
+        """[(source, trade, qty done)] given what RIT filled of the net qty."""
+        left = {'BUY': self.crossed, 'SELL': self.crossed}
+        left[self.action] += filled
+        out = []
+        for source, trade in self.legs:
+            done = min(trade['qty'], left[trade['action']])
+            left[trade['action']] -= done
+            out.append((source, trade, done))
+        return out
+
+def net_trades(trades):
+    """Group [(source, trade)] by ticker into NetOrders, first-seen ticker first."""
+    legs = {}
+    for source, trade in trades:
+        legs.setdefault(trade['ticker'], []).append((source, trade))
+    return [NetOrder(ticker, group) for ticker, group in legs.items()]
@@ -2,12 +2,17 @@
 
 import time
 from price_predictor import PricePredictor
+from event_scheduler import REFINERY_CUTOFF, FLATTEN
+from helpers import log
+from risk import NET_LIMIT
+from signal_model import SignalModel
 
-class RefineryModel:
-    def __init__(self, session, lease_manager, hedge_manager, get_cl_forecast):
+class RefineryModel(SignalModel):
+    def __init__(self, session, lease_manager, hedge_manager, event_scheduler, get_cl_forecast):
         self.session = session
         self.lease_manager = lease_manager
         self.hedge_manager = hedge_manager
+        self.event_scheduler = event_scheduler
         self.predictor = PricePredictor(get_cl_forecast)
         self.signals = []
         self.lease_id = None
@@ -21,22 +26,30 @@ class RefineryModel:
         self.hold_start_tick = None
         self.max_hold_ticks = 50
         self.last_hedge_qty = 0
+        self.past_cutoff = False
+        event_scheduler.subscribe(REFINERY_CUTOFF | FLATTEN, self.on_event)
+
+    def on_event(self, events, tick, period):
+        if events & REFINERY_CUTOFF:
+            self.past_cutoff = True
+        if events & FLATTEN:
+            self.flatten_held_products()
 
     def update(self, tick, period):
         self.tick = tick
         self.period = period
-        self.abs_tick = (period - 1) * 600 + tick
+        self.abs_tick = self.event_scheduler.abs_tick(tick, period)
 
         prices = self.session.get_prices()
         self.predictor.update_last_prices(prices.get('CL'), prices.get('HO'), prices.get('RB'), self.tick)
 
-        if self.abs_tick < 1170:
+        if not self.past_cutoff:
             self.ensure_refinery_leased()
             if not self.refining:
                 self.start_refining_batch()
-        elif self.abs_tick >= 1170 and self.refining is not True:
+        elif self.refining is not True:
             if self.refinery_leased and self.lease_id:
-                print(f"[tick {self.abs_tick}] Ending refinery lease {self.lease_id}")
+                log.info('refinery', "[tick {}] Ending refinery lease {}", self.abs_tick, self.lease_id)
                 self.session.release_lease(self.lease_id)
                 self.refinery_leased = False
                 self.lease_id = None
@@ -53,10 +66,10 @@ class RefineryModel:
 
         expected_pnl, _ = self.expected_profit()
         if expected_pnl < -75000:
-            print(f"[tick {self.abs_tick}] Skipping refinery lease due to low expected PnL: {expected_pnl:.2f}")
+            log.info('refinery', "[tick {}] Skipping refinery lease due to low expected PnL: {:.2f}", self.abs_tick, expected_pnl)
             return
 
-        print(f"[tick {self.abs_tick}] Leasing CL-REFINERY")
+        log.info('refinery', "[tick {}] Leasing CL-REFINERY", self.abs_tick)
 
         for attempt in range(5):
             self.session.lease('CL-REFINERY')
@@ -70,25 +83,26 @@ class RefineryModel:
                     self.lease_id = x['id']
                     self.refinery_leased = True
                     self.lease_tick_log.append((self.abs_tick, self.abs_tick + 45))
-                    print(f"[tick {self.abs_tick}] Successfully obtained CL-REFINERY lease on attempt {attempt+1}")
+                    log.info('refinery', "[tick {}] Successfully obtained CL-REFINERY lease on attempt {}", self.abs_tick, attempt + 1)
                     return
                 
-            print(f"[tick {self.abs_tick}] Failed to obtain refinery lease (attempt {attempt+1}), retrying...")
+            log.warning('refinery', "[tick {}] Failed to obtain refinery lease (attempt {}), retrying...", self.abs_tick, attempt + 1)
 
             time.sleep(0.2)
 
     def start_refining_batch(self):
-        positions = self.session.session.get('http://localhost:9999/v1/securities').json()
-        cl_position = next((sec['position'] for sec in positions if sec['ticker'] == 'CL'), 0)
+        cl_position = self.session.risk.position('CL')
 
         if cl_position < 30:
             self.lease_manager.request_storage('CL-STORAGE', 3)
-            self.session.place_order('CL', 'BUY', 30)
+            qty = self.session.risk.fit('CL', 'BUY', 30 - cl_position)
+            if qty:
+                self.session.place_order('CL', 'BUY', qty)
             return
         
-        print(f"[tick {self.abs_tick}] Starting new refining batch")
+        log.info('refinery', "[tick {}] Starting new refining batch", self.abs_tick)
         time.sleep(0.2)
-        self.session.session.post(f'http://localhost:9999/v1/leases/{self.lease_id}', params={'from1': 'CL', 'quantity1': 30})
+        self.session.use_lease(self.lease_id, from1='CL', quantity1=30)
 
         # Hedging
         _, certainty = self.expected_profit()
@@ -112,15 +126,14 @@ class RefineryModel:
             self.last_hedge_qty = 0
 
         prediction = self.predictor.predict()
-        pos = self.session.session.get('http://localhost:9999/v1/securities').json()
-        ho_pos = next((x['position'] for x in pos if x['ticker'] == 'HO'), 0)
-        rb_pos = next((x['position'] for x in pos if x['ticker'] == 'RB'), 0)
+        ho_pos = self.session.risk.position('HO')
+        rb_pos = self.session.risk.position('RB')
 
         total_product = ho_pos + 10 + rb_pos + 20
 
         self.hold_start_tick = self.abs_tick
 
-        if total_product <= 100:
+        if total_product <= NET_LIMIT:
             if prediction['HO'] != 'up':
                 self.signals.append({'ticker': 'HO', 'action': 'SELL', 'qty': 10, 'note': 'Sell HO after refining'})
                 self.holding_ho = False
@@ -155,10 +168,14 @@ class RefineryModel:
             self.signals.append({'ticker': 'RB', 'action': 'SELL', 'qty': 20, 'note': 'Delayed sell of held RB'})
             self.holding_rb = False
 
-    def best_trade(self):
-        if not self.signals:
-            return None
-        return self.signals.pop(0)
+    def flatten_held_products(self):
+        """Sell whatever refined product is still held before the period ends."""
+        if self.holding_ho:
+            self.signals.append({'ticker': 'HO', 'action': 'SELL', 'qty': 10, 'note': 'Flatten held HO before period end'})
+            self.holding_ho = False
+        if self.holding_rb:
+            self.signals.append({'ticker': 'RB', 'action': 'SELL', 'qty': 20, 'note': 'Flatten held RB before period end'})
+            self.holding_rb = False
 
     def expected_profit(self):
         prices = self.session.get_prices()
@@ -0,0 +1,207 @@
+# risk.py
+#
+# Pre-trade risk for the COM5 models. RiskEngine keeps our positions and the
+# gross / net-crude / net-product exposure in memory, so "can I do this trade"
+# is answered without downloading /securities:
+#
+#   - sync() takes positions from a /securities snapshot the caller already
+#     has (RITSession.get_prices feeds every one it decodes)
+#   - reserve()/settle() bracket each order: capacity is held while the order
+#     is in flight and replaced by the filled quantity once RIT answers; a
+#     LIMIT order left resting keeps its unfilled remainder reserved until
+#     release() (cancelled) or sync_orders() sees it fill or disappear
+#   - invalidate() marks positions stale after anything that moves them
+#     outside an order (lease conversions, pipelines); the next question
+#     re-fetches once
+#
+# Every update touches one ticker and adjusts the running sums, so checks and
+# updates are O(1). allocate() picks the best batch of trades that fits the
+# limits together, for submitting all at once.
+
+import threading
+
+CRUDE_TICKERS = ['CL', 'CL-AK', 'CL-NYC', 'CL-1F', 'CL-2F']
+PRODUCT_TICKERS = ['HO', 'RB']
+
+GROSS_LIMIT = 500
+NET_LIMIT = 100
+
+MAX_CANDIDATES = 24       # highest-scoring trades considered by allocate()
+
+def _signed(action, qty):
+    return qty if action == 'BUY' else -qty
+
+class RiskEngine:
+    def __init__(self, fetch_positions, gross_limit=GROSS_LIMIT, net_limit=NET_LIMIT,
+                 crude=CRUDE_TICKERS, products=PRODUCT_TICKERS):
+        self.fetch_positions = fetch_positions
+        self.gross_limit = gross_limit
+        self.net_limit = net_limit
+        self.group = {t: 'crude' for t in crude}
+        self.group.update({t: 'product' for t in products})
+
+        self.positions = {}       # ticker -> filled position
+        self.reserved = {}        # ticker -> signed quantity in flight
+        self.gross = 0
+        self.net = {'crude': 0, 'product': 0}
+        self.resting = {}         # order_id -> (ticker, signed quantity still resting)
+        self.stale = True
+        self.lock = threading.Lock()      # orders may settle from worker threads
+
+    ###########################################################################
+    # Updates
+    ###########################################################################
+    def _move(self, ticker, delta, reserved=0):
+        """Shift ticker's exposure (position + reserved) by delta + reserved."""
+        group = self.group.get(ticker)
+        with self.lock:
+            before = self.positions.get(ticker, 0) + self.reserved.get(ticker, 0)
+            if delta:
+                self.positions[ticker] = self.positions.get(ticker, 0) + delta
+            if reserved:
+                self.reserved[ticker] = self.reserved.get(ticker, 0) + reserved
+            if group is None:
+                return
+            after = before + delta + reserved
+            self.gross += abs(after) - abs(before)
+            self.net[group] += after - before
+
+    def sync(self, positions):
+        """Take positions from a /securities snapshot ({ticker: position})."""
+        for ticker, position in positions.items():
+            delta = position - self.positions.get(ticker, 0)
+            if delta:
+                self._move(ticker, delta)
+        self.stale = False
+
+    def invalidate(self):
+        self.stale = True
+
+    def _fresh(self):
+        if self.stale:
+            self.sync(self.fetch_positions())
+
+    def reserve(self, ticker, action, qty):
+        """Hold capacity for an order about to be sent."""
+        self._move(ticker, 0, _signed(action, qty))
+
+    def settle(self, ticker, action, qty, filled, order_id=None, resting=False):
+        """
+        Release a reservation made by reserve() and book what was filled. If
+        the order is resting on the book, its unfilled remainder stays held.
+        """
+        rest = qty - filled if resting and order_id is not None else 0
+        self._move(ticker, _signed(action, filled), _signed(action, rest - qty))
+        if rest > 0:
+            self.resting[order_id] = (ticker, _signed(action, rest))
+
+    def release(self, order_id):
+        """Drop a resting order's reservation (cancelled); its fills arrive via sync()."""
+        entry = self.resting.pop(order_id, None)
+        if entry:
+            self._move(entry[0], 0, -entry[1])
+
+    def sync_orders(self, open_orders):
+        """
+        Shrink resting reservations to what an /orders?status=OPEN snapshot
+        still shows unfilled; orders missing from it are released.
+        """
+        still = {o['order_id']: o for o in open_orders}
+        for order_id, (ticker, rest) in list(self.resting.items()):
+            order = still.get(order_id)
+            if order is None:
+                self.release(order_id)
+                continue
+            left = _signed(order['action'], order['quantity'] - order.get('quantity_filled', 0))
+            if left != rest:
+                self._move(ticker, 0, left - rest)
+                self.resting[order_id] = (ticker, left)
+
+    ###########################################################################
+    # Questions
+    ###########################################################################
+    def position(self, ticker):
+        self._fresh()
+        return self.positions.get(ticker, 0)
+
+    def exposure(self):
+        """(gross, net crude, net product), in-flight orders included."""
+        self._fresh()
+        return self.gross, self.net['crude'], self.net['product']
+
+    def headroom(self):
+        """Lots still available under (gross, net crude, net product) limits."""
+        gross, crude, product = self.exposure()
+        return self.gross_limit - gross, self.net_limit - abs(crude), self.net_limit - abs(product)
+
+    def allows(self, ticker, action, qty):
+        """
+        Would this trade keep us within limits? Gross is charged the full qty
+        even when the trade reduces a position, as the limit checks always were.
+        """
+        gross, crude, product = self.exposure()
+        group = self.group.get(ticker)
+        if group == 'crude':
+            crude += _signed(action, qty)
+        elif group == 'product':
+            product += _signed(action, qty)
+        gross += qty
+        return gross <= self.gross_limit and abs(crude) <= self.net_limit and abs(product) <= self.net_limit
+
+    def fit(self, ticker, action, qty):
+        """
+        Largest part of qty that allows() would accept, or 0 if none would.
+        When a net is over its limit, a trade against it must be big enough
+        to bring it back inside.
+        """
+        gross, crude, product = self.exposure()
+        group = self.group.get(ticker)
+        high = min(qty, self.gross_limit - gross)
+        low = 1
+        for name, net in (('crude', crude), ('product', product)):
+            if name == group:
+                sign = _signed(action, 1)
+                high = min(high, self.net_limit - sign * net)
+                low = max(low, -self.net_limit - sign * net)
+            elif abs(net) > self.net_limit:
+                return 0
+        return high if high >= low else 0
+
+    def allocate(self, candidates):
+        """
+        Best subset of [(score, trade)] to send together: the most total
+        positive score, then the most trades, such that the batch fits the
+        limits in whatever order RIT fills it. Gross is charged every trade's
+        qty; on each net limit the buys and the sells must each fit on their
+        own. Returns the chosen (score, trade) pairs, best score first.
+        """
+        gross, crude, product = self.exposure()
+        net = {'crude': crude, 'product': product}
+        room = [self.gross_limit - gross]
+        dims = {}
+        for group in ('crude', 'product'):
+            for sign in (1, -1):
+                dims[(group, sign)] = len(room)
+                room.append(self.net_limit - sign * net[group])
+
+        ranked = sorted(candidates, key=lambda c: c[0], reverse=True)[:MAX_CANDIDATES]
+        # Sparse DP over used capacity: state -> (value, count, chosen indices)
+        states = {(0,) * len(room): (0.0, 0, ())}
+        for i, (score, trade) in enumerate(ranked):
+            qty = trade['qty']
+            group = self.group.get(trade['ticker'])
+            dim = dims[(group, 1 if trade['action'] == 'BUY' else -1)] if group else None
+            value = max(score, 0)
+            for used, (total, count, chosen) in list(states.items()):
+                new = list(used)
+                new[0] += qty
+                if dim is not None:
+                    new[dim] += qty
+                if new[0] > room[0] or (dim is not None and new[dim] > room[dim]):
+                    continue
+                new = tuple(new)
+                best = states.get(new)
+                if best is None or (total + value, count + 1) > best[:2]:
+                    states[new] = (total + value, count + 1, chosen + (i,))
+        _, _, chosen = max(states.values(), key=lambda s: s[:2])
+        return [ranked[i] for i in chosen]
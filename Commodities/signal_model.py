@@ -0,0 +1,21 @@
+# signal_model.py
+#
+# Base for the models that queue trade signals for MasterController. A model
+# appends {'ticker', 'action', 'qty', ...} dicts to self.signals; the master
+# takes them with best_trade(), hands back the ones it could not send with
+# requeue(), and reports what was done for each sent one with on_fill().
+
+class SignalModel:
+    def best_trade(self):
+        if not self.signals:
+            return None
+        return self.signals.pop(0)
+
+    def requeue(self, trades):
+        """Put trades taken with best_trade() but not sent back at the front."""
+        self.signals[:0] = trades
+
+    def on_fill(self, trade, filled):
+        """Keep what a partial fill left of trade queued."""
+        if 0 < filled < trade['qty']:
+            self.requeue([dict(trade, qty=trade['qty'] - filled)])
@@ -1,7 +1,11 @@
-class StorageModel:
-    def __init__(self, session, lease_manager, fundamental_model=None):
+from event_scheduler import FUTURES_EXPIRY
+from signal_model import SignalModel
+
+class StorageModel(SignalModel):
+    def __init__(self, session, lease_manager, event_scheduler, fundamental_model=None):
         self.session = session
         self.lease_manager = lease_manager
+        self.event_scheduler = event_scheduler
         self.signals = []
         self.active_arb = None
         self.pending_release_check = False
@@ -11,6 +15,7 @@ class StorageModel:
     def update(self, tick, period):
         self.tick = tick
         self.period = period
+        self.abs_tick = self.event_scheduler.abs_tick(tick, period)
 
         if self.pending_release_check:
             self.check_and_release_leases()
@@ -35,7 +40,7 @@ class StorageModel:
         return cl_price + days * 0.05
 
     def estimate_expected_pnl_spot_fut(self, cl, fut_price, fut_expiry_tick, direction):
-        fair_value = self.theoretical_future_price(cl, self.tick, fut_expiry_tick)
+        fair_value = self.theoretical_future_price(cl, self.abs_tick, fut_expiry_tick)
         spread = fut_price - fair_value
         if direction == "long_CL":
             return spread * 1000 * 10 - 20
@@ -53,7 +58,7 @@ class StorageModel:
 
         fut = 'CL-1F' if self.period == 1 else 'CL-2F'
         fut_price = cl1f if fut == 'CL-1F' else cl2f
-        expiry_tick = 600 if fut == 'CL-1F' else 1200
+        expiry_tick = self.event_scheduler.next_event(FUTURES_EXPIRY, self.tick, self.period)
 
         expected_pnl = self.estimate_expected_pnl_spot_fut(cl, fut_price, expiry_tick, "long_CL")
         if expected_pnl > 100:
@@ -66,7 +71,7 @@ class StorageModel:
                 'short': fut,
                 'long_entry': cl,
                 'short_entry': fut_price,
-                'tick_entered': self.tick,
+                'tick_entered': self.abs_tick,
                 'expiry_tick': expiry_tick,
                 'storage_leased': 1
             }
@@ -83,9 +88,9 @@ class StorageModel:
 
         spread_change = (long_price - short_price) - (self.active_arb['long_entry'] - self.active_arb['short_entry'])
         pnl = spread_change * 1000 * 10
-        hold_ticks = self.tick - self.active_arb['tick_entered']
+        hold_ticks = self.abs_tick - self.active_arb['tick_entered']
 
-        if self.tick >= self.active_arb['expiry_tick'] - 20 or pnl >= 150 or hold_ticks >= 80:
+        if self.abs_tick >= self.active_arb['expiry_tick'] - 20 or pnl >= 150 or hold_ticks >= 80:
             self.exit_positions()
 
     def exit_positions(self):
@@ -95,11 +100,6 @@ class StorageModel:
             self.pending_release_check = True
         self.active_arb = None
 
-    def best_trade(self):
-        if not self.signals:
-            return None
-        return self.signals.pop(0)
-
     def expected_profit(self):
         if not self.active_arb:
             return 0, 0
@@ -1,8 +1,13 @@
 # transport.py
 
 from collections import defaultdict
+from helpers import log
+from signal_model import SignalModel
 
-class TransportModel:
+AK_CL_MIN_PROFIT = 0.4    # $/bbl left after pipeline and storage costs
+CL_NYC_MIN_PROFIT = 0.6
+
+class TransportModel(SignalModel):
     def __init__(self, session, market_state, lease_manager, cl_prediction_func):
         self.session = session
         self.market_state = market_state
@@ -49,7 +54,7 @@ class TransportModel:
         if cl_ak and cl and cl_pred != 'down':  # don't buy if CL expected to fall
             route_id = 'AK->CL'
             profit = cl - (cl_ak + cost_ak_cs / 10000 + 0.10)
-            while profit > 0.4 and self.in_flight[route_id] + 10 <= 100: 
+            while profit > AK_CL_MIN_PROFIT and self.in_flight[route_id] + 10 <= 100:
                 if not self.check_storage_capacity('AK-STORAGE') or not self.check_position_limits('CL-AK', 10):
                     break
                 self.in_flight[route_id] += 10
@@ -65,13 +70,13 @@ class TransportModel:
                     'route_id': route_id, 'leased_dest': False
                 })
 
-                print(f"[p{self.period}] [tick {self.tick}] Performing normal arbitrage from AK->CL")
+                log.info('transport', "[p{}] [tick {}] Performing normal arbitrage from AK->CL", self.period, self.tick)
 
         # CL → NYC arbitrage
         if cl and cl_nyc and cl_pred != 'up':  # don't ship if CL expected to rise
             route_id = 'CL->NYC'
             profit = cl_nyc - (cl + cost_cs_nyc / 10000 + 0.10)
-            while profit > 0.6 and self.in_flight[route_id] + 10 <= 100: #0.6
+            while profit > CL_NYC_MIN_PROFIT and self.in_flight[route_id] + 10 <= 100:
                 if not self.check_storage_capacity('CL-STORAGE') or not self.check_position_limits('CL', 10):
                     break
                 self.in_flight[route_id] += 10
@@ -87,7 +92,7 @@ class TransportModel:
                     'route_id': route_id, 'leased_dest': False
                 })
 
-                print(f"[p{self.period}] [tick {self.tick}] Performing normal arbitrage from AK->CL")
+                log.info('transport', "[p{}] [tick {}] Performing normal arbitrage from AK->CL", self.period, self.tick)
 
     def check_storage_capacity(self, ticker):
         leases = self.session.session.get('http://localhost:9999/v1/leases').json()
@@ -95,15 +100,7 @@ class TransportModel:
         return count < 10
 
     def check_position_limits(self, ticker, qty):
-        crude = ['CL', 'CL-AK', 'CL-NYC', 'CL-1F', 'CL-2F']
-        prod = ['HO', 'RB']
-        gross, net_crude, net_prod = self.session.get_limits(crude, prod)
-        if ticker in crude:
-            net_crude += qty
-        elif ticker in prod:
-            net_prod += qty
-        gross += qty
-        return gross <= 500 and abs(net_crude) <= 100 and abs(net_prod) <= 100
+        return self.session.risk.allows(ticker, 'BUY', qty)
 
     def release_storage(self, ticker):
         leases = self.session.session.get('http://localhost:9999/v1/leases').json()
@@ -135,11 +132,6 @@ class TransportModel:
                     self.in_flight[t['route_id']] -= t['qty']
                 self.pending_transports.remove(t)
 
-    def best_trade(self):
-        if not self.signals:
-            return None
-        return self.signals.pop(0)
-
     def expected_profit(self):
         if not self.pending_transports:
             return 0, 0
@@ -1,7 +1,22 @@
+import os
+import sys
 import signal
+import time
 import requests
 from time import sleep
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Tools'))
+from recorder import SessionRecorder
+from latency import LatencyMonitor
+from mdhub import MarketDataClient
+from fastjson import decode_book, decode_securities
+from orderbook import OrderBook
+from cancels import select_cancels, cancel_orders
+from openorders import OpenOrders
+from spoofing import SpoofDetector
+from pacing import Pacer
+from asynclog import get_logger
+
 class ApiException(Exception):
     pass
 
@@ -11,8 +26,15 @@ def signal_handler(signum, frame):
     shutdown = True
 
 API_KEY = {'X-API-Key': 'QDSFW62B'}
+RECORD_DIR = 'recordings'   # set to None to disable session recording
+LATENCY_STATS = True        # set to False to disable API latency instrumentation
+LOG_DIR = 'logs'            # set to None to log to the console only
+LOG_LEVELS = {}             # per-category levels, e.g. {'quotes': asynclog.DEBUG}
+MARKET_DATA_HUB = None      # e.g. ('localhost', 9998) to read market data from mdhub.py
 shutdown = False
 
+log = get_logger('mm_algo2')
+
 ###############################################################################
 # PARAMETERS
 ###############################################################################
@@ -20,6 +42,7 @@ shutdown = False
 # General
 orderslimit = 6
 ordersize   = 4000
+reconcile_every = 10    # loops between full /orders snapshots
 
 # Short-term trend detection
 WINDOW_SIZE          = 10
@@ -35,6 +58,10 @@ HIGH_NBBO_CHANGE = 0.03
 IMPROVE_AMOUNT      = 0.01
 MIN_SPREAD_REQUIRED = 0.03
 
+# Loop pacing (adapts to the case speed; no per-speed speedbump to edit)
+REFRESHES_PER_TICK   = 5     # quote refreshes per case tick
+MAX_CALLS_PER_SECOND = 50    # API calls per second to stay under; None to disable
+
 ###############################################################################
 
 
@@ -46,11 +73,13 @@ endtime   = 300
 POSITION_LIMIT = 24000
 rebalancesize   = 500
 rebalance_limit = 4000
-BASE_SPEEDBUMP = 0.2
 MID_PRICE_WINDOW = []
 NBBO_MOVES = []
 prev_best_bid = None
 prev_best_ask = None
+ORDER_BOOKS = {}    # ticker -> OrderBook, updated in place each loop
+PACER = Pacer(REFRESHES_PER_TICK, MAX_CALLS_PER_SECOND)    # loop cadence from measured tick length
+OPEN_ORDERS = OpenOrders(reconcile_every)    # our resting orders, kept locally
 ###############################################################################
 
 
@@ -62,10 +91,9 @@ def get_position(session, ticker):
     resp = session.get('http://localhost:9999/v1/securities')
     if not resp.ok:
         raise ApiException("Error getting securities info")
-    data = resp.json()
-    for sec in data:
-        if sec['ticker'] == ticker:
-            return sec['position']
+    security = decode_securities(resp).get(ticker)
+    if security is not None:
+        return security.position
     return 0
 
 def ticker_bid_ask(session, ticker):
@@ -73,27 +101,40 @@ def ticker_bid_ask(session, ticker):
     resp = session.get('http://localhost:9999/v1/securities/book', params=payload)
     if not resp.ok:
         raise ApiException(f"Error getting book for {ticker}")
-    book = resp.json()
-    best_bid = book['bids'][0]['price']
-    best_ask = book['asks'][0]['price']
+    book = ORDER_BOOKS.get(ticker)
+    if book is None:
+        book = ORDER_BOOKS[ticker] = OrderBook(ticker)
+    book.apply(decode_book(resp))
+    best_bid = book.bid_prices[0]
+    best_ask = book.ask_prices[0]
     return best_bid, best_ask, book
 
 def get_tick(session):
     resp = session.get('http://localhost:9999/v1/case')
     if resp.status_code == 401:
         raise ApiException("Response error in get_tick")
-    return resp.json()['tick']
-
-def get_orders(session, status):
-    payload = {'status': status}
-    resp = session.get('http://localhost:9999/v1/orders', params=payload)
-    if not resp.ok:
-        raise ApiException("Error getting orders")
-    return resp.json()
+    tick = resp.json()['tick']
+    PACER.observe_tick(tick, time.monotonic())
+    return tick
+
+def place_quote(session, ticker, action, quantity, price):
+    """Post a limit order unless we already rest that size at that price."""
+    if OPEN_ORDERS.resting(ticker, action, price) >= quantity:
+        return False
+    resp = session.post('http://localhost:9999/v1/orders',
+                        params={'ticker': ticker,
+                                'type': 'LIMIT',
+                                'quantity': quantity,
+                                'action': action,
+                                'price': price})
+    if resp.ok:
+        OPEN_ORDERS.add(resp.json())
+    return True
 
 def flatten_excess_position(session, ticker_sym, position):
     if position > POSITION_LIMIT:
         excess = position - POSITION_LIMIT
+        log.info('risk', "Position {} above limit; selling {} {}", position, excess, ticker_sym)
         # Sell the excess
         session.post('http://localhost:9999/v1/orders',
                      params={'ticker': ticker_sym,
@@ -102,6 +143,7 @@ def flatten_excess_position(session, ticker_sym, position):
                              'action': 'SELL'})
     elif position < -POSITION_LIMIT:
         excess = abs(position) - POSITION_LIMIT
+        log.info('risk', "Position {} below limit; buying {} {}", position, excess, ticker_sym)
         # Buy the excess
         session.post('http://localhost:9999/v1/orders',
                      params={'ticker': ticker_sym,
@@ -118,47 +160,20 @@ def flatten_excess_position(session, ticker_sym, position):
 
 SPOOF_SIZE_THRESHOLD   = 20000
 SPOOF_DISAPPEAR_TICKS  = 2  
-last_top_bid_qty       = None
-last_top_ask_qty       = None
-spoof_events           = [] 
+SPOOF_DETECTOR         = SpoofDetector(SPOOF_SIZE_THRESHOLD, SPOOF_DISAPPEAR_TICKS)
 spoof_suspect_count    = 0
 CHANNEL_STUFF_THRESHOLD = 500
 
 def detect_spoofing(book, tick):
     """
-    If best bid or ask jumps by > SPOOF_SIZE_THRESHOLD from last iteration,
-    record an event. If that size disappears within SPOOF_DISAPPEAR_TICKS, 
-    increment suspect count.
+    If any level on either side grows by > SPOOF_SIZE_THRESHOLD and half of
+    that size is pulled again within SPOOF_DISAPPEAR_TICKS, increment suspect
+    count. Per-side scores are kept in SPOOF_DETECTOR.
     """
-    global last_top_bid_qty, last_top_ask_qty, spoof_suspect_count
-
-    top_bid_qty = book['bids'][0]['quantity']
-    top_ask_qty = book['asks'][0]['quantity']
-
-    # Check for big jump
-    if last_top_bid_qty is not None and (top_bid_qty - last_top_bid_qty > SPOOF_SIZE_THRESHOLD):
-        spoof_events.append({'tick': tick, 'side': 'BID', 'qty': top_bid_qty})
-    if last_top_ask_qty is not None and (top_ask_qty - last_top_ask_qty > SPOOF_SIZE_THRESHOLD):
-        spoof_events.append({'tick': tick, 'side': 'ASK', 'qty': top_ask_qty})
-
-    # Check if these events vanished
-    remove_list = []
-    for evt in spoof_events:
-        if tick - evt['tick'] >= SPOOF_DISAPPEAR_TICKS:
-            # see if it vanished
-            if evt['side'] == 'BID':
-                if top_bid_qty < evt['qty'] / 2:
-                    spoof_suspect_count += 1
-            else:
-                if top_ask_qty < evt['qty'] / 2:
-                    spoof_suspect_count += 1
-            remove_list.append(evt)
-
-    for evt in remove_list:
-        spoof_events.remove(evt)
-
-    last_top_bid_qty = top_bid_qty
-    last_top_ask_qty = top_ask_qty
+    global spoof_suspect_count
+    found = SPOOF_DETECTOR.update(book, tick)
+    spoof_suspect_count += found
+    return found
 
 def detect_channel_stuffing(total_open):
     """
@@ -176,11 +191,20 @@ def main():
     global prev_best_bid, prev_best_ask
     with requests.Session() as s:
         s.headers.update(API_KEY)
+        log.configure(LOG_DIR, levels=LOG_LEVELS)
+        if RECORD_DIR:
+            SessionRecorder(RECORD_DIR, 'mm_algo2').attach(s)
+        if MARKET_DATA_HUB:
+            MarketDataClient(MARKET_DATA_HUB).attach(s)
+        if LATENCY_STATS:
+            LatencyMonitor('mm_algo2').attach(s)
+        PACER.attach(s)
 
         ticker_sym = 'ALGO'
         tick = get_tick(s)
 
         while tick < endtime and not shutdown:
+            OPEN_ORDERS.maybe_reconcile(s)
 
             # 1) Get NBBO + Book (and detect spoofing)
             best_bid, best_ask, book = ticker_bid_ask(s, ticker_sym)
@@ -204,14 +228,15 @@ def main():
                 avg_nbbo_move = 0.0
 
             if avg_nbbo_move > HIGH_NBBO_CHANGE:
-                dynamic_speedbump = BASE_SPEEDBUMP * 1.5
+                speedbump_scale = 1.5
             elif avg_nbbo_move < LOW_NBBO_CHANGE:
-                dynamic_speedbump = BASE_SPEEDBUMP * 0.5
+                speedbump_scale = 0.5
             else:
-                dynamic_speedbump = BASE_SPEEDBUMP
+                speedbump_scale = 1.0
 
             # 3) Position & short-term trend
             position = get_position(s, ticker_sym)
+            OPEN_ORDERS.on_position(s, ticker_sym, position)
 
             mid_price = (best_bid + best_ask) / 2.0
             MID_PRICE_WINDOW.append(mid_price)
@@ -252,42 +277,37 @@ def main():
             if spoof_suspect_count > 3:
                 buy_price  -= 0.02
                 sell_price += 0.02
+                log.info('spoofing', "[tick {}] {} spoof suspects (score bid {:.1f} / ask {:.1f}); widening quotes",
+                         tick, spoof_suspect_count, SPOOF_DETECTOR.score('bids'), SPOOF_DETECTOR.score('asks'))
                 spoof_suspect_count = 0  # reset
 
-            # place single buy+sell limit if not crossing
+            # place single buy+sell limit if not crossing (skipping a side we already quote)
             if buy_price < sell_price:
-                s.post('http://localhost:9999/v1/orders',
-                       params={'ticker': ticker_sym,
-                               'type': 'LIMIT',
-                               'quantity': buy_quantity,
-                               'action': 'BUY',
-                               'price': buy_price})
-                s.post('http://localhost:9999/v1/orders',
-                       params={'ticker': ticker_sym,
-                               'type': 'LIMIT',
-                               'quantity': sell_quantity,
-                               'action': 'SELL',
-                               'price': sell_price})
+                place_quote(s, ticker_sym, 'BUY', buy_quantity, buy_price)
+                place_quote(s, ticker_sym, 'SELL', sell_quantity, sell_price)
+                log.debug('quotes', "Quoted {} BUY {} @ {:.2f} / SELL {} @ {:.2f}",
+                          ticker_sym, buy_quantity, buy_price, sell_quantity, sell_price)
 
             # 6) Flatten if we've gone above the POSITION_LIMIT
             flatten_excess_position(s, ticker_sym, position)
 
             # 7) Channel stuffing detection
-            open_orders = get_orders(s, 'OPEN')
-            total_open_orders = len(open_orders)
-            if total_open_orders > CHANNEL_STUFF_THRESHOLD:
+            total_open_orders = len(OPEN_ORDERS)
+            if detect_channel_stuffing(total_open_orders):
                 # if suspected, slow down further
-                dynamic_speedbump *= 1.5
+                speedbump_scale *= 1.5
+                log.warning('risk', "[tick {}] Channel stuffing suspected ({} open orders)", tick, total_open_orders)
 
             # 8) Cleanup if orders exceed 'orderslimit'
-            while len(open_orders) > orderslimit:
-                orderid = open_orders[-1]['order_id']
-                s.delete(f'http://localhost:9999/v1/orders/{orderid}')
-                sleep(dynamic_speedbump)
-                open_orders = get_orders(s, 'OPEN')
-
-            # 9) Sleep dynamic speedbump
-            sleep(dynamic_speedbump)
+            if total_open_orders > orderslimit:
+                stale = select_cancels(OPEN_ORDERS.values(), orderslimit, nbbo={ticker_sym: (best_bid, best_ask)})
+                cancel_orders(s, stale, verify=False)
+                OPEN_ORDERS.discard(stale)
+                log.info('orders', "[tick {}] Cancelled {} stale orders", tick, len(stale))
+
+            # 9) Sleep dynamic speedbump (the pacer's refresh period, scaled)
+            sleep(PACER.pause(time.monotonic(), speedbump_scale))
+            tick = get_tick(s)
 
 ###############################################################################
 
@@ -1,7 +1,21 @@
+import os
+import sys
 import signal
+import time
 import requests
 from time import sleep
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Tools'))
+from recorder import SessionRecorder
+from latency import LatencyMonitor
+from mdhub import MarketDataClient
+from fastjson import decode_book, decode_securities
+from orderbook import OrderBook
+from cancels import select_cancels, cancel_orders
+from fills import FillAnalytics, format_summary
+from pacing import Pacer
+from asynclog import get_logger
+
 class ApiException(Exception):
     pass
 
@@ -11,8 +25,15 @@ def signal_handler(signum, frame):
     shutdown = True
 
 API_KEY = {'X-API-Key': 'QDSFW62B'}
+RECORD_DIR = 'recordings'   # set to None to disable session recording
+LATENCY_STATS = True        # set to False to disable API latency instrumentation
+LOG_DIR = 'logs'            # set to None to log to the console only
+LOG_LEVELS = {}             # per-category levels, e.g. {'quotes': asynclog.DEBUG}
+MARKET_DATA_HUB = None      # e.g. ('localhost', 9998) to read market data from mdhub.py
 shutdown = False
 
+log = get_logger('mm_algo2_tradeeval')
+
 ###############################################################################
 # PARAMETERS
 ###############################################################################
@@ -20,7 +41,6 @@ shutdown = False
 # General
 orderslimit = 6
 ordersize   = 4000
-BASE_SPEEDBUMP = 0.1    # 0.2 for 100% and 0.1 for 200%
 
 # Short-term trend detection
 WINDOW_SIZE          = 10
@@ -32,6 +52,14 @@ TREND_VALUE = 0.0075
 IMPROVE_AMOUNT      = 0.011
 MIN_SPREAD_REQUIRED = 0.03
 
+# Trade evaluation
+EVAL_WINDOW  = 200    # fills / orders kept in each rolling metric
+REPORT_EVERY = 20     # loops between summaries in the log
+
+# Loop pacing (adapts to the case speed; no per-speed speedbump to edit)
+REFRESHES_PER_TICK   = 5     # quote refreshes per case tick
+MAX_CALLS_PER_SECOND = 50    # API calls per second to stay under; None to disable
+
 ###############################################################################
 
 
@@ -46,6 +74,9 @@ rebalance_limit = 4000
 MID_PRICE_WINDOW = []
 prev_best_bid = None
 prev_best_ask = None
+ORDER_BOOKS = {}    # ticker -> OrderBook, updated in place each loop
+PACER = Pacer(REFRESHES_PER_TICK, MAX_CALLS_PER_SECOND)    # loop cadence from measured tick length
+FILLS = FillAnalytics('ALGO', EVAL_WINDOW)    # markouts, fill rates etc. of our quotes
 ###############################################################################
 
 
@@ -57,10 +88,9 @@ def get_position(session, ticker):
     resp = session.get('http://localhost:9999/v1/securities')
     if not resp.ok:
         raise ApiException("Error getting securities info")
-    data = resp.json()
-    for sec in data:
-        if sec['ticker'] == ticker:
-            return sec['position']
+    security = decode_securities(resp).get(ticker)
+    if security is not None:
+        return security.position
     return 0
 
 def ticker_bid_ask(session, ticker):
@@ -68,16 +98,21 @@ def ticker_bid_ask(session, ticker):
     resp = session.get('http://localhost:9999/v1/securities/book', params=payload)
     if not resp.ok:
         raise ApiException(f"Error getting book for {ticker}")
-    book = resp.json()
-    best_bid = book['bids'][0]['price']
-    best_ask = book['asks'][0]['price']
+    book = ORDER_BOOKS.get(ticker)
+    if book is None:
+        book = ORDER_BOOKS[ticker] = OrderBook(ticker)
+    book.apply(decode_book(resp))
+    best_bid = book.bid_prices[0]
+    best_ask = book.ask_prices[0]
     return best_bid, best_ask, book
 
 def get_tick(session):
     resp = session.get('http://localhost:9999/v1/case')
     if resp.status_code == 401:
         raise ApiException("Response error in get_tick")
-    return resp.json()['tick']
+    tick = resp.json()['tick']
+    PACER.observe_tick(tick, time.monotonic())
+    return tick
 
 def get_orders(session, status):
     payload = {'status': status}
@@ -89,6 +124,7 @@ def get_orders(session, status):
 def flatten_excess_position(session, ticker_sym, position):
     if position > POSITION_LIMIT:
         excess = position - POSITION_LIMIT
+        log.info('risk', "Position {} above limit; selling {} {}", position, excess, ticker_sym)
         # Sell the excess
         session.post('http://localhost:9999/v1/orders',
                      params={'ticker': ticker_sym,
@@ -97,6 +133,7 @@ def flatten_excess_position(session, ticker_sym, position):
                              'action': 'SELL'})
     elif position < -POSITION_LIMIT:
         excess = abs(position) - POSITION_LIMIT
+        log.info('risk', "Position {} below limit; buying {} {}", position, excess, ticker_sym)
         # Buy the excess
         session.post('http://localhost:9999/v1/orders',
                      params={'ticker': ticker_sym,
@@ -114,17 +151,28 @@ def main():
     global prev_best_bid, prev_best_ask
     with requests.Session() as s:
         s.headers.update(API_KEY)
+        log.configure(LOG_DIR, levels=LOG_LEVELS)
+        if RECORD_DIR:
+            SessionRecorder(RECORD_DIR, 'mm_algo2_tradeeval').attach(s)
+        if MARKET_DATA_HUB:
+            MarketDataClient(MARKET_DATA_HUB).attach(s)
+        if LATENCY_STATS:
+            LatencyMonitor('mm_algo2_tradeeval').attach(s)
+        PACER.attach(s)
 
         ticker_sym = 'ALGO'
         tick = get_tick(s)
+        loops = 0
 
         while tick < endtime and not shutdown:
 
             # 1) Get NBBO + Book
             best_bid, best_ask, book = ticker_bid_ask(s, ticker_sym)
+            FILLS.on_book(book, tick)
 
             # 3) Position & short-term trend
             position = get_position(s, ticker_sym)
+            FILLS.on_position(position, tick)
 
             mid_price = (best_bid + best_ask) / 2.0
             MID_PRICE_WINDOW.append(mid_price)
@@ -162,32 +210,47 @@ def main():
 
             # place single buy+sell limit if not crossing
             if buy_price < sell_price:
-                s.post('http://localhost:9999/v1/orders',
-                       params={'ticker': ticker_sym,
-                               'type': 'LIMIT',
-                               'quantity': buy_quantity,
-                               'action': 'BUY',
-                               'price': buy_price})
-                s.post('http://localhost:9999/v1/orders',
-                       params={'ticker': ticker_sym,
-                               'type': 'LIMIT',
-                               'quantity': sell_quantity,
-                               'action': 'SELL',
-                               'price': sell_price})
+                resp = s.post('http://localhost:9999/v1/orders',
+                              params={'ticker': ticker_sym,
+                                      'type': 'LIMIT',
+                                      'quantity': buy_quantity,
+                                      'action': 'BUY',
+                                      'price': buy_price})
+                if resp.ok:
+                    FILLS.on_quote(resp.json(), book, tick)
+                resp = s.post('http://localhost:9999/v1/orders',
+                              params={'ticker': ticker_sym,
+                                      'type': 'LIMIT',
+                                      'quantity': sell_quantity,
+                                      'action': 'SELL',
+                                      'price': sell_price})
+                if resp.ok:
+                    FILLS.on_quote(resp.json(), book, tick)
+                log.debug('quotes', "Quoted {} BUY {} @ {:.2f} / SELL {} @ {:.2f}",
+                          ticker_sym, buy_quantity, buy_price, sell_quantity, sell_price)
 
             # 6) Flatten if we've gone above the POSITION_LIMIT
             flatten_excess_position(s, ticker_sym, position)
 
             # 8) Cleanup if orders exceed 'orderslimit'
             open_orders = get_orders(s, 'OPEN')
-            while len(open_orders) > orderslimit:
-                orderid = open_orders[-1]['order_id']
-                s.delete(f'http://localhost:9999/v1/orders/{orderid}')
-                sleep(BASE_SPEEDBUMP)
-                open_orders = get_orders(s, 'OPEN')
-
-            # 9) Sleep dynamic speedbump
-            sleep(BASE_SPEEDBUMP)
+            FILLS.on_orders(open_orders, tick, s)
+            stale = select_cancels(open_orders, orderslimit, nbbo={ticker_sym: (best_bid, best_ask)})
+            if stale:
+                FILLS.on_cancel(stale)
+                still_open = cancel_orders(s, stale)
+                log.info('orders', "Cancelled {} stale orders ({} still open)",
+                         len(stale) - len(still_open), len(still_open))
+
+            # 9) Trade evaluation: new prints from the tape, periodic summary
+            FILLS.poll_tape(s)
+            loops += 1
+            if loops % REPORT_EVERY == 0:
+                log.info('tradeeval', "[tick {}] {}", tick, format_summary(FILLS.summary()))
+
+            # 10) Sleep until the next refresh
+            sleep(PACER.pause(time.monotonic()))
+            tick = get_tick(s)
 
 ###############################################################################
 
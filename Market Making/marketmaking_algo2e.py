@@ -1,7 +1,21 @@
+import os
+import sys
 import signal
+import time
 import requests
 from time import sleep
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Tools'))
+from recorder import SessionRecorder
+from latency import LatencyMonitor
+from mdhub import MarketDataClient
+from fastjson import decode_book, decode_securities
+from orderbook import OrderBook
+from cancels import select_cancels, cancel_orders
+from quotes import QuoteEngine
+from pacing import Pacer
+from asynclog import get_logger
+
 class ApiException(Exception):
     pass
 
@@ -11,6 +25,13 @@ def signal_handler(signum, frame):
     shutdown = True
 
 API_KEY = {'X-API-Key': 'QDSFW62B'}
+RECORD_DIR = 'recordings'   # set to None to disable session recording
+LATENCY_STATS = True        # set to False to disable API latency instrumentation
+LOG_DIR = 'logs'            # set to None to log to the console only
+LOG_LEVELS = {}             # per-category levels, e.g. {'quotes': asynclog.DEBUG}
+MARKET_DATA_HUB = None      # e.g. ('localhost', 9998) to read market data from mdhub.py
+
+log = get_logger('mm_algo2e')
 
 ###############################################################################
 # PARAMETERS
@@ -19,7 +40,11 @@ API_KEY = {'X-API-Key': 'QDSFW62B'}
 # General
 ENDTIME = 300 
 GLOBAL_POSITION_LIMIT = 24000
-BASE_SPEEDBUMP = 0.1    # 0.2 for 100% and 0.1 for 200%
+MAX_OPEN_ORDERS = 20    # across all tickers
+
+# Loop pacing (adapts to the case speed; no per-speed speedbump to edit)
+REFRESHES_PER_TICK   = 5     # quote refreshes per case tick
+MAX_CALLS_PER_SECOND = 50    # API calls per second to stay under; None to disable
 
 TICKER_CONFIG = {
     'CNR': {
@@ -57,11 +82,9 @@ TICKER_CONFIG = {
     }
 }
 
-MID_PRICE_WINDOWS = {
-    'CNR': [],
-    'RY': [],
-    'AC': []
-}
+ORDER_BOOKS = {}    # ticker -> OrderBook, updated in place each loop
+QUOTE_ENGINE = QuoteEngine(TICKER_CONFIG, GLOBAL_POSITION_LIMIT)    # mid windows and quote math for all tickers
+PACER = Pacer(REFRESHES_PER_TICK, MAX_CALLS_PER_SECOND)    # loop cadence from measured tick length
 
 ###############################################################################
 
@@ -74,7 +97,9 @@ def get_tick(session):
     resp = session.get('http://localhost:9999/v1/case')
     if not resp.ok:
         raise ApiException("Error in get_tick()")
-    return resp.json()['tick']
+    tick = resp.json()['tick']
+    PACER.observe_tick(tick, time.monotonic())
+    return tick
 
 def get_positions(session):
     """
@@ -84,13 +109,12 @@ def get_positions(session):
     resp = session.get('http://localhost:9999/v1/securities')
     if not resp.ok:
         raise ApiException("Could not get securities info")
-    data = resp.json()
+    securities = decode_securities(resp)
 
     pos_dict = {}
-    for sec in data:
-        tkr = sec['ticker']
+    for tkr, sec in securities.items():
         if tkr in ['CNR', 'RY', 'AC']:
-            pos_dict[tkr] = sec['position']
+            pos_dict[tkr] = sec.position
     return pos_dict
 
 def total_gross_position(positions):
@@ -108,9 +132,12 @@ def ticker_bid_ask(session, ticker):
     resp = session.get('http://localhost:9999/v1/securities/book', params={'ticker': ticker})
     if not resp.ok:
         raise ApiException(f"Error getting book for {ticker}")
-    book = resp.json()
-    best_bid = book['bids'][0]['price'] if book['bids'] else None
-    best_ask = book['asks'][0]['price'] if book['asks'] else None
+    book = ORDER_BOOKS.get(ticker)
+    if book is None:
+        book = ORDER_BOOKS[ticker] = OrderBook(ticker)
+    book.apply(decode_book(resp))
+    best_bid = book.best_bid
+    best_ask = book.best_ask
     return best_bid, best_ask, book
 
 def get_orders(session, status='OPEN'):
@@ -143,6 +170,7 @@ def flatten_if_exceeded(session, positions):
         if to_flatten <= 0:
             continue
 
+        log.info('risk', "Gross position {} over limit; {} {} {}", gross, action, to_flatten, ticker)
         session.post('http://localhost:9999/v1/orders',
                      params={
                          'ticker': ticker,
@@ -150,7 +178,7 @@ def flatten_if_exceeded(session, positions):
                          'quantity': to_flatten,
                          'action': action
                      })
-        sleep(BASE_SPEEDBUMP)  # small pause
+        sleep(PACER.period())  # small pause
         # Re-check positions
         new_positions = get_positions(session)
         gross = total_gross_position(new_positions)
@@ -168,100 +196,69 @@ def main():
 
     with requests.Session() as s:
         s.headers.update(API_KEY)
+        log.configure(LOG_DIR, levels=LOG_LEVELS)
+        if RECORD_DIR:
+            SessionRecorder(RECORD_DIR, 'mm_algo2e').attach(s)
+        if MARKET_DATA_HUB:
+            MarketDataClient(MARKET_DATA_HUB).attach(s)
+        if LATENCY_STATS:
+            LatencyMonitor('mm_algo2e').attach(s)
+        PACER.attach(s)
 
         tick = get_tick(s)
         while tick < ENDTIME and not shutdown:
             positions = get_positions(s)
             flatten_if_exceeded(s, positions)  # just in case
 
-            # Loop over each ticker we care about
-            for ticker, cfg in TICKER_CONFIG.items():
+            # 1) Top of book for every ticker
+            nbbo = {}
+            for ticker in QUOTE_ENGINE.tickers:
                 best_bid, best_ask, _ = ticker_bid_ask(s, ticker)
-                if not best_bid or not best_ask:
-                    # If book is empty, skip
-                    continue
-
-                # 1) Update rolling mid price
-                mid_price = (best_bid + best_ask) / 2
-                MID_PRICE_WINDOWS[ticker].append(mid_price)
-                if len(MID_PRICE_WINDOWS[ticker]) > cfg['WINDOW_SIZE']:
-                    MID_PRICE_WINDOWS[ticker].pop(0)
-
-                # 2) Calculate slope if window is full
-                slope = 0.0
-                window_len = len(MID_PRICE_WINDOWS[ticker])
-                if window_len == cfg['WINDOW_SIZE']:
-                    oldest = MID_PRICE_WINDOWS[ticker][0]
-                    newest = MID_PRICE_WINDOWS[ticker][-1]
-                    slope = (newest - oldest) / cfg['WINDOW_SIZE']
-
-                # 3) Trend-based price adjustment
-                price_adjust = 0.0
-                if slope > cfg['TREND_UP_THRESHOLD']:
-                    price_adjust = +cfg['TREND_VALUE']
-                elif slope < cfg['TREND_DOWN_THRESHOLD']:
-                    price_adjust = -cfg['TREND_VALUE']
-
-                # 4) Rebalance if local position is large (for *this ticker*).
-                pos = positions[ticker]
-                buy_quantity = cfg['ORDER_SIZE']
-                sell_quantity = cfg['ORDER_SIZE']
-                if pos > cfg['REB_LIMIT']:
-                    buy_quantity = cfg['REB_SIZE']
-                elif pos < -cfg['REB_LIMIT']:
-                    sell_quantity = cfg['REB_SIZE']
-
-                # 5) Check the spread
-                spread = best_ask - best_bid
-                if spread >= cfg['MIN_SPREAD']:
-                    # We'll "improve" if the spread is big enough
-                    buy_price  = best_bid + cfg['IMPROVE'] + price_adjust
-                    sell_price = best_ask - cfg['IMPROVE'] + price_adjust
-                else:
-                    # If not wide, place them close to the inside
-                    buy_price  = best_bid + price_adjust
-                    sell_price = best_ask + price_adjust
-
-                # 6) Only place symmetrical limit orders if they won't cross
-                #    so that we collect passive rebates (rather than paying active fees).
-                if buy_price < sell_price:
-                    hypothetical_buy_fill = pos + buy_quantity
-                    new_pos_dict = positions.copy()
-                    new_pos_dict[ticker] = hypothetical_buy_fill
-                    if total_gross_position(new_pos_dict) <= GLOBAL_POSITION_LIMIT:
-                        s.post('http://localhost:9999/v1/orders',
-                               params={
-                                   'ticker': ticker,
-                                   'type': 'LIMIT',
-                                   'quantity': buy_quantity,
-                                   'action': 'BUY',
-                                   'price': buy_price
-                               })
-                    
-                    # Check if the sell side alone would push us over. 
-                    hypothetical_sell_fill = pos - sell_quantity
-                    new_pos_dict[ticker] = hypothetical_sell_fill
-                    if total_gross_position(new_pos_dict) <= GLOBAL_POSITION_LIMIT:
-                        s.post('http://localhost:9999/v1/orders',
-                               params={
-                                   'ticker': ticker,
-                                   'type': 'LIMIT',
-                                   'quantity': sell_quantity,
-                                   'action': 'SELL',
-                                   'price': sell_price
-                               })
-
-            # 7) Housekeeping: if we have too many open orders, consider culling older ones, etc.
+                nbbo[ticker] = (best_bid, best_ask)
+
+            # 2) Rolling mids, trend adjustment, rebalance sizing, spread
+            #    improvement and gross-limit checks for all tickers in one step
+            quotes = QUOTE_ENGINE.compute(QUOTE_ENGINE.vector({t: q[0] for t, q in nbbo.items()}),
+                                          QUOTE_ENGINE.vector({t: q[1] for t, q in nbbo.items()}),
+                                          QUOTE_ENGINE.vector(positions, 0))
+
+            # 3) Only place limit orders that won't cross, so that we collect
+            #    passive rebates (rather than paying active fees), and only the
+            #    sides whose full fill keeps us within the gross limit
+            for i, ticker in enumerate(QUOTE_ENGINE.tickers):
+                if quotes.buy_ok[i]:
+                    buy_quantity, buy_price = int(quotes.buy_quantity[i]), float(quotes.buy_price[i])
+                    s.post('http://localhost:9999/v1/orders',
+                           params={
+                               'ticker': ticker,
+                               'type': 'LIMIT',
+                               'quantity': buy_quantity,
+                               'action': 'BUY',
+                               'price': buy_price
+                           })
+                    log.debug('quotes', "Quoted {} BUY {} @ {:.2f}", ticker, buy_quantity, buy_price)
+                if quotes.sell_ok[i]:
+                    sell_quantity, sell_price = int(quotes.sell_quantity[i]), float(quotes.sell_price[i])
+                    s.post('http://localhost:9999/v1/orders',
+                           params={
+                               'ticker': ticker,
+                               'type': 'LIMIT',
+                               'quantity': sell_quantity,
+                               'action': 'SELL',
+                               'price': sell_price
+                           })
+                    log.debug('quotes', "Quoted {} SELL {} @ {:.2f}", ticker, sell_quantity, sell_price)
+
+            # 4) Housekeeping: if we have too many open orders, consider culling older ones, etc.
             open_orders = get_orders(s, 'OPEN')
-            # Suppose we keep no more than 20 total across all tickers
-            while len(open_orders) > 20:
-                orderid = open_orders[-1]['order_id']
-                s.delete(f'http://localhost:9999/v1/orders/{orderid}')
-                sleep(BASE_SPEEDBUMP)
-                open_orders = get_orders(s, 'OPEN')
-
-            # 8) Sleep
-            sleep(BASE_SPEEDBUMP)
+            stale = select_cancels(open_orders, MAX_OPEN_ORDERS, nbbo=nbbo)
+            if stale:
+                still_open = cancel_orders(s, stale)
+                log.info('orders', "[tick {}] Cancelled {} stale orders ({} still open)",
+                         tick, len(stale) - len(still_open), len(still_open))
+
+            # 5) Sleep until the next refresh
+            sleep(PACER.pause(time.monotonic()))
             tick = get_tick(s)
 
 if __name__ == '__main__':
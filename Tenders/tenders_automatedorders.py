@@ -1,7 +1,17 @@
+import os
+import sys
 import requests
 import signal
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Tools'))
+from recorder import SessionRecorder
+from latency import LatencyMonitor
+from mdhub import MarketDataClient
+from fastjson import decode_book, decode_securities
+from orderbook import OrderBook
+from asynclog import get_logger
+
 ########################################################
 ####################### API ############################
 ########################################################
@@ -9,8 +19,15 @@ class ApiException(Exception):
     pass
 
 API_KEY = {'X-API-Key': 'QDSFW62B'}
+RECORD_DIR = 'recordings'   # set to None to disable session recording
+LATENCY_STATS = True        # set to False to disable API latency instrumentation
+LOG_DIR = 'logs'            # set to None to log to the console only
+LOG_LEVELS = {}             # per-category levels, e.g. {'tenders': asynclog.WARNING}
+MARKET_DATA_HUB = None      # e.g. ('localhost', 9998) to read market data from mdhub.py
 shutdown = False
 
+log = get_logger('tenders_auto')
+
 def signal_handler(signum, frame):
     global shutdown
     shutdown = True
@@ -20,6 +37,17 @@ signal.signal(signal.SIGINT, signal_handler)
 ########################################################
 
 
+########################################################
+#################### PARAMETERS ########################
+########################################################
+EVALUATION_THRESHOLD = 0.15   # how far through the book VWAP a tender may be priced
+MAX_ATTEMPTS = 13             # evaluations before a tender is declined
+EVALUATION_DELAY = 2          # seconds between evaluations
+
+ORDER_BOOKS = {}              # ticker -> OrderBook, updated in place on each fetch
+########################################################
+
+
 ################################################################################
 #################################### INFO ######################################
 ################################################################################
@@ -35,36 +63,39 @@ def get_tenders(session):
         raise ApiException("Failed to fetch tenders")
     return resp.json()
 
+def fetch_order_book(session, ticker):
+    """The ticker's OrderBook, moved to the latest snapshot."""
+    resp = session.get('http://localhost:9999/v1/securities/book', params={'ticker': ticker})
+    if not resp.ok:
+        raise ApiException(f"Error fetching book for {ticker}")
+    book = ORDER_BOOKS.get(ticker)
+    if book is None:
+        book = ORDER_BOOKS[ticker] = OrderBook(ticker)
+    return book.apply(decode_book(resp))
+
 def get_order_book(session, ticker):
     """Fetch order book for a ticker from both markets and compute VWAP"""
-    book_main = session.get(f'http://localhost:9999/v1/securities/book', params={'ticker': ticker.replace("_A", "_M")}).json()
-    book_alt = session.get(f'http://localhost:9999/v1/securities/book', params={'ticker': ticker.replace("_M", "_A")}).json()
-
-    best_bid_m = book_main['bids'][0]['price'] if book_main['bids'] else None
-    best_ask_m = book_main['asks'][0]['price'] if book_main['asks'] else None
-    best_bid_a = book_alt['bids'][0]['price'] if book_alt['bids'] else None
-    best_ask_a = book_alt['asks'][0]['price'] if book_alt['asks'] else None
+    book_main = fetch_order_book(session, ticker.replace("_A", "_M"))
+    book_alt = fetch_order_book(session, ticker.replace("_M", "_A"))
 
-    bid_volume_m = sum([bid['quantity'] for bid in book_main['bids']]) if book_main['bids'] else 0
-    ask_volume_m = sum([ask['quantity'] for ask in book_main['asks']]) if book_main['asks'] else 0
-    bid_volume_a = sum([bid['quantity'] for bid in book_alt['bids']]) if book_alt['bids'] else 0
-    ask_volume_a = sum([ask['quantity'] for ask in book_alt['asks']]) if book_alt['asks'] else 0
+    bid_volume = book_main.bid_volume + book_alt.bid_volume
+    ask_volume = book_main.ask_volume + book_alt.ask_volume
 
     # Compute VWAP (Volume Weighted Average Price)
-    vwap_bid = (sum([bid['price'] * bid['quantity'] for bid in book_main['bids']]) + sum([bid['price'] * bid['quantity'] for bid in book_alt['bids']])) / (bid_volume_m + bid_volume_a + 1e-9)
-    vwap_ask = (sum([ask['price'] * ask['quantity'] for ask in book_main['asks']]) + sum([ask['price'] * ask['quantity'] for ask in book_alt['asks']])) / (ask_volume_m + ask_volume_a + 1e-9)
+    vwap_bid = (book_main.bid_notional + book_alt.bid_notional) / (bid_volume + 1e-9)
+    vwap_ask = (book_main.ask_notional + book_alt.ask_notional) / (ask_volume + 1e-9)
 
-    return best_bid_m, best_ask_m, best_bid_a, best_ask_a, bid_volume_m + bid_volume_a, ask_volume_m + ask_volume_a, vwap_bid, vwap_ask
+    return (book_main.best_bid, book_main.best_ask, book_alt.best_bid, book_alt.best_ask,
+            bid_volume, ask_volume, vwap_bid, vwap_ask)
 
 def get_inventory(session, ticker):
     resp = session.get('http://localhost:9999/v1/securities')
     if not resp.ok:
         raise ApiException(f"Failed to fetch inventory for {ticker}")
 
-    securities = resp.json()
-    for security in securities:
-        if security['ticker'] == ticker:
-            return security['position']
+    security = decode_securities(resp).get(ticker)
+    if security is not None:
+        return security.position
     return 0
 ################################################################################
 
@@ -83,7 +114,7 @@ def accept_tender(session, tender):
     if not resp.ok:
         raise ApiException(f"Failed to accept tender {tender_id} for {ticker} at {price} ({action})")
     
-    print(f"Accepted Tender {tender_id}: {ticker} {action} @ {price}")
+    log.info('tenders', "Accepted Tender {}: {} {} @ {}", tender_id, ticker, action, price)
 
 def decline_tender(session, tender):
     """Decline a tender offer and log details."""
@@ -96,7 +127,7 @@ def decline_tender(session, tender):
     if not resp.ok:
         raise ApiException(f"Failed to decline tender {tender_id} for {ticker} at {price} ({action})")
     
-    print(f"Declined Tender {tender_id}: {ticker} {action} @ {price}")
+    log.info('tenders', "Declined Tender {}: {} {} @ {}", tender_id, ticker, action, price)
 
 def evaluate_tender(session, tender):
     """Continuously evaluates a tender until it's accepted or declined."""
@@ -106,9 +137,9 @@ def evaluate_tender(session, tender):
     
     # Parameters
     attempts = 0
-    max_attempts=13
-    threshold = 0.15
-    evaluation_delay = 2
+    max_attempts = MAX_ATTEMPTS
+    threshold = EVALUATION_THRESHOLD
+    evaluation_delay = EVALUATION_DELAY
     afteraccepttender_delay = 1.5
     order_delay = 0.2
 
@@ -125,7 +156,7 @@ def evaluate_tender(session, tender):
             break
         
         attempts += 1
-        print(f"Evaluating tender {tender['tender_id']} ({attempts}/{max_attempts})")
+        log.info('tenders', "Evaluating tender {} ({}/{})", tender['tender_id'], attempts, max_attempts)
 
     if attempts == max_attempts:  
         decline_tender(session, tender)
@@ -150,7 +181,7 @@ def submit_limit_order(session, ticker, quantity, price, action):
     resp = session.post('http://localhost:9999/v1/orders', params=order)
     if not resp.ok:
         raise ApiException(f"Failed to place LIMIT order for {ticker} at {price}")
-    print(f"Placed {action} LIMIT order: {quantity} @ {price} on {ticker}")
+    log.info('orders', "Placed {} LIMIT order: {} @ {} on {}", action, quantity, price, ticker)
 
 def submit_market_order(session, ticker, quantity, action):
     """Submit a market order"""
@@ -166,7 +197,7 @@ def submit_market_order(session, ticker, quantity, action):
         resp = session.post('http://localhost:9999/v1/orders', params=order)
         if not resp.ok:
             raise ApiException(f"Failed to place MARKET order for {ticker}")
-        print(f"Placed {action} MARKET order: {order_size} on {ticker}")
+        log.info('orders', "Placed {} MARKET order: {} on {}", action, order_size, ticker)
         quantity -= order_size
 
 def place_aggressive_limit_orders(session, ticker, inventory, order_delay):
@@ -178,26 +209,25 @@ def place_aggressive_limit_orders(session, ticker, inventory, order_delay):
         return 
 
     # Get market data
-    book_main = session.get(f'http://localhost:9999/v1/securities/book', params={'ticker': ticker.replace("_A", "_M")}).json()
-    book_alt = session.get(f'http://localhost:9999/v1/securities/book', params={'ticker': ticker.replace("_M", "_A")}).json()
+    book_main = fetch_order_book(session, ticker.replace("_A", "_M"))
+    book_alt = fetch_order_book(session, ticker.replace("_M", "_A"))
 
     remaining_quantity = abs(inventory)
     alt_orders_placed = 0
 
     if inventory < 0:  # Buying
-        ask_orders_main = book_main['asks'] if book_main['asks'] else []
-        ask_orders_alt = book_alt['asks'] if book_alt['asks'] else []
+        ask_orders = ([(p, q, "M") for p, q in zip(book_main.ask_prices, book_main.ask_sizes)] +
+                      [(p, q, "A") for p, q in zip(book_alt.ask_prices, book_alt.ask_sizes)])
 
-        for ask in ask_orders_main + ask_orders_alt:
+        for ask_price, ask_quantity, destination in ask_orders:
             if remaining_quantity <= 0:
                 break 
 
             # match each order individually
-            price = ask['price'] - 0.01
-            order_size = min(remaining_quantity, ask['quantity'])
+            price = ask_price - 0.01
+            order_size = min(remaining_quantity, ask_quantity)
 
             # Choose market dynamically
-            destination = "M" if ask in ask_orders_main else "A"
             if destination == "A" and alt_orders_placed >= 10:
                 continue  # Skip A if already 10 orders placed
 
@@ -212,18 +242,17 @@ def place_aggressive_limit_orders(session, ticker, inventory, order_delay):
             time.sleep(order_delay)
 
     else:  # Selling
-        bid_orders_main = book_main['bids'] if book_main['bids'] else []
-        bid_orders_alt = book_alt['bids'] if book_alt['bids'] else []
+        bid_orders = ([(p, q, "M") for p, q in zip(book_main.bid_prices, book_main.bid_sizes)] +
+                      [(p, q, "A") for p, q in zip(book_alt.bid_prices, book_alt.bid_sizes)])
 
-        for bid in bid_orders_main + bid_orders_alt:
+        for bid_price, bid_quantity, destination in bid_orders:
             if remaining_quantity <= 0:
                 break  
 
-            price = bid['price'] + 0.01
-            order_size = min(remaining_quantity, bid['quantity']) 
+            price = bid_price + 0.01
+            order_size = min(remaining_quantity, bid_quantity) 
 
             # Choose market dynamically
-            destination = "M" if bid in bid_orders_main else "A"
             if destination == "A" and alt_orders_placed >= 10:
                 continue # Skip A if already 10 orders placed
 
@@ -244,7 +273,7 @@ def place_aggressive_limit_orders(session, ticker, inventory, order_delay):
 def close_positions(session):
     """Final liquidation of any remaining inventory before trading ends."""
     securities = ["CRZY_M", "CRZY_A", "TAME_M", "TAME_A"]
-    print("Closing all positions before trading ends.")
+    log.info('session', "Closing all positions before trading ends.")
     for ticker in securities:
         inventory = get_inventory(session, ticker)
         if inventory != 0:
@@ -269,6 +298,13 @@ def close_positions(session):
 def main():
     with requests.Session() as session:
         session.headers.update(API_KEY)
+        log.configure(LOG_DIR, levels=LOG_LEVELS)
+        if RECORD_DIR:
+            SessionRecorder(RECORD_DIR, 'tenders_auto').attach(session)
+        if MARKET_DATA_HUB:
+            MarketDataClient(MARKET_DATA_HUB).attach(session)
+        if LATENCY_STATS:
+            LatencyMonitor('tenders_auto').attach(session)
 
         while not shutdown:         
 
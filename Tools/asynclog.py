@@ -0,0 +1,171 @@
+# asynclog.py
+#
+# Queue-backed structured logger for the trading loops. A log call only checks
+# the category level and puts the raw (format string, args) tuple on a queue;
+# formatting, JSON encoding, console output and file writes all happen on a
+# background writer thread, so a slow terminal never stalls order submission.
+#
+#   log = get_logger('arbitrage')
+#   log.configure('logs', levels={'orders': INFO, 'signals': WARNING})
+#   log.info('orders', "Placed {} MARKET order: {} on {}", action, qty, ticker)
+#
+# Each record is written as one JSON line to <root>/<name>-<timestamp>.jsonl:
+#
+#   {"ts": 1741000000.123, "level": "INFO", "cat": "orders",
+#    "msg": "Placed BUY MARKET order: 500 on CRZY_M", "args": ["BUY", 500, "CRZY_M"]}
+#
+# and the formatted message is echoed to the console at or above console_level.
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+
+FLUSH_INTERVAL = 0.5      # seconds between file flushes
+
+_loggers = {}
+
+def get_logger(name):
+    """The process-wide logger for name, created on first use."""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = AsyncLogger(name)
+    return logger
+
+class AsyncLogger:
+    def __init__(self, name):
+        self.name = name
+        self.level = INFO
+        self.levels = {}
+        self.console_level = INFO
+        self.path = None
+        self.file = None
+        self.queue = queue.SimpleQueue()
+        self.writer = None
+        self.lock = threading.Lock()
+
+    def configure(self, root=None, level=INFO, levels=None, console_level=INFO):
+        """
+        root: directory for the JSON-lines file, or None for console only.
+        levels: per-category minimum levels overriding level.
+        console_level: minimum level echoed to the console (None for silent).
+        level=OFF drops every record at the call site.
+        """
+        self.flush()
+        self.level = level
+        self.levels = dict(levels or {})
+        self.console_level = console_level if console_level is not None else OFF
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.path = None
+        if root:
+            os.makedirs(root, exist_ok=True)
+            self.path = os.path.join(root, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+            self.file = open(self.path, 'a')
+        return self
+
+    ###########################################################################
+    # Hot path
+    ###########################################################################
+    def enabled(self, level, category):
+        return level >= self.levels.get(category, self.level)
+
+    def log(self, level, category, msg, *args, **fields):
+        if level < self.levels.get(category, self.level):
+            return
+        if self.writer is None:
+            self._start()
+        self.queue.put((time.time(), level, category, msg, args, fields))
+
+    def debug(self, category, msg, *args, **fields):
+        self.log(DEBUG, category, msg, *args, **fields)
+
+    def info(self, category, msg, *args, **fields):
+        self.log(INFO, category, msg, *args, **fields)
+
+    def warning(self, category, msg, *args, **fields):
+        self.log(WARNING, category, msg, *args, **fields)
+
+    def error(self, category, msg, *args, **fields):
+        self.log(ERROR, category, msg, *args, **fields)
+
+    ###########################################################################
+    # Writer thread
+    ###########################################################################
+    def _start(self):
+        with self.lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._run, name=f"log-{self.name}", daemon=True)
+                self.writer.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                item = False
+
+            if item is None:
+                self._flush_file()
+                return
+            if isinstance(item, threading.Event):
+                self._flush_file()
+                item.set()
+                continue
+            if item:
+                self._write(*item)
+
+            if self.file and time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                self._flush_file()
+                last_flush = time.monotonic()
+
+    def _write(self, ts, level, category, msg, args, fields):
+        try:
+            text = msg.format(*args) if args else msg
+        except (IndexError, KeyError, ValueError) as e:
+            text = f"{msg} {args} (format error: {e})"
+        if level >= self.console_level:
+            print(text)
+        if self.file:
+            record = {'ts': ts, 'level': LEVEL_NAMES.get(level, level), 'cat': category, 'msg': text}
+            if args:
+                record['args'] = args
+            if fields:
+                record.update(fields)
+            self.file.write(json.dumps(record, default=str) + '\n')
+
+    def _flush_file(self):
+        if self.file:
+            self.file.flush()
+        sys.stdout.flush()
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        if self.writer is None or not self.writer.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        if self.writer is not None and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        self.writer = None
+        if self.file:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,382 @@
+# bench.py
+#
+# Micro-benchmarks for the pure decision logic of every engine. Each benchmark
+# cycles through a fixed set of synthetic inputs (seeded), or through the books
+# and headlines of a recorded session with --recording, and reports the
+# per-call time:
+#
+#   python Tools/bench.py                       # run everything, save to history
+#   python Tools/bench.py -k spoof -k vwap      # only matching benchmarks
+#   python Tools/bench.py --recording recordings/tenders_auto-20250301-101500
+#
+# Results are appended to benchmarks/history.jsonl. Each benchmark's best
+# repeat (min) is compared with the median best of the last HISTORY_WINDOW
+# runs on the same inputs and machine. Once at least MIN_BASELINE_RUNS such
+# runs exist, a benchmark fails the run (exit status 1) when it is more than
+# --threshold slower than that baseline and the gap is also larger than the
+# noise: this run's median - min, the spread of the baseline runs, and
+# NOISE_FLOOR_US, whichever is largest.
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'Commodities'))
+
+HISTORY = os.path.join(ROOT, 'benchmarks', 'history.jsonl')
+HISTORY_WINDOW = 5        # previous runs the baseline is taken from
+THRESHOLD = 0.25          # allowed slowdown over the baseline
+NOISE_FLOOR_US = 0.05     # smaller slowdowns never count as regressions
+MIN_BASELINE_RUNS = 3     # comparable runs needed before the gate applies
+REPEATS = 7
+MIN_TIME = 0.05           # seconds per repeat
+NUM_INPUTS = 256          # distinct inputs each benchmark cycles through
+BOOK_DEPTH = 20
+
+###############################################################################
+# Inputs
+###############################################################################
+def _load_script(path, name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def synthetic_books(rng, n=NUM_INPUTS, depth=BOOK_DEPTH, mid=25.0):
+    books = []
+    for _ in range(n):
+        mid += rng.gauss(0, 0.02)
+        spread = rng.choice([0.01, 0.02, 0.03, 0.05])
+        bid, ask = round(mid - spread / 2, 2), round(mid + spread / 2, 2)
+        books.append({
+            'bids': [{'order_id': i, 'price': round(bid - 0.01 * i, 2), 'quantity': rng.randint(1, 60) * 500,
+                      'quantity_filled': 0} for i in range(depth)],
+            'asks': [{'order_id': 1000 + i, 'price': round(ask + 0.01 * i, 2), 'quantity': rng.randint(1, 60) * 500,
+                      'quantity_filled': 0} for i in range(depth)]
+        })
+    return books
+
+def synthetic_headlines(rng, n=NUM_INPUTS):
+    import backtest
+    headlines = []
+    for i in range(n):
+        if i % 4 == 0:
+            forecast, actual = rng.randint(-6, 6), rng.randint(-9, 9)
+            word = lambda x: 'DRAW' if x < 0 else 'BUILD'
+            headlines.append(f"WEEK {i % 8 + 1} EIA REPORT: ACTUAL {word(actual)} {abs(actual)} MILLION BARRELS, "
+                             f"FORECAST {word(forecast)} {abs(forecast)} MILLION BARRELS")
+        elif i % 4 == 3:
+            headlines.append(f"ANALYSTS SEE NO CHANGE IN REGION {i}")    # matches nothing
+        else:
+            headlines.append(rng.choice(backtest.HEADLINES)[0])
+    return headlines
+
+def recorded_books(path, n=NUM_INPUTS):
+    from recorder import SessionRecording, SIDES
+    rec = SessionRecording(path)
+    book = rec['book']
+    books = []
+    seqs = sorted(set(int(s) for s in book['seq'][:]))
+    for seq in seqs[:n]:
+        rows = rec.rows('book', seq)
+        snap = {'bids': [], 'asks': []}
+        for i in range(rows.start, rows.stop):
+            side = 'bids' if book['side'][i] == SIDES['bids'] else 'asks'
+            snap[side].append({'order_id': int(book['order_id'][i]), 'price': float(book['price'][i]),
+                               'quantity': float(book['quantity'][i]),
+                               'quantity_filled': float(book['quantity_filled'][i])})
+        if snap['bids'] and snap['asks']:
+            books.append(snap)
+    return books
+
+def recorded_headlines(path, n=NUM_INPUTS):
+    from recorder import SessionRecording
+    rec = SessionRecording(path)
+    return [h.decode(errors='replace') for h in rec['news']['headline'][:n]]
+
+class StaticResponse:
+    def __init__(self, payload):
+        self.payload = payload
+        self.content = json.dumps(payload).encode()
+        self.ok = True
+        self.status_code = 200
+
+    def json(self):
+        return self.payload
+
+class StaticSession:
+    """Serves a fixed sequence of book snapshots; enough for get_order_book."""
+    def __init__(self, books):
+        self.books = [StaticResponse(b) for b in books]
+        self.i = 0
+
+    def get(self, url, params=None):
+        self.i = (self.i + 1) % len(self.books)
+        return self.books[self.i]
+
+class StaticRIT:
+    def __init__(self, prices):
+        self.prices = prices
+        self.i = 0
+
+    def get_prices(self):
+        self.i = (self.i + 1) % len(self.prices)
+        return self.prices[self.i]
+
+###############################################################################
+# Benchmarks -- each setup returns a zero-argument callable
+###############################################################################
+def bench_compute_dynamic_threshold(inputs):
+    arb = _load_script('Arbitrage/arbitrage_algo1.py', 'bench_arbitrage')
+    datas = []
+    for i in range(0, len(inputs['books']) - 1, 2):
+        window = inputs['books'][i:i + arb.ROLLING_WINDOW * 2]
+        datas.append({t: {'bids': [b['bids'][0]['price'] for b in window[k::2]],
+                          'asks': [b['asks'][0]['price'] for b in window[k::2]]}
+                      for k, t in enumerate(['CRZY_M', 'CRZY_A'])})
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) % len(datas)
+        return arb.compute_dynamic_threshold(datas[i], 'CRZY_M', 'CRZY_A', arb.BASE_CROSS, i % 300)
+    return run
+
+def bench_detect_large_order_flow(inputs):
+    from fastjson import Book
+    from orderbook import OrderBook
+    arb = _load_script('Arbitrage/arbitrage_algo1.py', 'bench_arbitrage')
+    books = [OrderBook().apply(Book.from_payload(b)) for b in inputs['books']]
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) % len(books)
+        return arb.detect_large_order_flow(arb.update_order_flow('CRZY_M', books[i]))
+    return run
+
+def bench_estimate_news_impact(inputs):
+    import fundamental
+    model = fundamental.FundamentalModel(None, {}, None)
+    headlines = inputs['headlines']
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) % len(headlines)
+        return model._estimate_news_impact(headlines[i])
+    return run
+
+def bench_parse_eia_report(inputs):
+    import fundamental
+    model = fundamental.FundamentalModel(None, {}, None)
+    headlines = [h for h in inputs['headlines'] if 'EIA' in h] or inputs['headlines']
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) % len(headlines)
+        return model._parse_eia_report(headlines[i])
+    return run
+
+def _commodity_prices(rng, n=NUM_INPUTS):
+    cl, ho, rb = 75.0, 2.4, 2.2
+    prices = []
+    for _ in range(n):
+        cl += rng.gauss(0, 0.1)
+        ho += rng.gauss(0, 0.005)
+        rb += rng.gauss(0, 0.005)
+        prices.append({'CL': cl, 'HO': ho, 'RB': rb, 'CL-2F': cl + 0.3})
+    return prices
+
+def bench_price_predictor(inputs):
+    import price_predictor
+    predictor = price_predictor.PricePredictor()
+    for p in inputs['prices'][:predictor.max_len]:
+        predictor.update_last_prices(p['CL'], p['HO'], p['RB'], 0)
+    return predictor.predict
+
+def bench_refinery_expected_profit(inputs):
+    import refinery
+    model = refinery.RefineryModel(StaticRIT(inputs['prices']), None, None, None, None)
+    model.lease_tick_log = [(t, t + 45) for t in range(0, 900, 45)]
+    for p in inputs['prices'][:model.predictor.max_len]:
+        model.predictor.update_last_prices(p['CL'], p['HO'], p['RB'], 0)
+    return model.expected_profit
+
+def bench_detect_spoofing(inputs):
+    from fastjson import Book
+    from orderbook import OrderBook
+    mm = _load_script('Market Making/marketmaking_algo2.py', 'bench_mm_algo2')
+    books = [OrderBook().apply(Book.from_payload(b)) for b in inputs['books']]
+    state = {'i': 0, 'tick': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) % len(books)
+        state['tick'] += 1
+        return mm.detect_spoofing(books[i], state['tick'])
+    return run
+
+def bench_tender_vwap(inputs):
+    tenders = _load_script('Tenders/tenders_automatedorders.py', 'bench_tenders')
+    session = StaticSession(inputs['books'])
+    return lambda: tenders.get_order_book(session, 'RITC_M')
+
+def bench_decode_book(inputs):
+    from fastjson import decode_book
+    session = StaticSession(inputs['books'])
+    return lambda: decode_book(session.get(None))
+
+def bench_order_book_apply(inputs):
+    from fastjson import Book
+    from orderbook import OrderBook
+    books = [Book.from_payload(b) for b in inputs['books']]
+    book = OrderBook()
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) % len(books)
+        book.apply(books[i])
+        return book.imbalance(5), book.vwap_bid
+    return run
+
+def bench_quote_engine(inputs):
+    import numpy as np
+    mm = _load_script('Market Making/marketmaking_algo2e.py', 'bench_mm_algo2e')
+    engine = mm.QuoteEngine(mm.TICKER_CONFIG, mm.GLOBAL_POSITION_LIMIT)
+    books = [(b['bids'][0]['price'], b['asks'][0]['price']) for b in inputs['books']]
+    positions = np.array([3000.0, -1500.0, 800.0])
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) % len(books)
+        bid, ask = books[i]
+        return engine.compute(np.array([bid, bid, bid]), np.array([ask, ask, ask]), positions)
+    return run
+
+def bench_json_book(inputs):
+    session = StaticSession(inputs['books'])
+    return lambda: json.loads(session.get(None).content)
+
+BENCHMARKS = {
+    'arbitrage.compute_dynamic_threshold': bench_compute_dynamic_threshold,
+    'arbitrage.detect_large_order_flow': bench_detect_large_order_flow,
+    'fundamental._estimate_news_impact': bench_estimate_news_impact,
+    'fundamental._parse_eia_report': bench_parse_eia_report,
+    'price_predictor.predict': bench_price_predictor,
+    'refinery.expected_profit': bench_refinery_expected_profit,
+    'mm_algo2.detect_spoofing': bench_detect_spoofing,
+    'tenders.get_order_book_vwap': bench_tender_vwap,
+    'fastjson.decode_book': bench_decode_book,
+    'orderbook.apply': bench_order_book_apply,
+    'mm_algo2e.quote_engine': bench_quote_engine,
+    'json.loads(book)': bench_json_book
+}
+
+###############################################################################
+# Runner
+###############################################################################
+def measure(func, repeats=REPEATS, min_time=MIN_TIME):
+    """Per-call seconds for each repeat, with the loop count calibrated to min_time."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(int(min_time / elapsed * 1.2), 100))
+
+    times = [elapsed / loops]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        times.append((time.perf_counter() - start) / loops)
+    return times, loops
+
+def load_history(path=HISTORY):
+    if not os.path.exists(path):
+        return []
+    with open(path) as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+def baseline(history, name, inputs, machine, window=HISTORY_WINDOW):
+    """
+    (median, spread, runs) of name's best-repeat times over the last runs on
+    the same inputs and machine, or None without any.
+    """
+    runs = [run['results'][name].get('min_us', run['results'][name]['median_us']) for run in history
+            if name in run.get('results', {}) and run.get('inputs') == inputs and run.get('machine') == machine]
+    runs = runs[-window:]
+    if not runs:
+        return None
+    return statistics.median(runs), max(runs) - min(runs), len(runs)
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the strategy decision functions")
+    parser.add_argument('-k', dest='filters', action='append', default=[], help="only benchmarks containing this")
+    parser.add_argument('--recording', help="take books and headlines from a session recording")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="allowed slowdown, e.g. 0.25 = 25%%")
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-save', action='store_true', help="do not append this run to the history")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    inputs = {'books': synthetic_books(rng), 'headlines': synthetic_headlines(rng), 'prices': _commodity_prices(rng)}
+    if args.recording:
+        inputs['books'] = recorded_books(args.recording) or inputs['books']
+        inputs['headlines'] = recorded_headlines(args.recording) or inputs['headlines']
+
+    history = load_history()
+    input_key = f"recording:{os.path.basename(os.path.normpath(args.recording))}" if args.recording else 'synthetic'
+    machine = platform.node()
+    results = {}
+    regressions = []
+
+    print(f"{'benchmark':<40}{'median':>11}{'min':>11}{'baseline':>11}{'change':>9}")
+    for name, setup in BENCHMARKS.items():
+        if args.filters and not any(f in name for f in args.filters):
+            continue
+        times, loops = measure(setup(inputs), args.repeats)
+        median_us, min_us = statistics.median(times) * 1e6, min(times) * 1e6
+        results[name] = {'median_us': median_us, 'min_us': min_us, 'loops': loops}
+
+        base, spread, runs = baseline(history, name, input_key, machine) or (None, 0.0, 0)
+        change = (min_us / base - 1) if base else None
+        flag = ''
+        noise = max(median_us - min_us, spread, NOISE_FLOOR_US)
+        if (change is not None and runs >= MIN_BASELINE_RUNS and change > args.threshold
+                and min_us - base > noise):
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<40}{median_us:>9.2f}us{min_us:>9.2f}us"
+              f"{(f'{base:.2f}us' if base else '-'):>11}{(f'{change:+.0%}' if change is not None else '-'):>9}{flag}")
+
+    if not args.no_save and results:
+        os.makedirs(os.path.dirname(HISTORY), exist_ok=True)
+        with open(HISTORY, 'a') as fh:
+            fh.write(json.dumps({'ts': time.time(), 'commit': _git_commit(), 'python': platform.python_version(),
+                                 'machine': machine, 'inputs': input_key,
+                                 'results': results}) + '\n')
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
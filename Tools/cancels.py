@@ -0,0 +1,74 @@
+# cancels.py
+#
+# Bulk cancellation for the market makers' housekeeping. Instead of deleting
+# one order, sleeping and re-fetching /orders until few enough are left, pick
+# every order to remove from a single /orders snapshot, clear them with one
+# POST /commands/cancel?ids=..., and check the result with one more GET:
+#
+#   stale = select_cancels(open_orders, keep=6, nbbo={'ALGO': (best_bid, best_ask)})
+#   still_open = cancel_orders(session, stale)
+#
+# If the case rejects the bulk command, the orders are deleted concurrently
+# instead.
+
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = 'http://localhost:9999/v1'
+MAX_WORKERS = 8           # concurrent deletes when bulk cancel is unavailable
+
+def _distance(order, nbbo):
+    """How far behind the touch an order rests (0 at or through it)."""
+    quote = nbbo.get(order['ticker']) if nbbo else None
+    if not quote or quote[0] is None or quote[1] is None:
+        return 0.0
+    bid, ask = quote
+    if order['action'] == 'BUY':
+        return max(bid - order['price'], 0.0)
+    return max(order['price'] - ask, 0.0)
+
+def select_cancels(open_orders, keep, nbbo=None, tick=None, max_age=None, tickers=None):
+    """
+    Ids of the orders to cancel from one /orders snapshot:
+      - every order on a ticker in `tickers`
+      - every order older than `max_age` ticks (needs `tick`)
+      - then, until at most `keep` remain, the orders furthest from the
+        NBBO in `nbbo` ({ticker: (bid, ask)}), oldest first on ties
+    """
+    cancel = []
+    rest = []
+    for order in open_orders:
+        if tickers and order['ticker'] in tickers:
+            cancel.append(order['order_id'])
+        elif max_age is not None and tick is not None and tick - order.get('tick', tick) > max_age:
+            cancel.append(order['order_id'])
+        else:
+            rest.append(order)
+    if len(rest) > keep:
+        rest.sort(key=lambda o: (-_distance(o, nbbo), o['order_id']))
+        cancel.extend(o['order_id'] for o in rest[:len(rest) - keep])
+    return cancel
+
+def _open_ids(session):
+    resp = session.get(f"{BASE_URL}/orders", params={'status': 'OPEN'})
+    if not resp.ok:
+        return None
+    return {o['order_id'] for o in resp.json()}
+
+def cancel_orders(session, order_ids, verify=True):
+    """
+    Cancel order_ids in one bulk command (concurrent deletes as a fallback).
+    Returns the ids still open afterwards, or [] when verify is off or the
+    check itself fails.
+    """
+    if not order_ids:
+        return []
+    resp = session.post(f"{BASE_URL}/commands/cancel", params={'ids': ','.join(str(i) for i in order_ids)})
+    if not resp.ok:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(order_ids))) as pool:
+            list(pool.map(lambda oid: session.delete(f"{BASE_URL}/orders/{oid}"), order_ids))
+    if not verify:
+        return []
+    still_open = _open_ids(session)
+    if still_open is None:
+        return []
+    return [oid for oid in order_ids if oid in still_open]
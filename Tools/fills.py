@@ -0,0 +1,267 @@
+# fills.py
+#
+# Streaming execution analytics for a quoting loop. Everything is fed with
+# data the loop already has or can fetch incrementally, and kept in
+# fixed-size rolling windows (no order-history polling):
+#
+#   fills = FillAnalytics('ALGO')
+#   fills.on_quote(order_response, book, tick)   # after each POST /orders
+#   fills.on_book(book, tick)                    # once per loop
+#   fills.on_orders(open_orders, tick, session)  # /orders?status=OPEN snapshot
+#   fills.poll_tape(session)                     # /securities/tas?after=cursor
+#   fills.summary()
+#
+# Our executions are inferred from successive OPEN snapshots: a growing
+# quantity_filled is a partial fill, and an order that leaves the snapshot
+# without us cancelling it was filled in full. An order we cancelled is looked
+# up once with GET /orders/{id} when it leaves, so fills between the last
+# snapshot and the cancel are still counted. Metrics, per share:
+#
+#   realized_spread   side * (mid at fill - fill price), i.e. edge captured
+#   markout[h]        side * (mid h ticks after the fill - fill price)
+#   fill_rate[level]  filled / quoted for finished orders, by ticks from the
+#                     touch when quoted (0 = at it, negative = improving it)
+#   participation     our filled volume / tape volume
+#   inventory_half_life   ticks for the position to halve, from an AR(1)
+#                     fit of position on its previous-tick value
+
+import math
+from collections import deque
+
+BASE_URL = 'http://localhost:9999/v1'
+WINDOW = 200              # observations kept per rolling metric
+HORIZONS = (1, 5, 10)     # markout horizons in ticks
+TICK_SIZE = 0.01
+
+class RollingMean:
+    """Weighted mean of the last `maxlen` observations."""
+    __slots__ = ('values', 'total', 'weight')
+
+    def __init__(self, maxlen=WINDOW):
+        self.values = deque(maxlen=maxlen)
+        self.total = 0.0
+        self.weight = 0.0
+
+    def add(self, value, weight=1.0):
+        if len(self.values) == self.values.maxlen:
+            v, w = self.values[0]
+            self.total -= v * w
+            self.weight -= w
+        self.values.append((value, weight))
+        self.total += value * weight
+        self.weight += weight
+
+    def mean(self):
+        return self.total / self.weight if self.weight > 0 else None
+
+class RollingRatio:
+    """sum(numerator) / sum(denominator) over the last `maxlen` observations."""
+    __slots__ = ('values', 'num', 'den')
+
+    def __init__(self, maxlen=WINDOW):
+        self.values = deque(maxlen=maxlen)
+        self.num = 0.0
+        self.den = 0.0
+
+    def add(self, num, den):
+        if len(self.values) == self.values.maxlen:
+            n, d = self.values[0]
+            self.num -= n
+            self.den -= d
+        self.values.append((num, den))
+        self.num += num
+        self.den += den
+
+    def ratio(self):
+        return self.num / self.den if self.den > 0 else None
+
+class FillAnalytics:
+    def __init__(self, ticker, window=WINDOW, horizons=HORIZONS, tick_size=TICK_SIZE):
+        self.ticker = ticker
+        self.window = window
+        self.horizons = horizons
+        self.tick_size = tick_size
+
+        self.orders = {}          # order_id -> [order, level, filled so far]
+        self.cancelled = set()    # ids we cancelled ourselves
+        self.pending = deque()    # (tick, side, price, qty) awaiting markouts
+        self.mids = {}            # tick -> last mid seen in that tick
+        self.tape_cursor = 0
+        self.tick = None
+
+        self.realized_spread = RollingMean(window)
+        self.markouts = {h: RollingMean(window) for h in horizons}
+        self.fill_rates = {}      # level -> RollingRatio
+        self.participation = RollingRatio(window)
+        self.filled_since_tape = 0.0
+
+        # AR(1) of position: rolling sums of x*y and x*x over (prev, current)
+        self.position = 0.0
+        self.position_tick = None
+        self.ar = deque(maxlen=window)
+        self.sxy = 0.0
+        self.sxx = 0.0
+
+    ###########################################################################
+    # Inputs
+    ###########################################################################
+    def on_quote(self, order, book, tick):
+        """Register a POST /orders response together with the book it was quoted on."""
+        if order.get('status') not in ('OPEN', 'TRANSACTED') or order.get('type') != 'LIMIT':
+            return
+        if order['action'] == 'BUY':
+            touch = book.best_bid
+            level = round((touch - order['price']) / self.tick_size) if touch is not None else 0
+        else:
+            touch = book.best_ask
+            level = round((order['price'] - touch) / self.tick_size) if touch is not None else 0
+        self.orders[order['order_id']] = [order, level, 0.0]
+        filled = order.get('quantity_filled', 0)
+        if filled:
+            self._fill(order, filled, tick)
+            self.orders[order['order_id']][2] = filled
+        if order['status'] == 'TRANSACTED':
+            self._finish(order['order_id'])
+
+    def on_cancel(self, order_ids):
+        self.cancelled.update(order_ids)
+
+    def on_book(self, book, tick):
+        """Record the mid for this tick and resolve markouts that have come due."""
+        mid = book.mid
+        if mid is None:
+            return
+        self.mids[tick] = mid
+        self.tick = tick
+        longest = self.horizons[-1]
+        while self.pending and self.pending[0][0] + longest <= tick:
+            self._markout(self.pending.popleft())
+        for old in [t for t in self.mids if t < tick - longest - 1]:
+            del self.mids[old]
+
+    def on_orders(self, open_orders, tick, session=None):
+        """
+        Diff an /orders?status=OPEN snapshot against what we know. With a
+        session, orders we cancelled get their final quantity_filled from RIT;
+        without one, the last snapshot's is used.
+        """
+        seen = set()
+        for order in open_orders:
+            entry = self.orders.get(order['order_id'])
+            if entry is None:
+                continue
+            seen.add(order['order_id'])
+            filled = order.get('quantity_filled', 0)
+            if filled > entry[2]:
+                self._fill(entry[0], filled - entry[2], tick)
+                entry[2] = filled
+        for order_id in [o for o in self.orders if o not in seen]:
+            entry = self.orders[order_id]
+            if order_id not in self.cancelled:
+                final = entry[0]['quantity']
+            else:
+                final = self._final_filled(session, order_id, entry[2])
+            if final > entry[2]:
+                self._fill(entry[0], final - entry[2], tick)
+                entry[2] = final
+            self._finish(order_id)
+
+    def _final_filled(self, session, order_id, known):
+        if session is None:
+            return known
+        resp = session.get(f"{BASE_URL}/orders/{order_id}")
+        if not resp.ok:
+            return known
+        return max(resp.json().get('quantity_filled', known), known)
+
+    def on_position(self, position, tick):
+        """Feed the position once per tick for the inventory half-life."""
+        if self.position_tick is not None and tick > self.position_tick:
+            x, y = self.position, position
+            if len(self.ar) == self.ar.maxlen:
+                ox, oy = self.ar[0]
+                self.sxy -= ox * oy
+                self.sxx -= ox * ox
+            self.ar.append((x, y))
+            self.sxy += x * y
+            self.sxx += x * x
+        if self.position_tick is None or tick > self.position_tick:
+            self.position = position
+            self.position_tick = tick
+
+    def poll_tape(self, session):
+        """Pull prints newer than the cursor from /securities/tas."""
+        resp = session.get(f"{BASE_URL}/securities/tas", params={'ticker': self.ticker, 'after': self.tape_cursor})
+        if not resp.ok:
+            return 0
+        prints = resp.json()
+        volume = 0.0
+        for p in prints:
+            volume += p['quantity']
+            if p['id'] > self.tape_cursor:
+                self.tape_cursor = p['id']
+        if volume > 0:
+            self.participation.add(self.filled_since_tape, volume)
+            self.filled_since_tape = 0.0
+        return len(prints)
+
+    ###########################################################################
+    # Bookkeeping
+    ###########################################################################
+    def _fill(self, order, qty, tick):
+        side = 1 if order['action'] == 'BUY' else -1
+        price = order['price']
+        mid = self.mids.get(tick, self.mids.get(self.tick))
+        if mid is not None:
+            self.realized_spread.add(side * (mid - price), qty)
+        self.pending.append((tick, side, price, qty))
+        self.filled_since_tape += qty
+
+    def _markout(self, fill):
+        tick, side, price, qty = fill
+        for h in self.horizons:
+            mid = self.mids.get(tick + h)
+            if mid is not None:
+                self.markouts[h].add(side * (mid - price), qty)
+
+    def _finish(self, order_id):
+        order, level, filled = self.orders.pop(order_id)
+        self.cancelled.discard(order_id)
+        rate = self.fill_rates.get(level)
+        if rate is None:
+            rate = self.fill_rates[level] = RollingRatio(self.window)
+        rate.add(filled, order['quantity'])
+
+    ###########################################################################
+    # Output
+    ###########################################################################
+    def inventory_half_life(self):
+        if self.sxx <= 0:
+            return None
+        phi = self.sxy / self.sxx
+        if phi <= 0:
+            return 0.0
+        if phi >= 1:
+            return math.inf
+        return -math.log(2) / math.log(phi)
+
+    def summary(self):
+        return {
+            'realized_spread': self.realized_spread.mean(),
+            'markouts': {h: m.mean() for h, m in self.markouts.items()},
+            'fill_rates': {level: r.ratio() for level, r in sorted(self.fill_rates.items())},
+            'participation': self.participation.ratio(),
+            'inventory_half_life': self.inventory_half_life(),
+            'open_tracked': len(self.orders)
+        }
+
+def _fmt(value, spec='.4f'):
+    return '-' if value is None else format(value, spec)
+
+def format_summary(stats):
+    """One log line for summary()."""
+    markouts = ' '.join(f"{h}t={_fmt(m)}" for h, m in stats['markouts'].items())
+    rates = ' '.join(f"{level}:{_fmt(r, '.0%')}" for level, r in stats['fill_rates'].items())
+    return (f"realized spread {_fmt(stats['realized_spread'])} | markouts {markouts} | "
+            f"fill rate by level {rates or '-'} | participation {_fmt(stats['participation'], '.1%')} | "
+            f"inventory half-life {_fmt(stats['inventory_half_life'], '.1f')} ticks")
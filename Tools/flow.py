@@ -0,0 +1,89 @@
+# flow.py
+#
+# Streaming order-flow features for one ticker, fed with successive OrderBook
+# snapshots. Each update is O(levels) with fixed memory (EWMAs, no history):
+#
+#   ofi             order-flow imbalance of the last update (Cont, Kukanov &
+#                   Stoikov): shares added to the bid / taken off the ask,
+#                   minus the reverse, at the touch
+#   ofi_ewma        OFI smoothed over `halflife` updates
+#   depth_imbalance (bid - ask) / total displayed size over the top `levels`
+#   bid_depletion   EWMA rate (shares/s) at which the best bid / ask queue
+#   ask_depletion   is being eaten; a queue that disappears counts in full
+#   microprice      size-weighted mid, leaning towards the thinner side
+#
+#   flow = OrderFlow('CRZY_M')
+#   flow.update(book, now=time.time())
+#   flow.ofi_ewma, flow.depth_imbalance, flow.microprice
+
+HALFLIFE = 4              # updates
+LEVELS = 5                # levels in the depth imbalance
+
+class OrderFlow:
+    __slots__ = ('ticker', 'alpha', 'levels', 'updates', 'ofi', 'ofi_ewma', 'depth_imbalance',
+                 'bid_depletion', 'ask_depletion', 'microprice',
+                 'bid', 'bid_size', 'ask', 'ask_size', 'ts')
+
+    def __init__(self, ticker=None, halflife=HALFLIFE, levels=LEVELS):
+        self.ticker = ticker
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+        self.levels = levels
+        self.updates = 0
+        self.ofi = 0.0
+        self.ofi_ewma = 0.0
+        self.depth_imbalance = 0.0
+        self.bid_depletion = 0.0
+        self.ask_depletion = 0.0
+        self.microprice = None
+        self.bid = None
+        self.bid_size = 0
+        self.ask = None
+        self.ask_size = 0
+        self.ts = None
+
+    def update(self, book, now):
+        """Fold in a new OrderBook snapshot taken at time now (seconds)."""
+        bid, bid_size = book.best_bid, book.bid_size
+        ask, ask_size = book.best_ask, book.ask_size
+        alpha = self.alpha
+
+        if self.updates and bid is not None and ask is not None and self.bid is not None and self.ask is not None:
+            # Order-flow imbalance at the touch
+            e = 0.0
+            if bid >= self.bid:
+                e += bid_size
+            if bid <= self.bid:
+                e -= self.bid_size
+            if ask <= self.ask:
+                e -= ask_size
+            if ask >= self.ask:
+                e += self.ask_size
+            self.ofi = e
+            self.ofi_ewma += alpha * (e - self.ofi_ewma)
+
+            # Queue depletion: size taken off an unchanged touch, or the whole
+            # queue when the touch moves away from the book
+            dt = now - self.ts
+            if dt > 0:
+                if bid == self.bid:
+                    eaten = max(self.bid_size - bid_size, 0)
+                else:
+                    eaten = self.bid_size if bid < self.bid else 0
+                self.bid_depletion += alpha * (eaten / dt - self.bid_depletion)
+                if ask == self.ask:
+                    eaten = max(self.ask_size - ask_size, 0)
+                else:
+                    eaten = self.ask_size if ask > self.ask else 0
+                self.ask_depletion += alpha * (eaten / dt - self.ask_depletion)
+
+        self.depth_imbalance = book.imbalance(self.levels)
+        if bid is not None and ask is not None and bid_size + ask_size > 0:
+            self.microprice = (bid * ask_size + ask * bid_size) / (bid_size + ask_size)
+        else:
+            self.microprice = book.mid
+
+        self.bid, self.bid_size = bid, bid_size
+        self.ask, self.ask_size = ask, ask_size
+        self.ts = now
+        self.updates += 1
+        return self
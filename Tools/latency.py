@@ -0,0 +1,257 @@
+# latency.py
+#
+# Per-endpoint latency instrumentation for the RIT REST API. LatencyMonitor
+# wraps a requests.Session (or RITSession.session) so every get/post/delete is
+# timed, without touching any call site:
+#
+#   - latency histogram per endpoint (method + path, ids folded into {id})
+#   - HTTP calls per case tick
+#   - HTTP error and timeout counts per endpoint
+#   - tick-to-order latency: time from first seeing a new tick on /case to
+#     each POST /orders sent on that tick
+#
+# Histograms are HDR-style log-linear buckets over integer microseconds, so
+# memory is fixed and recording is a couple of integer ops. A summary is
+# printed and written to <root>/<name>-<timestamp>.json at shutdown; a live
+# snapshot is available from snapshot(), or by sending SIGUSR1 (Ctrl+Break on
+# Windows) to the process. A session that is never attached pays nothing.
+
+import atexit
+import json
+import os
+import re
+import signal
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+SUB_BUCKET_BITS = 6           # 32 buckets per power of two, about 3% precision
+MAX_VALUE = 1 << 26           # values are clamped at ~67 s (in microseconds)
+
+HALF = 1 << (SUB_BUCKET_BITS - 1)
+MAX_SHIFT = MAX_VALUE.bit_length() - SUB_BUCKET_BITS
+NUM_BUCKETS = (MAX_SHIFT + 2) * HALF
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+class Histogram:
+    """Fixed-size log-linear histogram of non-negative integers."""
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        value = min(max(int(value), 0), MAX_VALUE - 1)
+        if value < 2 * HALF:
+            idx = value
+        else:
+            shift = value.bit_length() - SUB_BUCKET_BITS
+            idx = shift * HALF + (value >> shift)
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    @staticmethod
+    def bucket_value(idx):
+        """Lowest value that lands in bucket idx."""
+        if idx < 2 * HALF:
+            return idx
+        shift = idx // HALF - 1
+        return (idx - shift * HALF) << shift
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        target = max(1, int(self.count * q / 100 + 0.5))
+        seen = 0
+        for idx, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self.bucket_value(idx), self.max)
+        return self.max
+
+    def summary(self, scale=1.0):
+        if not self.count:
+            return {'count': 0}
+        out = {'count': self.count, 'mean': self.total / self.count * scale,
+               'min': self.min * scale, 'max': self.max * scale}
+        for q in PERCENTILES:
+            out[f"p{q:g}"] = self.percentile(q) * scale
+        return out
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = {}          # HTTP status -> count
+        self.timeouts = 0
+        self.failures = 0         # connection errors and other exceptions
+
+class LatencyMonitor:
+    def __init__(self, name='session', root='latency', snapshot_signal=True):
+        self.name = name
+        self.path = os.path.join(root, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json") if root else None
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.keys = {}
+        self.calls = 0
+        self.calls_per_tick = Histogram()
+        self.tick_to_order = Histogram()
+        self.tick = None
+        self.tick_calls = 0
+        self.tick_seen_at = None
+        self.started = time.perf_counter()
+        self.closed = False
+
+        if snapshot_signal and threading.current_thread() is threading.main_thread():
+            sig = getattr(signal, 'SIGUSR1', None) or getattr(signal, 'SIGBREAK', None)
+            if sig is not None:
+                signal.signal(sig, self._on_signal)
+        atexit.register(self.close)
+
+    def _on_signal(self, *_):
+        # The handler runs on the main thread, possibly while it holds
+        # self.lock in _record(); dump from a thread that can wait for it
+        threading.Thread(target=self.print_summary, kwargs={'live': True}, daemon=True).start()
+
+    ###########################################################################
+    # Hot path
+    ###########################################################################
+    def attach(self, session):
+        """Time every request made through a requests.Session."""
+        request = session.request
+
+        def timed_request(method, url, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                resp = request(method, url, *args, **kwargs)
+            except requests.Timeout:
+                self._failed(method, url, start, timeout=True)
+                raise
+            except Exception:
+                self._failed(method, url, start, timeout=False)
+                raise
+            self._record(method, url, start, time.perf_counter(), resp)
+            return resp
+
+        session.request = timed_request
+        return session
+
+    def _key(self, method, url):
+        key = self.keys.get((method, url))
+        if key is None:
+            key = f"{method.upper()} {ID_SEGMENT.sub('/{id}', urlsplit(url).path)}"
+            if len(self.keys) < 4096:
+                self.keys[(method, url)] = key
+        return key
+
+    def _stats(self, key):
+        stats = self.endpoints.get(key)
+        if stats is None:
+            stats = self.endpoints[key] = EndpointStats()
+        return stats
+
+    def _record(self, method, url, start, end, resp):
+        key = self._key(method, url)
+        tick = None
+        if key == 'GET /v1/case' and resp.status_code == 200:
+            try:
+                tick = resp.json()['tick']
+            except (ValueError, KeyError, TypeError):
+                pass
+
+        with self.lock:
+            stats = self._stats(key)
+            stats.latency.record((end - start) * 1e6)
+            if resp.status_code >= 400:
+                stats.errors[resp.status_code] = stats.errors.get(resp.status_code, 0) + 1
+            self.calls += 1
+
+            if tick is not None and tick != self.tick:
+                if self.tick is not None:
+                    self.calls_per_tick.record(self.tick_calls)
+                self.tick = tick
+                self.tick_calls = 0
+                self.tick_seen_at = end
+            self.tick_calls += 1
+
+            if key == 'POST /v1/orders' and self.tick_seen_at is not None:
+                self.tick_to_order.record((start - self.tick_seen_at) * 1e6)
+
+    def _failed(self, method, url, start, timeout):
+        key = self._key(method, url)
+        with self.lock:
+            stats = self._stats(key)
+            stats.latency.record((time.perf_counter() - start) * 1e6)
+            if timeout:
+                stats.timeouts += 1
+            else:
+                stats.failures += 1
+            self.calls += 1
+            self.tick_calls += 1
+
+    ###########################################################################
+    # Reporting
+    ###########################################################################
+    def snapshot(self):
+        """Current statistics as a plain dict; latencies in milliseconds."""
+        with self.lock:
+            endpoints = {}
+            for key, stats in sorted(self.endpoints.items()):
+                n = stats.latency.count
+                errors = sum(stats.errors.values())
+                endpoints[key] = {
+                    'latency_ms': stats.latency.summary(1e-3),
+                    'errors': {str(code): c for code, c in stats.errors.items()},
+                    'timeouts': stats.timeouts,
+                    'failures': stats.failures,
+                    'error_rate': (errors + stats.timeouts + stats.failures) / n if n else 0.0
+                }
+            return {
+                'name': self.name,
+                'elapsed_s': time.perf_counter() - self.started,
+                'calls': self.calls,
+                'tick': self.tick,
+                'calls_per_tick': self.calls_per_tick.summary(),
+                'tick_to_order_ms': self.tick_to_order.summary(1e-3),
+                'endpoints': endpoints
+            }
+
+    def print_summary(self, live=False):
+        snap = self.snapshot()
+        print(f"\n=== API latency ({'live' if live else 'final'}) - {snap['name']}: "
+              f"{snap['calls']} calls in {snap['elapsed_s']:.1f}s ===")
+        print(f"{'endpoint':<32}{'calls':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'err%':>7}")
+        for key, ep in snap['endpoints'].items():
+            lat = ep['latency_ms']
+            print(f"{key:<32}{lat['count']:>8}{lat['p50']:>9.2f}{lat['p90']:>9.2f}"
+                  f"{lat['p99']:>9.2f}{lat['max']:>9.2f}{ep['error_rate'] * 100:>7.2f}")
+        cpt = snap['calls_per_tick']
+        if cpt['count']:
+            print(f"calls/tick: mean {cpt['mean']:.1f}  p99 {cpt['p99']:.0f}  max {cpt['max']:.0f}")
+        t2o = snap['tick_to_order_ms']
+        if t2o['count']:
+            print(f"tick-to-order (ms): p50 {t2o['p50']:.2f}  p99 {t2o['p99']:.2f}  max {t2o['max']:.2f}  "
+                  f"({t2o['count']} orders)")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if not self.calls:
+            return
+        self.print_summary()
+        if self.path:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w') as fh:
+                json.dump(self.snapshot(), fh, indent=2)
@@ -0,0 +1,187 @@
+# loadtest.py
+#
+# End-to-end throughput benchmark. Each entry point is started unmodified as
+# a subprocess against a MockRIT server (mock_rit.py) with injected network
+# latency, run for a fixed number of case ticks and then stopped with SIGINT.
+# Reported per entry point:
+#
+#   loops/s         main-loop iterations per second, counted from the entry
+#                   point's once-per-loop marker endpoint on the server
+#   calls/tick      HTTP calls the server saw per case tick (mean / p99)
+#   tick->order     ms from the server starting a tick to each POST /orders
+#   cpu%, rss       child CPU time over wall time and peak resident memory,
+#                   from the rusage of the reaped process
+#
+#   python Tools/loadtest.py                              # every entry point
+#   python Tools/loadtest.py -k arbitrage --ticks 60 --latency-ms 10 --jitter-ms 5
+#   python Tools/loadtest.py --baseline loadtest/20261019-101500.json
+#
+# Results are written to loadtest/<timestamp>.json; with --baseline the
+# headline numbers are printed as percentage changes against an earlier run.
+# Linux/macOS only (uses os.wait4), and port 9999 must be free.
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_rit import MockRIT, CASES
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# name -> (script, case, marker endpoint, marker calls per loop)
+ENTRY_POINTS = {
+    'commodities': ('Commodities/main.py', 'commodities', None, 1),
+    'arbitrage': ('Arbitrage/arbitrage_algo1.py', 'arbitrage', 'GET /v1/securities', 2),
+    'mm_algo2': ('Market Making/marketmaking_algo2.py', 'algo', 'GET /v1/securities/book', 1),
+    'mm_algo2_tradeeval': ('Market Making/marketmaking_algo2_tradeeval.py', 'algo', 'GET /v1/securities/book', 1),
+    'mm_algo2e': ('Market Making/marketmaking_algo2e.py', 'algo2e', 'GET /v1/securities', 1),
+    'tenders_auto': ('Tenders/tenders_automatedorders.py', 'tenders', 'GET /v1/tenders', 1),
+    'tenders_manual': ('Tenders/tenders_manualorders.py', 'tenders', 'GET /v1/tenders', 1),
+}
+
+HEADLINE = ['loops_per_s', 'calls_per_tick', 'tick_to_order_p50_ms', 'tick_to_order_p99_ms', 'cpu_pct', 'max_rss_mb']
+
+def _profile_loops(workdir):
+    """Loop count from the StageProfiler tick records (Commodities only)."""
+    loops = 0
+    for path in glob.glob(os.path.join(workdir, 'profiles', '*.jsonl')):
+        with open(path) as fh:
+            for line in fh:
+                loops += json.loads(line).get('loops', 0)
+    return loops
+
+def _stop(proc, grace):
+    """SIGINT, a second SIGINT, then SIGKILL; returns the child's rusage."""
+    for sig in (signal.SIGINT, signal.SIGINT, signal.SIGKILL):
+        try:
+            os.kill(proc.pid, sig)
+        except ProcessLookupError:
+            break
+        deadline = time.time() + grace
+        while time.time() < deadline:
+            pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                proc.returncode = status
+                return rusage
+            time.sleep(0.05)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = status
+    return rusage
+
+def run_entry(name, ticks, tick_seconds, latency, jitter, seed, port, keep_logs):
+    script, case, marker, per_loop = ENTRY_POINTS[name]
+    mock = MockRIT(CASES[case](seed), port, tick_seconds, latency, jitter, seed)
+    workdir = tempfile.mkdtemp(prefix=f"loadtest-{name}-")
+    log_path = os.path.join(workdir, 'stdout.log')
+
+    mock.start()
+    started = time.perf_counter()
+    with open(log_path, 'w') as log:
+        proc = subprocess.Popen([sys.executable, '-u', os.path.join(ROOT, script)], cwd=workdir,
+                                stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+        while mock.ticks < ticks and proc.poll() is None and not mock.market.finished:
+            time.sleep(0.05)
+        wall = time.perf_counter() - started
+        exited_early = proc.returncode is not None
+        rusage = _stop(proc, grace=3.0) if not exited_early else os.wait4(proc.pid, os.WNOHANG)[2]
+    stats = mock.stats()
+    mock.stop()
+
+    if marker is None:
+        loops = _profile_loops(workdir)
+    else:
+        loops = stats['calls'].get(marker, 0) / per_loop
+    t2o = stats['tick_to_order_ms']
+    cpu = rusage.ru_utime + rusage.ru_stime
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss_mb = rusage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+    result = {
+        'entry': name,
+        'script': script,
+        'ticks': stats['ticks'],
+        'wall_s': wall,
+        'loops': loops,
+        'loops_per_s': loops / wall if wall else 0.0,
+        'http_calls': stats['total_calls'],
+        'calls_per_tick': stats['calls_per_tick'].get('mean', 0.0),
+        'calls_per_tick_p99': stats['calls_per_tick'].get('p99', 0.0),
+        'orders': t2o['count'],
+        'tick_to_order_p50_ms': t2o.get('p50'),
+        'tick_to_order_p99_ms': t2o.get('p99'),
+        'cpu_s': cpu,
+        'cpu_pct': cpu / wall * 100 if wall else 0.0,
+        'max_rss_mb': rss_mb,
+        'exited_early': exited_early,
+        'endpoints': stats['calls'],
+        'log': log_path if keep_logs else None
+    }
+    if exited_early:
+        with open(log_path) as fh:
+            result['log_tail'] = fh.read()[-2000:]
+    if not keep_logs:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+def print_table(results, baseline=None):
+    base = {r['entry']: r for r in (baseline or {}).get('results', [])}
+    print(f"\n{'entry':<20}{'loops/s':>9}{'calls/tick':>12}{'t2o p50':>10}{'t2o p99':>10}"
+          f"{'orders':>8}{'cpu%':>8}{'rss MB':>8}")
+    for r in results:
+        fmt = lambda v, spec: format(v, spec) if v is not None else f"{'-':>{spec.split('.')[0]}}"
+        print(f"{r['entry']:<20}{fmt(r['loops_per_s'], '9.2f')}{fmt(r['calls_per_tick'], '12.1f')}"
+              f"{fmt(r['tick_to_order_p50_ms'], '10.2f')}{fmt(r['tick_to_order_p99_ms'], '10.2f')}"
+              f"{r['orders']:>8}{fmt(r['cpu_pct'], '8.1f')}{fmt(r['max_rss_mb'], '8.1f')}"
+              f"{'  (exited early)' if r['exited_early'] else ''}")
+        prev = base.get(r['entry'])
+        if prev:
+            deltas = []
+            for key in HEADLINE:
+                old, new = prev.get(key), r.get(key)
+                if old and new is not None:
+                    deltas.append(f"{key} {(new - old) / old * 100:+.1f}%")
+            print(f"{'':<20}vs baseline: {', '.join(deltas)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark of each entry point against a mock RIT server")
+    parser.add_argument('-k', dest='filter', default='', help="only entry points whose name contains this")
+    parser.add_argument('--ticks', type=int, default=30)
+    parser.add_argument('--tick-seconds', type=float, default=0.5)
+    parser.add_argument('--latency-ms', type=float, default=2.0)
+    parser.add_argument('--jitter-ms', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=9999)
+    parser.add_argument('--out', default='loadtest')
+    parser.add_argument('--baseline', help="earlier loadtest JSON to compare against")
+    parser.add_argument('--keep-logs', action='store_true', help="keep each entry point's working directory and output")
+    args = parser.parse_args()
+
+    names = [n for n in ENTRY_POINTS if args.filter in n]
+    results = []
+    for name in names:
+        print(f"Running {name} for {args.ticks} ticks of {args.tick_seconds}s "
+              f"({args.latency_ms}ms +{args.jitter_ms}ms latency)...")
+        results.append(run_entry(name, args.ticks, args.tick_seconds, args.latency_ms / 1000,
+                                 args.jitter_ms / 1000, args.seed, args.port, args.keep_logs))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    print_table(results, baseline)
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as fh:
+        json.dump({'config': vars(args), 'results': results}, fh, indent=2)
+    print(f"\nResults written to {path}")
+
+if __name__ == '__main__':
+    main()
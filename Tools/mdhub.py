@@ -0,0 +1,331 @@
+# mdhub.py
+#
+# Shared market-data hub. One MarketDataHub process polls /case, /securities,
+# /securities/book (per ticker), /news and /tenders once per cycle and
+# publishes every response whose body changed to local subscribers over a
+# localhost socket. Each frame carries a global sequence number and the raw
+# JSON body:
+#
+#   <seq u64><ts f64><topic length u16><body length u32><topic><body>
+#
+# Topics are 'case', 'securities', 'book/<ticker>', 'news', 'tenders' and a
+# 'cycle' frame closing every poll cycle (cycle start time and hub limits).
+# New subscribers receive the current snapshot of every topic on connect.
+# With shm_name set, books are also written to a shared-memory ring
+# (shmbook.py) that other processes can read without any decoding.
+#
+# Strategies subscribe by attaching a MarketDataClient to their session; GETs
+# the hub covers are then answered from the latest snapshot and everything
+# else (orders, leases, tender accept/decline) goes to RIT as before:
+#
+#   MarketDataClient(('localhost', 9998)).attach(session)
+#
+# A client falls back to polling RIT directly while the hub is silent for
+# longer than max_age, and after each of its own POST/DELETE until a poll
+# cycle that started after the write has completed, so a strategy never acts
+# on a position or book from before its own order.
+#
+#   python Tools/mdhub.py --interval 0.1 --tickers CRZY_M,CRZY_A
+
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from recorder import SessionRecorder
+from asynclog import get_logger
+
+log = get_logger('mdhub')
+from latency import LatencyMonitor
+from shmbook import BookRingWriter
+
+API_KEY = 'QDSFW62B'
+BASE_URL = 'http://localhost:9999/v1'
+HUB_ADDRESS = ('localhost', 9998)
+
+HEADER = struct.Struct('<QdHI')
+
+# path -> topic, and the query parameters a snapshot can answer
+TOPICS = {
+    '/v1/case': ('case', set()),
+    '/v1/securities': ('securities', {'ticker'}),
+    '/v1/securities/book': ('book', {'ticker', 'limit'}),
+    '/v1/news': ('news', {'since', 'limit'}),
+    '/v1/tenders': ('tenders', set())
+}
+
+###############################################################################
+# Hub
+###############################################################################
+class MarketDataHub:
+    def __init__(self, api_key=API_KEY, address=HUB_ADDRESS, interval=0.1, tickers=None,
+                 book_limit=20, news_limit=20, record_dir=None, latency_stats=False, shm_name=None):
+        self.session = requests.Session()
+        self.session.headers.update({'X-API-Key': api_key})
+        if record_dir:
+            SessionRecorder(record_dir, 'mdhub').attach(self.session)
+        if latency_stats:
+            LatencyMonitor('mdhub').attach(self.session)
+
+        self.address = tuple(address)
+        self.interval = interval
+        self.tickers = list(tickers) if tickers else None
+        self.book_limit = book_limit
+        self.news_limit = news_limit
+        self.shm_name = shm_name
+        self.ring = None
+
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.snapshots = {}       # topic -> frame
+        self.bodies = {}          # topic -> last published body
+        self.seq = 0
+        self.cycles = 0
+        self.published = 0
+        self.running = False
+        self.server = None
+
+    def _publish(self, topic, body):
+        topic_b = topic.encode()
+        with self.lock:
+            self.seq += 1
+            frame = HEADER.pack(self.seq, time.time(), len(topic_b), len(body)) + topic_b + body
+            self.snapshots[topic] = frame
+            self.published += 1
+            for sub in list(self.subscribers):
+                try:
+                    sub.sendall(frame)
+                except OSError:
+                    # Slow or gone; it reconnects and gets a fresh snapshot
+                    self.subscribers.remove(sub)
+                    sub.close()
+
+    def _poll(self, topic, path, params=None):
+        """Poll one endpoint; returns the body if it changed since the last poll."""
+        resp = self.session.get(BASE_URL + path, params=params)
+        if resp.status_code != 200:
+            return None
+        body = resp.content
+        if self.bodies.get(topic) == body:
+            return None
+        self.bodies[topic] = body
+        self._publish(topic, body)
+        return body
+
+    def poll_once(self):
+        """One poll cycle over every endpoint, closed by a 'cycle' frame."""
+        started = time.time()
+        self._poll('case', '/case')
+        securities = self._poll('securities', '/securities')
+        if self.tickers is None and securities is not None:
+            self.tickers = [s['ticker'] for s in json.loads(securities)]
+        if self.shm_name and self.ring is None and self.tickers:
+            self.ring = BookRingWriter(self.shm_name, self.tickers, self.book_limit)
+        for ticker in self.tickers or []:
+            body = self._poll(f"book/{ticker}", '/securities/book', {'ticker': ticker, 'limit': self.book_limit})
+            if body is not None and self.ring is not None:
+                self.ring.write(ticker, json.loads(body))
+        self._poll('news', '/news', {'limit': self.news_limit})
+        self._poll('tenders', '/tenders')
+        self.cycles += 1
+        self._publish('cycle', json.dumps({'start': started, 'book_limit': self.book_limit,
+                                           'news_limit': self.news_limit}).encode())
+
+    def _accept(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(0.5)
+            with self.lock:
+                try:
+                    for frame in self.snapshots.values():
+                        conn.sendall(frame)
+                except OSError:
+                    conn.close()
+                    continue
+                self.subscribers.append(conn)
+            log.info('hub', "Subscriber connected ({} total)", len(self.subscribers))
+
+    def run(self):
+        self.server = socket.create_server(self.address)
+        self.running = True
+        threading.Thread(target=self._accept, name='mdhub-accept', daemon=True).start()
+        log.info('hub', "Market-data hub on {}:{}, polling every {}s", self.address[0], self.address[1], self.interval)
+        started = time.perf_counter()
+        try:
+            while self.running:
+                cycle_start = time.perf_counter()
+                try:
+                    self.poll_once()
+                except requests.ConnectionError:
+                    log.warning('hub', "RIT not reachable; retrying")
+                    time.sleep(1)
+                    continue
+                time.sleep(max(self.interval - (time.perf_counter() - cycle_start), 0))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            elapsed = time.perf_counter() - started
+            log.info('hub', "Hub stopped: {} cycles ({:.1f}/s), {} frames published",
+                     self.cycles, self.cycles / elapsed if elapsed else 0, self.published)
+
+    def stop(self):
+        self.running = False
+        if self.server:
+            self.server.close()
+        with self.lock:
+            for sub in self.subscribers:
+                sub.close()
+            self.subscribers = []
+        if self.ring is not None:
+            self.ring.close()
+
+###############################################################################
+# Subscriber
+###############################################################################
+class HubResponse:
+    def __init__(self, url, payload, status_code=200):
+        self.url = url
+        self.payload = payload
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def json(self):
+        return self.payload
+
+class MarketDataClient:
+    def __init__(self, address=HUB_ADDRESS, max_age=1.0):
+        self.address = tuple(address)
+        self.max_age = max_age
+        self.topics = {}          # topic -> (seq, body)
+        self.seq = 0
+        self.cycle_start = 0.0    # hub time the last complete poll cycle started
+        self.heartbeat_at = 0.0   # local time the last cycle frame arrived
+        self.last_write = 0.0
+        self.book_limit = 0
+        self.news_limit = 0
+        self.hits = 0
+        self.misses = 0
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, name='mdhub-client', daemon=True).start()
+
+    ###########################################################################
+    # Feed
+    ###########################################################################
+    def _run(self):
+        while True:
+            try:
+                with socket.create_connection(self.address, timeout=5) as sock:
+                    sock.settimeout(None)
+                    self._read(sock.makefile('rb'))
+            except OSError:
+                pass
+            self.heartbeat_at = 0.0
+            time.sleep(1)
+
+    def _read(self, stream):
+        while True:
+            header = stream.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            seq, ts, topic_len, body_len = HEADER.unpack(header)
+            topic = stream.read(topic_len).decode()
+            body = stream.read(body_len)
+            with self.cond:
+                if topic == 'cycle':
+                    cycle = json.loads(body)
+                    self.cycle_start = cycle['start']
+                    self.book_limit = cycle['book_limit']
+                    self.news_limit = cycle['news_limit']
+                    self.heartbeat_at = time.time()
+                else:
+                    self.topics[topic] = (seq, body)
+                self.seq = seq
+                self.cond.notify_all()
+
+    def wait(self, after_seq, timeout=None):
+        """Block until a frame newer than after_seq arrives; returns the latest seq."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > after_seq, timeout)
+            return self.seq
+
+    ###########################################################################
+    # Session hook
+    ###########################################################################
+    def attach(self, session):
+        """Answer market-data GETs on session from the hub's snapshots."""
+        request = session.request
+
+        def hub_request(method, url, *args, **kwargs):
+            if method.upper() == 'GET':
+                resp = self.serve(url, kwargs.get('params'))
+                if resp is not None:
+                    return resp
+            else:
+                self.last_write = time.time()
+            return request(method, url, *args, **kwargs)
+
+        session.request = hub_request
+        return session
+
+    def serve(self, url, params=None):
+        """A response built from the latest snapshot, or None to go to RIT."""
+        path = urlsplit(url).path
+        route = TOPICS.get(path)
+        params = params or {}
+        if (route is None or not set(params) <= route[1]
+                or time.time() - self.heartbeat_at > self.max_age or self.cycle_start <= self.last_write):
+            self.misses += 1
+            return None
+
+        topic = route[0]
+        if topic == 'book':
+            topic = f"book/{params.get('ticker')}"
+        entry = self.topics.get(topic)
+        limit = int(params['limit']) if 'limit' in params else None
+        if entry is None or (limit is not None and limit > (self.book_limit if route[0] == 'book' else self.news_limit)):
+            self.misses += 1
+            return None
+
+        payload = json.loads(entry[1])
+        if route[0] == 'securities' and 'ticker' in params:
+            payload = [s for s in payload if s['ticker'] == params['ticker']]
+        elif route[0] == 'book' and limit is not None:
+            payload = {side: levels[:limit] for side, levels in payload.items()}
+        elif route[0] == 'news':
+            if 'since' in params:
+                payload = [n for n in payload if n['news_id'] > int(params['since'])]
+            if limit is not None:
+                payload = payload[:limit]
+        self.hits += 1
+        return HubResponse(url, payload)
+
+def main():
+    parser = argparse.ArgumentParser(description="Poll RIT market data once and fan it out to local strategies")
+    parser.add_argument('--port', type=int, default=HUB_ADDRESS[1])
+    parser.add_argument('--interval', type=float, default=0.1, help="seconds between poll cycles")
+    parser.add_argument('--tickers', help="comma-separated book tickers (default: every ticker on /securities)")
+    parser.add_argument('--book-limit', type=int, default=20)
+    parser.add_argument('--news-limit', type=int, default=20)
+    parser.add_argument('--api-key', default=API_KEY)
+    parser.add_argument('--record', metavar='DIR', help="record the hub's responses to DIR")
+    parser.add_argument('--latency-stats', action='store_true')
+    parser.add_argument('--shm', metavar='NAME', help="also publish books to a shared-memory ring (shmbook.py)")
+    args = parser.parse_args()
+
+    hub = MarketDataHub(args.api_key, (HUB_ADDRESS[0], args.port), args.interval,
+                        args.tickers.split(',') if args.tickers else None,
+                        args.book_limit, args.news_limit, args.record, args.latency_stats, args.shm)
+    hub.run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+# mock_rit.py
+#
+# Local stand-in for the RIT REST API. MockRIT serves a simulated market over
+# HTTP on localhost:9999, so the engines run unmodified, advances it on a wall
+# clock tick, and can inject per-request latency and jitter. It also keeps
+# server-side load statistics: calls per endpoint, calls per tick and the
+# latency from the start of each tick to every order that arrives on it.
+#
+# Markets:
+#   EquityMarket  generic random-walk equities with synthetic depth, order
+#                 matching, open orders, news and tenders (arbitrage, market
+#                 making and tender cases)
+#   Commodities   the COM5 SimMarket from Commodities/backtest.py
+#
+#   python Tools/mock_rit.py --case arbitrage --tick-seconds 1 --latency-ms 5 --jitter-ms 2
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from latency import Histogram
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+class MockResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def json(self):
+        return self.payload
+
+###############################################################################
+# Generic equity market
+###############################################################################
+class EquityMarket:
+    """
+    tickers maps each ticker to its underlying; tickers sharing an underlying
+    (CRZY_M / CRZY_A) quote the same random walk plus independent noise, so
+    cross-venue arbitrage appears now and then.
+    """
+    def __init__(self, tickers, seed=0, ticks_per_period=300, num_periods=1, start_price=25.0,
+                 volatility=0.02, venue_noise=0.01, depth=20, tender_rate=0.0, news_rate=1 / 30,
+                 passive_fill_rate=0.3):
+        self.rng = random.Random(seed)
+        self.tickers = dict(tickers)
+        self.ticks_per_period = ticks_per_period
+        self.num_periods = num_periods
+        self.volatility = volatility
+        self.venue_noise = venue_noise
+        self.depth = depth
+        self.tender_rate = tender_rate
+        self.news_rate = news_rate
+        self.passive_fill_rate = passive_fill_rate
+
+        self.period = 1
+        self.tick = 1
+        self.finished = False
+
+        self.mids = {u: start_price * (1 + 0.2 * i) for i, u in enumerate(sorted(set(self.tickers.values())))}
+        self.books = {}
+        self.consumed = {}        # (ticker, side, level) -> quantity taken this tick
+        self.positions = {t: 0 for t in self.tickers}
+        self.cash = 0.0
+        self.volume = {t: 0 for t in self.tickers}
+        self.last = {}
+        self.orders = {}
+        self.next_order_id = 1
+        self.news = []
+        self.next_news_id = 1
+        self.tenders = {}
+        self.next_tender_id = 1
+        self.tape = []            # time and sales, oldest first
+        self._reprice()
+
+    @property
+    def abs_tick(self):
+        return (self.period - 1) * self.ticks_per_period + self.tick
+
+    def _reprice(self):
+        rng = self.rng
+        self.consumed = {}
+        for ticker, underlying in self.tickers.items():
+            mid = self.mids[underlying] + rng.gauss(0, self.venue_noise)
+            half = rng.choice([0.01, 0.01, 0.02, 0.03]) / 2
+            bid, ask = round(mid - half, 2), round(mid + half, 2)
+            if ask <= bid:
+                ask = round(bid + 0.01, 2)
+            self.books[ticker] = {
+                'bids': [{'order_id': -(i + 1), 'price': round(bid - 0.01 * i, 2), 'quantity': rng.randint(1, 40) * 500,
+                          'quantity_filled': 0, 'ticker': ticker, 'action': 'BUY', 'type': 'LIMIT'}
+                         for i in range(self.depth)],
+                'asks': [{'order_id': -(1000 + i), 'price': round(ask + 0.01 * i, 2), 'quantity': rng.randint(1, 40) * 500,
+                          'quantity_filled': 0, 'ticker': ticker, 'action': 'SELL', 'type': 'LIMIT'}
+                         for i in range(self.depth)]
+            }
+            self.last[ticker] = round(mid, 2)
+            # Background volume at the touch, so the tape is never just our fills
+            self._print(ticker, bid, self.books[ticker]['bids'][0]['quantity'] // 10)
+
+    def advance(self):
+        for underlying in self.mids:
+            self.mids[underlying] = max(0.5, self.mids[underlying] + self.rng.gauss(0, self.volatility))
+        if self.tick >= self.ticks_per_period:
+            if self.period >= self.num_periods:
+                self.finished = True
+                return
+            self.period += 1
+            self.tick = 0
+        self.tick += 1
+        self._reprice()
+        self._match_resting()
+        self._generate_events()
+
+    def _generate_events(self):
+        rng = self.rng
+        if rng.random() < self.news_rate:
+            ticker = rng.choice(list(self.tickers))
+            self.news.insert(0, {'news_id': self.next_news_id, 'period': self.period, 'tick': self.tick,
+                                 'ticker': ticker, 'headline': f"{ticker} NEWS {self.next_news_id}", 'body': ''})
+            self.next_news_id += 1
+        if self.tender_rate and rng.random() < self.tender_rate:
+            ticker = rng.choice([t for t in self.tickers if t.endswith('_M')] or list(self.tickers))
+            action = rng.choice(['BUY', 'SELL'])
+            mid = self.last[ticker]
+            edge = rng.uniform(-0.1, 0.3)
+            tender_id = self.next_tender_id
+            self.next_tender_id += 1
+            self.tenders[tender_id] = {
+                'tender_id': tender_id, 'period': self.period, 'tick': self.tick,
+                'expires': min(self.tick + 15, self.ticks_per_period), 'caption': f"Tender {tender_id}",
+                'quantity': rng.randint(2, 20) * 5000, 'action': action, 'is_fixed_bid': True,
+                'price': round(mid - edge if action == 'BUY' else mid + edge, 2), 'ticker': ticker
+            }
+        for tender_id in [t for t, tender in self.tenders.items() if tender['expires'] < self.tick]:
+            del self.tenders[tender_id]
+
+    def _print(self, ticker, price, qty):
+        self.tape.append({'id': len(self.tape) + 1, 'period': self.period, 'tick': self.tick,
+                          'ticker': ticker, 'price': price, 'quantity': qty})
+
+    def _fill(self, order, qty, price):
+        sign = 1 if order['action'] == 'BUY' else -1
+        filled = order['quantity_filled']
+        order['vwap'] = ((order['vwap'] or 0) * filled + price * qty) / (filled + qty)
+        order['quantity_filled'] = filled + qty
+        if order['quantity_filled'] >= order['quantity']:
+            order['status'] = 'TRANSACTED'
+        self.positions[order['ticker']] += sign * qty
+        self.cash -= sign * qty * price
+        self.volume[order['ticker']] += qty
+        self.last[order['ticker']] = price
+        self._print(order['ticker'], price, qty)
+
+    def _take(self, order, limit=None):
+        side = 'asks' if order['action'] == 'BUY' else 'bids'
+        for i, level in enumerate(self.books[order['ticker']][side]):
+            remaining = order['quantity'] - order['quantity_filled']
+            if remaining <= 0:
+                return
+            if limit is not None and (level['price'] > limit if side == 'asks' else level['price'] < limit):
+                return
+            key = (order['ticker'], side, i)
+            qty = min(remaining, level['quantity'] - self.consumed.get(key, 0))
+            if qty > 0:
+                self.consumed[key] = self.consumed.get(key, 0) + qty
+                self._fill(order, qty, level['price'])
+
+    def _match_resting(self):
+        for order in self.orders.values():
+            if order['status'] != 'OPEN':
+                continue
+            self._take(order, order['price'])
+            if order['status'] != 'OPEN':
+                continue
+            # Passive fills for orders resting at or inside the touch
+            book = self.books[order['ticker']]
+            touch = book['bids'][0]['price'] if order['action'] == 'BUY' else book['asks'][0]['price']
+            at_touch = order['price'] >= touch if order['action'] == 'BUY' else order['price'] <= touch
+            if at_touch and self.rng.random() < self.passive_fill_rate:
+                remaining = order['quantity'] - order['quantity_filled']
+                self._fill(order, min(remaining, self.rng.randint(1, 10) * 500), order['price'])
+
+    def _securities(self):
+        out = []
+        for ticker in self.tickers:
+            book = self.books[ticker]
+            position = self.positions[ticker]
+            out.append({'ticker': ticker, 'position': position, 'last': self.last[ticker],
+                        'bid': book['bids'][0]['price'], 'ask': book['asks'][0]['price'],
+                        'bid_size': book['bids'][0]['quantity'], 'ask_size': book['asks'][0]['quantity'],
+                        'volume': self.volume[ticker], 'vwap': self.last[ticker], 'realized': 0,
+                        'unrealized': 0, 'is_tradeable': True})
+        return out
+
+    def _book_with_orders(self, ticker, limit):
+        """Exchange depth plus our resting orders, best first."""
+        book = self.books[ticker]
+        ours = [o for o in self.orders.values() if o['status'] == 'OPEN' and o['ticker'] == ticker]
+        bids = sorted(book['bids'] + [o for o in ours if o['action'] == 'BUY'], key=lambda o: -o['price'])
+        asks = sorted(book['asks'] + [o for o in ours if o['action'] == 'SELL'], key=lambda o: o['price'])
+        return {'bids': bids[:limit], 'asks': asks[:limit]}
+
+    def nlv(self):
+        return self.cash + sum(q * self.last[t] for t, q in self.positions.items())
+
+    def results(self):
+        return {'pnl': self.nlv(), 'orders': len(self.orders),
+                'volume': sum(self.volume.values()), 'positions': dict(self.positions)}
+
+    ###########################################################################
+    # REST
+    ###########################################################################
+    def get(self, url, params=None, **kwargs):
+        params = params or {}
+        path = urlsplit(url).path
+        if path == '/v1/case':
+            return MockResponse({'name': 'MOCK', 'period': self.period, 'tick': self.tick,
+                                 'ticks_per_period': self.ticks_per_period, 'total_periods': self.num_periods,
+                                 'status': 'STOPPED' if self.finished else 'ACTIVE', 'is_enforce_trading_limits': False})
+        if path == '/v1/securities':
+            securities = self._securities()
+            if 'ticker' in params:
+                securities = [s for s in securities if s['ticker'] == params['ticker']]
+            return MockResponse(securities)
+        if path == '/v1/securities/book':
+            ticker = params.get('ticker')
+            if ticker not in self.books:
+                return MockResponse({'code': 'NOT_FOUND'}, 404)
+            return MockResponse(self._book_with_orders(ticker, int(params.get('limit', self.depth))))
+        if path == '/v1/securities/tas':
+            after = int(params.get('after', 0))
+            return MockResponse([dict(p) for p in self.tape[after:] if p['ticker'] == params.get('ticker')])
+        if path == '/v1/orders':
+            status = params.get('status', 'OPEN')
+            return MockResponse([dict(o) for o in self.orders.values() if o['status'] == status])
+        if path.startswith('/v1/orders/'):
+            order = self.orders.get(int(path.rsplit('/', 1)[1]))
+            if order is None:
+                return MockResponse({'code': 'NOT_FOUND'}, 404)
+            return MockResponse(dict(order))
+        if path == '/v1/news':
+            return MockResponse(self.news[:int(params.get('limit', 20))])
+        if path == '/v1/tenders':
+            return MockResponse(list(self.tenders.values()))
+        if path == '/v1/leases':
+            return MockResponse([])
+        return MockResponse({'code': 'NOT_FOUND'}, 404)
+
+    def post(self, url, params=None, **kwargs):
+        params = params or {}
+        parts = urlsplit(url).path.strip('/').split('/')
+        if parts == ['v1', 'orders']:
+            ticker = params.get('ticker')
+            qty = float(params.get('quantity', 0))
+            if ticker not in self.books or qty <= 0 or params.get('action') not in ('BUY', 'SELL'):
+                return MockResponse({'code': 'INVALID_ORDER'}, 400)
+            order = {'order_id': self.next_order_id, 'period': self.period, 'tick': self.tick, 'trader_id': 'mock',
+                     'ticker': ticker, 'type': params.get('type', 'MARKET'), 'quantity': qty,
+                     'action': params['action'], 'price': float(params.get('price') or 0),
+                     'quantity_filled': 0.0, 'vwap': None, 'status': 'OPEN'}
+            self.next_order_id += 1
+            self.orders[order['order_id']] = order
+            self._take(order, None if order['type'] == 'MARKET' else order['price'])
+            if order['type'] == 'MARKET' and order['status'] == 'OPEN':
+                order['status'] = 'CANCELLED'
+            return MockResponse(dict(order))
+        if parts == ['v1', 'commands', 'cancel']:
+            ids = {int(x) for x in str(params.get('ids', '')).split(',') if x}
+            cancelled = []
+            for order in self.orders.values():
+                if order['status'] == 'OPEN' and (params.get('all') or order['order_id'] in ids
+                                                  or order['ticker'] == params.get('ticker')):
+                    order['status'] = 'CANCELLED'
+                    cancelled.append(order['order_id'])
+            return MockResponse({'cancelled_order_ids': cancelled})
+        if parts[:2] == ['v1', 'tenders'] and len(parts) == 3:
+            tender = self.tenders.pop(int(parts[2]), None)
+            if tender is None:
+                return MockResponse({'code': 'NOT_FOUND'}, 404)
+            sign = 1 if tender['action'] == 'BUY' else -1
+            self.positions[tender['ticker']] += sign * tender['quantity']
+            self.cash -= sign * tender['quantity'] * tender['price']
+            return MockResponse({'success': True})
+        return MockResponse({'code': 'NOT_FOUND'}, 404)
+
+    def delete(self, url, params=None, **kwargs):
+        parts = urlsplit(url).path.strip('/').split('/')
+        if parts[:2] == ['v1', 'orders'] and len(parts) == 3:
+            order = self.orders.get(int(parts[2]))
+            if order is None or order['status'] != 'OPEN':
+                return MockResponse({'code': 'NOT_FOUND'}, 404)
+            order['status'] = 'CANCELLED'
+            return MockResponse({'success': True})
+        if parts[:2] == ['v1', 'tenders'] and len(parts) == 3:
+            if self.tenders.pop(int(parts[2]), None) is None:
+                return MockResponse({'code': 'NOT_FOUND'}, 404)
+            return MockResponse({'success': True})
+        return MockResponse({'code': 'NOT_FOUND'}, 404)
+
+def commodities_market(seed=0):
+    sys.path.insert(0, os.path.join(ROOT, 'Commodities'))
+    import backtest
+    return backtest.SimMarket(seed)
+
+CASES = {
+    'arbitrage': lambda seed: EquityMarket({'CRZY_M': 'CRZY', 'CRZY_A': 'CRZY'}, seed),
+    'tenders': lambda seed: EquityMarket({'CRZY_M': 'CRZY', 'CRZY_A': 'CRZY', 'TAME_M': 'TAME', 'TAME_A': 'TAME'},
+                                         seed, tender_rate=1 / 20),
+    'algo': lambda seed: EquityMarket({'ALGO': 'ALGO'}, seed),
+    'algo2e': lambda seed: EquityMarket({'CNR': 'CNR', 'RY': 'RY', 'AC': 'AC'}, seed),
+    'commodities': commodities_market
+}
+
+###############################################################################
+# HTTP server
+###############################################################################
+class MockRIT:
+    def __init__(self, market, port=9999, tick_seconds=1.0, latency=0.0, jitter=0.0, seed=0):
+        self.market = market
+        self.port = port
+        self.tick_seconds = tick_seconds
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        self.calls = {}
+        self.calls_per_tick = Histogram()
+        self.tick_to_order = Histogram()
+        self.tick_calls = 0
+        self.ticks = 0
+        self.tick_started = time.perf_counter()
+        self.server = None
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True    # headers and body go out as separate writes
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                status, body = mock.handle(method, self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def do_DELETE(self):
+                self._serve('DELETE')
+
+        return Handler
+
+    def handle(self, method, raw_path):
+        if self.latency or self.jitter:
+            with self.lock:
+                delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+            time.sleep(delay)
+
+        parts = urlsplit(raw_path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        url = f"http://localhost:{self.port}{parts.path}"
+        key = f"{method} {ID_SEGMENT.sub('/{id}', parts.path)}"
+        with self.lock:
+            arrived = time.perf_counter()
+            self.calls[key] = self.calls.get(key, 0) + 1
+            self.tick_calls += 1
+            if key == 'POST /v1/orders':
+                self.tick_to_order.record((arrived - self.tick_started) * 1e6)
+            resp = getattr(self.market, method.lower())(url, params)
+            body = json.dumps(resp.json()).encode()
+        return resp.status_code, body
+
+    def _clock(self):
+        next_tick = time.perf_counter() + self.tick_seconds
+        while not self.stopped.is_set() and not self.market.finished:
+            delay = next_tick - time.perf_counter()
+            if delay > 0 and self.stopped.wait(delay):
+                return
+            next_tick += self.tick_seconds
+            with self.lock:
+                self.calls_per_tick.record(self.tick_calls)
+                self.tick_calls = 0
+                self.market.advance()
+                self.ticks += 1
+                self.tick_started = time.perf_counter()
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('localhost', self.port), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='mock-rit-http', daemon=True).start()
+        threading.Thread(target=self._clock, name='mock-rit-clock', daemon=True).start()
+        self.tick_started = time.perf_counter()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'ticks': self.ticks,
+                'calls': dict(sorted(self.calls.items())),
+                'total_calls': sum(self.calls.values()),
+                'calls_per_tick': self.calls_per_tick.summary(),
+                'tick_to_order_ms': self.tick_to_order.summary(1e-3)
+            }
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a simulated RIT case on localhost")
+    parser.add_argument('--case', choices=sorted(CASES), default='arbitrage')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=9999)
+    parser.add_argument('--tick-seconds', type=float, default=1.0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    mock = MockRIT(CASES[args.case](args.seed), args.port, args.tick_seconds,
+                   args.latency_ms / 1000, args.jitter_ms / 1000, args.seed).start()
+    print(f"Mock RIT '{args.case}' on http://localhost:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        while not mock.market.finished:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    mock.stop()
+    print(json.dumps(mock.stats(), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# openorders.py
+#
+# Local view of our resting orders, so a quoting loop does not need a full
+# GET /orders on every pass. Orders are added from the POST /orders response
+# and dropped when we cancel them; a full /orders?status=OPEN snapshot is
+# taken every `reconcile_every` loops to pick up anything else the case did
+# behind our back, and straight away when the position moves (a fill), so
+# filled orders never linger as resting:
+#
+#   tracker = OpenOrders(reconcile_every=10)
+#   tracker.maybe_reconcile(session)           # once per loop
+#   tracker.on_position(session, 'ALGO', pos)  # whenever the position is read
+#   if not tracker.resting('ALGO', 'BUY', price):
+#       tracker.add(session.post(url, params=...).json())
+#   len(tracker), tracker.count('ALGO', 'BUY'), tracker.values()
+#
+# Besides the order_id map, orders are indexed per (ticker, action) by price
+# (rounded to `decimals`), which makes counts and "do we already rest here"
+# checks O(1).
+
+BASE_URL = 'http://localhost:9999/v1'
+RECONCILE_EVERY = 10      # loops between /orders snapshots
+DECIMALS = 2              # price rounding for the per-price index
+
+class OpenOrders:
+    def __init__(self, reconcile_every=RECONCILE_EVERY, decimals=DECIMALS):
+        self.reconcile_every = reconcile_every
+        self.decimals = decimals
+        self.orders = {}          # order_id -> order
+        self.levels = {}          # (ticker, action) -> {price: {order_id: order}}
+        self.counts = {}          # (ticker, action) -> number of orders
+        self.loops = 0
+        self.reconciles = 0
+        self.positions = {}       # ticker -> last position seen by on_position()
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id):
+        return order_id in self.orders
+
+    def values(self):
+        return self.orders.values()
+
+    def add(self, order):
+        """Track an order from a POST /orders response (ignored unless it rests)."""
+        if order.get('status') != 'OPEN' or order.get('type') != 'LIMIT':
+            return
+        order_id = order['order_id']
+        if order_id in self.orders:
+            self.remove(order_id)
+        key = (order['ticker'], order['action'])
+        price = round(order['price'], self.decimals)
+        self.orders[order_id] = order
+        self.levels.setdefault(key, {}).setdefault(price, {})[order_id] = order
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def remove(self, order_id):
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return None
+        key = (order['ticker'], order['action'])
+        price = round(order['price'], self.decimals)
+        level = self.levels[key][price]
+        del level[order_id]
+        if not level:
+            del self.levels[key][price]
+        self.counts[key] -= 1
+        return order
+
+    def discard(self, order_ids):
+        for order_id in order_ids:
+            self.remove(order_id)
+
+    def count(self, ticker, action):
+        return self.counts.get((ticker, action), 0)
+
+    def resting(self, ticker, action, price):
+        """Quantity left on our orders at exactly this price."""
+        level = self.levels.get((ticker, action), {}).get(round(price, self.decimals))
+        if not level:
+            return 0
+        return sum(o['quantity'] - o.get('quantity_filled', 0) for o in level.values())
+
+    def reconcile(self, open_orders):
+        """Replace the local state with an /orders?status=OPEN snapshot."""
+        self.orders.clear()
+        self.levels.clear()
+        self.counts.clear()
+        for order in open_orders:
+            self.add(order)
+        self.reconciles += 1
+
+    def maybe_reconcile(self, session):
+        """Call once per loop; fetches /orders every `reconcile_every` calls."""
+        due = self.loops % self.reconcile_every == 0
+        self.loops += 1
+        if not due:
+            return False
+        return self._fetch(session)
+
+    def on_position(self, session, ticker, position):
+        """Reconcile now if ticker's position moved since the last call (we were filled)."""
+        last = self.positions.get(ticker)
+        self.positions[ticker] = position
+        if last is None or last == position:
+            return False
+        return self._fetch(session)
+
+    def _fetch(self, session):
+        resp = session.get(f"{BASE_URL}/orders", params={'status': 'OPEN'})
+        if not resp.ok:
+            return False
+        self.reconcile(resp.json())
+        return True
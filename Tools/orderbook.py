@@ -0,0 +1,137 @@
+# orderbook.py
+#
+# Per-ticker order book kept across loop iterations. apply() takes a decoded
+# snapshot (fastjson.Book: top-first parallel price/size lists), finds the
+# first level that changed on each side, and only recomputes the running
+# cumulative size and notional from that level down. Everything a loop reads
+# is then an O(1) lookup:
+#
+#   book = ORDER_BOOKS.setdefault(ticker, OrderBook(ticker))
+#   book.apply(decode_book(resp))
+#   book.best_bid, book.bid_size, book.spread, book.mid
+#   book.bid_volume, book.vwap_bid, book.depth('bids', 5), book.imbalance(3)
+#
+# Cumulative sums are built top-down in the same order a full recompute
+# would use, so incremental results are bit-for-bit identical to
+# sum(quantity) / sum(price * quantity) over the whole side.
+
+class OrderBook:
+    __slots__ = ('ticker', 'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes',
+                 'bid_cum_size', 'bid_cum_notional', 'ask_cum_size', 'ask_cum_notional',
+                 'updates', 'bid_changed', 'ask_changed')
+
+    def __init__(self, ticker=None):
+        self.ticker = ticker
+        self.bid_prices = []
+        self.bid_sizes = []
+        self.ask_prices = []
+        self.ask_sizes = []
+        self.bid_cum_size = []
+        self.bid_cum_notional = []
+        self.ask_cum_size = []
+        self.ask_cum_notional = []
+        self.updates = 0
+        self.bid_changed = 0      # first level that changed on the last apply()
+        self.ask_changed = 0      # (== number of levels when nothing did)
+
+    @staticmethod
+    def _apply_side(prices, sizes, old_prices, old_sizes, cum_size, cum_notional):
+        n = min(len(prices), len(old_prices))
+        i = 0
+        while i < n and prices[i] == old_prices[i] and sizes[i] == old_sizes[i]:
+            i += 1
+        if i == len(prices) == len(old_prices):
+            return i
+        del cum_size[i:]
+        del cum_notional[i:]
+        size = cum_size[-1] if i else 0
+        notional = cum_notional[-1] if i else 0
+        for j in range(i, len(prices)):
+            size += sizes[j]
+            notional += prices[j] * sizes[j]
+            cum_size.append(size)
+            cum_notional.append(notional)
+        return i
+
+    def apply(self, book):
+        """Move to a new snapshot; returns self for chaining."""
+        self.bid_changed = self._apply_side(book.bid_prices, book.bid_sizes, self.bid_prices, self.bid_sizes,
+                                            self.bid_cum_size, self.bid_cum_notional)
+        self.ask_changed = self._apply_side(book.ask_prices, book.ask_sizes, self.ask_prices, self.ask_sizes,
+                                            self.ask_cum_size, self.ask_cum_notional)
+        self.bid_prices, self.bid_sizes = book.bid_prices, book.bid_sizes
+        self.ask_prices, self.ask_sizes = book.ask_prices, book.ask_sizes
+        self.updates += 1
+        return self
+
+    ###########################################################################
+    # Top of book
+    ###########################################################################
+    @property
+    def best_bid(self):
+        return self.bid_prices[0] if self.bid_prices else None
+
+    @property
+    def best_ask(self):
+        return self.ask_prices[0] if self.ask_prices else None
+
+    @property
+    def bid_size(self):
+        return self.bid_sizes[0] if self.bid_sizes else 0
+
+    @property
+    def ask_size(self):
+        return self.ask_sizes[0] if self.ask_sizes else 0
+
+    @property
+    def mid(self):
+        if not self.bid_prices or not self.ask_prices:
+            return None
+        return (self.bid_prices[0] + self.ask_prices[0]) / 2
+
+    @property
+    def spread(self):
+        if not self.bid_prices or not self.ask_prices:
+            return None
+        return self.ask_prices[0] - self.bid_prices[0]
+
+    ###########################################################################
+    # Depth
+    ###########################################################################
+    @property
+    def bid_volume(self):
+        return self.bid_cum_size[-1] if self.bid_cum_size else 0
+
+    @property
+    def ask_volume(self):
+        return self.ask_cum_size[-1] if self.ask_cum_size else 0
+
+    @property
+    def bid_notional(self):
+        return self.bid_cum_notional[-1] if self.bid_cum_notional else 0
+
+    @property
+    def ask_notional(self):
+        return self.ask_cum_notional[-1] if self.ask_cum_notional else 0
+
+    @property
+    def vwap_bid(self):
+        return self.bid_notional / self.bid_volume if self.bid_volume else None
+
+    @property
+    def vwap_ask(self):
+        return self.ask_notional / self.ask_volume if self.ask_volume else None
+
+    def depth(self, side, levels):
+        """Cumulative displayed size over the top `levels` levels of side."""
+        cum = self.bid_cum_size if side == 'bids' else self.ask_cum_size
+        if not cum or levels <= 0:
+            return 0
+        return cum[min(levels, len(cum)) - 1]
+
+    def imbalance(self, levels=1):
+        """(bid depth - ask depth) / total over the top `levels`, in [-1, 1]."""
+        bid = self.depth('bids', levels)
+        ask = self.depth('asks', levels)
+        total = bid + ask
+        return (bid - ask) / total if total else 0.0
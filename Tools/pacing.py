@@ -0,0 +1,113 @@
+# pacing.py
+#
+# Loop pacing for the quoting loops. Instead of a fixed speedbump tuned by
+# hand for one case speed ("0.2 for 100% and 0.1 for 200%"), a Pacer measures
+# how long a case tick lasts and how long the loop's own API calls take, and
+# sleeps just enough to refresh quotes `refreshes_per_tick` times per tick:
+#
+#   PACER = Pacer(refreshes_per_tick=5, max_calls_per_second=40)
+#   PACER.attach(session)                        # count calls, see 429s
+#   ...
+#   PACER.observe_tick(tick, time.monotonic())   # whenever /case is read
+#   sleep(PACER.pause(time.monotonic(), scale))  # end of each loop
+#
+# The pause is the per-refresh period (measured tick length / refreshes, times
+# `scale` for the caller's own slow-down factors) minus the time the loop
+# already spent working and minus one measured round trip, so the data the
+# next loop reads is as fresh as the cadence allows. It is never less than
+# what keeps the calls made since the last pause under
+# `max_calls_per_second`, and never less than any wait the server asked for
+# with HTTP 429. Tick length is measured between tick changes only; the tick
+# the pacer first sees is joined part-way through and is not used. Callers
+# pass timestamps in, so the pacer runs on whatever clock the script uses
+# (replay's virtual clock too).
+
+TICK_SECONDS = 1.0        # assumed tick length until one has been measured
+REFRESHES_PER_TICK = 5
+HALFLIFE = 4              # ticks, for the tick-length and latency averages
+MIN_PAUSE = 0.0
+
+def _retry_after(resp):
+    """Seconds a 429 response asks us to wait (RIT sends 'wait' in the body)."""
+    value = resp.headers.get('Retry-After') if getattr(resp, 'headers', None) else None
+    if value is None:
+        try:
+            value = resp.json().get('wait')
+        except (ValueError, AttributeError):
+            value = None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+class Pacer:
+    def __init__(self, refreshes_per_tick=REFRESHES_PER_TICK, max_calls_per_second=None,
+                 tick_seconds=TICK_SECONDS, min_pause=MIN_PAUSE, halflife=HALFLIFE):
+        self.refreshes_per_tick = refreshes_per_tick
+        self.max_calls_per_second = max_calls_per_second
+        self.tick_seconds = tick_seconds
+        self.min_pause = min_pause
+        self.alpha = 1 - 0.5 ** (1 / halflife)
+
+        self.tick = None
+        self.tick_at = None       # when self.tick began, once a tick change has been seen
+        self.ticks_measured = 0
+        self.loop_start = None
+        self.calls = 0            # since the last pause
+        self.latency = None       # EWMA round trip, seconds
+        self.backoff = 0.0        # server-requested wait still to honour
+        self.throttled = 0        # 429 responses seen
+
+    def attach(self, session):
+        """Watch every response on session (a requests.Session or stand-in)."""
+        session.hooks['response'].append(self.on_response)
+        return session
+
+    def on_response(self, resp, *args, **kwargs):
+        self.calls += 1
+        elapsed = getattr(resp, 'elapsed', None)
+        if elapsed is not None:
+            rtt = elapsed.total_seconds()
+            self.latency = rtt if self.latency is None else self.latency + self.alpha * (rtt - self.latency)
+        if resp.status_code == 429:
+            self.throttled += 1
+            self.backoff = max(self.backoff, _retry_after(resp))
+
+    def observe_tick(self, tick, now):
+        """Feed each /case tick read, with the time it was read."""
+        if self.tick is None:
+            self.tick = tick
+            return
+        if tick == self.tick:
+            return
+        if tick > self.tick and self.tick_at is not None:
+            per_tick = (now - self.tick_at) / (tick - self.tick)
+            if per_tick > 0:
+                if self.ticks_measured:
+                    self.tick_seconds += self.alpha * (per_tick - self.tick_seconds)
+                else:
+                    self.tick_seconds = per_tick
+                self.ticks_measured += 1
+        # A tick boundary (or a new period): time from here
+        self.tick = tick
+        self.tick_at = now
+
+    def period(self):
+        """Target seconds between quote refreshes."""
+        return self.tick_seconds / self.refreshes_per_tick
+
+    def pause(self, now, scale=1.0):
+        """Seconds to sleep before the next loop iteration."""
+        work = now - self.loop_start if self.loop_start is not None else 0.0
+        wait = self.period() * scale - work - (self.latency or 0.0)
+        if self.max_calls_per_second:
+            wait = max(wait, self.calls / self.max_calls_per_second - work)
+        wait = max(wait, self.backoff, self.min_pause)
+        self.backoff = 0.0
+        self.calls = 0
+        self.loop_start = now + wait
+        return wait
+
+    def stats(self):
+        return {'tick_seconds': self.tick_seconds, 'period': self.period(), 'latency': self.latency,
+                'throttled': self.throttled}
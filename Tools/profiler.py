@@ -0,0 +1,190 @@
+# profiler.py
+#
+# Stage timing for tick loops. StageProfiler times named stages of each loop
+# iteration, counts the HTTP calls made inside each stage, keeps rolling
+# p50/p99 per stage, and folds every loop on the same case tick into one
+# compact per-tick record:
+#
+#   {"p": 1, "t": 91, "loops": 7, "ms": 812.4,
+#    "stages": {"snapshot": [31.2, 21], "RefineryModel.update": [402.7, 14], ...}}
+#
+# Records are appended to <root>/<name>-<timestamp>.jsonl, and any tick whose
+# loops took longer than the tick budget is logged (category 'profile', on the
+# engine's asynclog logger) with its slowest stage.
+#
+# SamplingProfiler is an opt-in wall-clock sampler for deep dives: a
+# background thread snapshots the loop thread's stack every interval and
+# writes collapsed stacks (flamegraph.pl / speedscope format) at shutdown.
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from asynclog import get_logger
+
+WINDOW = 1000           # loops kept per stage for the rolling percentiles
+TICK_BUDGET = 1.0       # seconds of wall time per case tick
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'start', 'calls')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.calls = self.profiler.calls
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start, self.profiler.calls - self.calls)
+        return False
+
+class StageProfiler:
+    def __init__(self, name='loop', root=None, tick_budget=TICK_BUDGET, window=WINDOW):
+        self.name = name
+        self.tick_budget = tick_budget
+        self.window = window
+        self.calls = 0
+        self.stages = {}          # name -> rolling deque of seconds
+        self.stage_calls = {}     # name -> total HTTP calls
+        self.tick_key = None
+        self.tick_loops = 0
+        self.tick_stages = {}     # name -> [seconds, calls] on the current tick
+        self.closed = False
+
+        self.out = None
+        if root:
+            os.makedirs(root, exist_ok=True)
+            self.out = open(os.path.join(root, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl"), 'a')
+        atexit.register(self.close)
+
+    def attach(self, session):
+        """Count HTTP calls made through session (anything with get/post/delete)."""
+        for verb in ('get', 'post', 'delete'):
+            method = getattr(session, verb)
+
+            def counted(*args, _method=method, **kwargs):
+                self.calls += 1
+                return _method(*args, **kwargs)
+
+            setattr(session, verb, counted)
+        return session
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add(self, name, seconds, calls=0):
+        samples = self.stages.get(name)
+        if samples is None:
+            samples = self.stages[name] = deque(maxlen=self.window)
+            self.stage_calls[name] = 0
+        samples.append(seconds)
+        self.stage_calls[name] += calls
+
+        acc = self.tick_stages.get(name)
+        if acc is None:
+            self.tick_stages[name] = [seconds, calls]
+        else:
+            acc[0] += seconds
+            acc[1] += calls
+
+    def end_loop(self, tick, period):
+        """Close one loop iteration; flushes the tick record when the tick moves on."""
+        key = (period, tick)
+        if key != self.tick_key:
+            self._flush_tick()
+            self.tick_key = key
+        self.tick_loops += 1
+
+    def _flush_tick(self):
+        if self.tick_key is None or not self.tick_stages:
+            self.tick_stages = {}
+            self.tick_loops = 0
+            return
+        period, tick = self.tick_key
+        total = sum(s for s, _ in self.tick_stages.values())
+        record = {
+            'p': period, 't': tick, 'loops': self.tick_loops, 'ms': round(total * 1e3, 2),
+            'stages': {name: [round(s * 1e3, 2), c] for name, (s, c) in self.tick_stages.items()}
+        }
+        if self.out:
+            self.out.write(json.dumps(record, separators=(',', ':')) + '\n')
+        if total > self.tick_budget:
+            slowest = max(self.tick_stages, key=lambda n: self.tick_stages[n][0])
+            get_logger(self.name).warning('profile', "[p{}][tick {}] Tick budget exceeded: {:.3f}s over {} loops "
+                                          "(slowest: {} {:.3f}s)", period, tick, total, self.tick_loops,
+                                          slowest, self.tick_stages[slowest][0])
+        self.tick_stages = {}
+        self.tick_loops = 0
+
+    def summary(self):
+        """Rolling p50/p99 (ms) and total HTTP calls per stage."""
+        return {name: {'p50_ms': _percentile(samples, 50) * 1e3,
+                       'p99_ms': _percentile(samples, 99) * 1e3,
+                       'http_calls': self.stage_calls[name]}
+                for name, samples in self.stages.items()}
+
+    def print_summary(self):
+        print(f"\n=== Stage profile - {self.name} (last {self.window} loops) ===")
+        print(f"{'stage':<28}{'p50 ms':>10}{'p99 ms':>10}{'http':>8}")
+        for name, s in self.summary().items():
+            print(f"{name:<28}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['http_calls']:>8}")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._flush_tick()
+        if self.out:
+            self.out.close()
+        if self.stages:
+            self.print_summary()
+
+class SamplingProfiler:
+    def __init__(self, path, interval=0.005, thread=None):
+        self.path = path
+        self.interval = interval
+        self.thread_id = (thread or threading.current_thread()).ident
+        self.stacks = {}
+        self.samples = 0
+        self.running = True
+        self.sampler = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self.sampler.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.sampler.join()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'w') as fh:
+            for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1]):
+                fh.write(f"{stack} {n}\n")
+        print(f"Sampling profiler: {self.samples} samples written to {self.path}")
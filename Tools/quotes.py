@@ -0,0 +1,111 @@
+# quotes.py
+#
+# Quote engine for multi-ticker market makers. Per-ticker parameters (a
+# TICKER_CONFIG dict as in marketmaking_algo2e.py) and the rolling mid-price
+# windows live in NumPy arrays, and one compute() call produces every
+# ticker's bid/ask price and size for the loop:
+#
+#   engine = QuoteEngine(TICKER_CONFIG, gross_limit=GLOBAL_POSITION_LIMIT)
+#   q = engine.compute(bids, asks, positions)    # arrays in engine.tickers order
+#   for i in np.flatnonzero(q.buy_ok): ...
+#
+# Per ticker, with a full window of WINDOW_SIZE mids:
+#   slope        (newest mid - oldest mid) / WINDOW_SIZE
+#   adjust       +TREND_VALUE above TREND_UP_THRESHOLD, -TREND_VALUE below
+#                TREND_DOWN_THRESHOLD
+#   sizes        ORDER_SIZE, or REB_SIZE on the side that adds to a position
+#                beyond +/-REB_LIMIT
+#   prices       inside +/- IMPROVE when the spread is >= MIN_SPREAD, else at
+#                the touch, both shifted by adjust
+#   buy_ok       quotes do not cross and a full fill of this side alone keeps
+#   sell_ok      the gross position (sum of |position|) within gross_limit
+#
+# The arithmetic matches the scalar per-ticker loop it replaces operation for
+# operation, so prices come out identical.
+
+import numpy as np
+
+class Quotes:
+    __slots__ = ('valid', 'buy_price', 'sell_price', 'buy_quantity', 'sell_quantity', 'buy_ok', 'sell_ok')
+
+    def __init__(self, valid, buy_price, sell_price, buy_quantity, sell_quantity, buy_ok, sell_ok):
+        self.valid = valid
+        self.buy_price = buy_price
+        self.sell_price = sell_price
+        self.buy_quantity = buy_quantity
+        self.sell_quantity = sell_quantity
+        self.buy_ok = buy_ok
+        self.sell_ok = sell_ok
+
+class QuoteEngine:
+    def __init__(self, config, gross_limit):
+        self.tickers = list(config)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.gross_limit = gross_limit
+
+        def column(key, dtype=float):
+            return np.array([config[t][key] for t in self.tickers], dtype=dtype)
+
+        self.window = column('WINDOW_SIZE', np.int64)
+        self.trend_up = column('TREND_UP_THRESHOLD')
+        self.trend_down = column('TREND_DOWN_THRESHOLD')
+        self.trend_value = column('TREND_VALUE')
+        self.order_size = column('ORDER_SIZE', np.int64)
+        self.reb_size = column('REB_SIZE', np.int64)
+        self.reb_limit = column('REB_LIMIT')
+        self.min_spread = column('MIN_SPREAD')
+        self.improve = column('IMPROVE')
+
+        # Ring buffer of mids per ticker; observations[i] mids seen so far
+        self.depth = int(self.window.max())
+        self.mids = np.zeros((len(self.tickers), self.depth))
+        self.observations = np.zeros(len(self.tickers), dtype=np.int64)
+        self.rows = np.arange(len(self.tickers))
+
+    def vector(self, values, default=np.nan):
+        """Dict {ticker: value} as an array in engine order (None -> default)."""
+        out = np.full(len(self.tickers), default, dtype=float)
+        for ticker, value in values.items():
+            i = self.index.get(ticker)
+            if i is not None and value is not None:
+                out[i] = value
+        return out
+
+    def _slopes(self, valid, mid):
+        rows = self.rows[valid]
+        n = self.observations[valid]
+        self.mids[rows, n % self.depth] = mid[valid]
+        self.observations[valid] = n + 1
+
+        n = self.observations
+        full = n >= self.window
+        newest = self.mids[self.rows, (n - 1) % self.depth]
+        oldest = self.mids[self.rows, (n - self.window) % self.depth]
+        return np.where(full, (newest - oldest) / self.window, 0.0)
+
+    def compute(self, bids, asks, positions):
+        """
+        One loop's quotes from best bid/ask arrays (nan or 0 for an empty
+        side) and a position array, all in engine.tickers order.
+        """
+        valid = (bids > 0) & (asks > 0)         # nan compares False
+        mid = (bids + asks) / 2
+        slope = self._slopes(valid, mid)
+
+        adjust = np.where(slope > self.trend_up, self.trend_value,
+                          np.where(slope < self.trend_down, -self.trend_value, 0.0))
+
+        buy_quantity = np.where(positions > self.reb_limit, self.reb_size, self.order_size)
+        sell_quantity = np.where(positions < -self.reb_limit, self.reb_size, self.order_size)
+
+        wide = (asks - bids) >= self.min_spread
+        buy_price = np.where(wide, bids + self.improve + adjust, bids + adjust)
+        sell_price = np.where(wide, asks - self.improve + adjust, asks + adjust)
+
+        # Gross position if one side filled completely, others unchanged
+        held = np.abs(positions)
+        rest = held.sum() - held
+        quoting = valid & (buy_price < sell_price)
+        buy_ok = quoting & (rest + np.abs(positions + buy_quantity) <= self.gross_limit)
+        sell_ok = quoting & (rest + np.abs(positions - sell_quantity) <= self.gross_limit)
+        return Quotes(valid, buy_price, sell_price, buy_quantity, sell_quantity, buy_ok, sell_ok)
@@ -0,0 +1,291 @@
+# recorder.py
+#
+# Append-only, column-oriented recorder for the RIT REST responses our engines
+# see. Every /case, /securities, /securities/book, /news and /tenders GET that
+# goes through a recorded requests.Session is captured by a response hook,
+# handed to a background writer thread and appended to one fixed-width binary
+# file per column:
+#
+#   recordings/<name>-<timestamp>/
+#       meta.json                  schema, ticker table, row counts
+#       responses/<column>.bin     one row per captured response (the seq index)
+#       case/ securities/ book/ news/ tenders/ ticks/
+#
+# Every row carries the `seq` of the response it came from, so a table can be
+# sliced by response with np.searchsorted, and the `ticks` table maps each
+# (period, tick) to the first response seen on that tick. Column files are raw
+# little-endian NumPy arrays and can be opened with np.memmap via
+# SessionRecording.
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+ENDPOINTS = {
+    '/v1/case': 0,
+    '/v1/securities': 1,
+    '/v1/securities/book': 2,
+    '/v1/news': 3,
+    '/v1/tenders': 4
+}
+ENDPOINT_NAMES = {v: k for k, v in ENDPOINTS.items()}
+
+CASE_STATUS = {'ACTIVE': 1, 'PAUSED': 2, 'STOPPED': 3}
+ACTIONS = {'BUY': 1, 'SELL': -1}
+SIDES = {'bids': 1, 'asks': -1}
+
+SCHEMA = {
+    'responses': [('seq', '<u8'), ('ts', '<f8'), ('elapsed', '<f4'), ('endpoint', 'u1'),
+                  ('status', '<u2'), ('period', '<i2'), ('tick', '<i4'), ('ticker', '<i2')],
+    'ticks': [('seq', '<u8'), ('period', '<i2'), ('tick', '<i4')],
+    'case': [('seq', '<u8'), ('period', '<i2'), ('tick', '<i4'), ('ticks_per_period', '<i4'),
+             ('total_periods', '<i2'), ('status', 'u1')],
+    'securities': [('seq', '<u8'), ('ticker', '<i2'), ('position', '<f8'), ('last', '<f8'),
+                   ('bid', '<f8'), ('ask', '<f8'), ('bid_size', '<f8'), ('ask_size', '<f8'),
+                   ('volume', '<f8'), ('vwap', '<f8'), ('realized', '<f8'), ('unrealized', '<f8')],
+    'book': [('seq', '<u8'), ('ticker', '<i2'), ('side', 'i1'), ('level', '<i2'), ('order_id', '<i8'),
+             ('price', '<f8'), ('quantity', '<f8'), ('quantity_filled', '<f8')],
+    'news': [('seq', '<u8'), ('news_id', '<i8'), ('period', '<i2'), ('tick', '<i4'), ('ticker', '<i2'),
+             ('headline', 'S256'), ('body', 'S1024')],
+    'tenders': [('seq', '<u8'), ('tender_id', '<i8'), ('period', '<i2'), ('tick', '<i4'),
+                ('expires', '<i4'), ('ticker', '<i2'), ('action', 'i1'), ('quantity', '<f8'),
+                ('price', '<f8'), ('is_fixed_bid', '?')]
+}
+
+SECURITY_FIELDS = ['position', 'last', 'bid', 'ask', 'bid_size', 'ask_size',
+                   'volume', 'vwap', 'realized', 'unrealized']
+BOOK_FIELDS = ['order_id', 'price', 'quantity', 'quantity_filled']
+
+def _num(value):
+    return float('nan') if value is None else value
+
+class SessionRecorder:
+    def __init__(self, root='recordings', name='session', flush_interval=0.5, batch_size=256):
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        self.path = os.path.join(root, f"{name}-{stamp}")
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self.queue = queue.SimpleQueue()
+        self.tickers = []
+        self.ticker_ids = {}
+        self.seen_news = set()
+        self.rows = {table: {col: [] for col, _ in cols} for table, cols in SCHEMA.items()}
+        self.counts = {table: 0 for table in SCHEMA}
+        self.files = {}
+        self.seq = 0
+        self.period = 0
+        self.tick = -1
+        self.closed = False
+
+        for table, cols in SCHEMA.items():
+            os.makedirs(os.path.join(self.path, table), exist_ok=True)
+            for col, _ in cols:
+                self.files[(table, col)] = open(os.path.join(self.path, table, f"{col}.bin"), 'ab')
+
+        self.writer = threading.Thread(target=self._run, name='session-recorder', daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    ###########################################################################
+    # Hot path
+    ###########################################################################
+    def attach(self, session):
+        """Record every response of a requests.Session (or RITSession.session)."""
+        session.hooks['response'].append(self.on_response)
+        return session
+
+    def on_response(self, resp, *args, **kwargs):
+        # Only hand the raw bytes over; all parsing happens on the writer thread
+        if resp.request.method == 'GET' and not self.closed:
+            self.queue.put((time.time(), resp.elapsed.total_seconds(), resp.status_code, resp.url, resp.content))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.writer.join()
+        for fh in self.files.values():
+            fh.close()
+
+    ###########################################################################
+    # Writer thread
+    ###########################################################################
+    def _run(self):
+        last_flush = time.monotonic()
+        pending = 0
+        while True:
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0.001)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+
+            if item is None:
+                self._flush()
+                return
+            if item:
+                try:
+                    self._decode(*item)
+                except (ValueError, KeyError, TypeError):
+                    pass  # malformed or error payloads are not recorded
+                pending += 1
+
+            if pending >= self.batch_size or (pending and time.monotonic() - last_flush >= self.flush_interval):
+                self._flush()
+                pending = 0
+                last_flush = time.monotonic()
+
+    def _ticker_id(self, ticker):
+        if ticker is None:
+            return -1
+        tid = self.ticker_ids.get(ticker)
+        if tid is None:
+            tid = self.ticker_ids[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return tid
+
+    def _append(self, table, **values):
+        rows = self.rows[table]
+        for col in rows:
+            rows[col].append(values[col])
+
+    def _decode(self, ts, elapsed, status, url, content):
+        parts = urlsplit(url)
+        endpoint = ENDPOINTS.get(parts.path)
+        if endpoint is None or status != 200:
+            return
+        data = json.loads(content)
+        params = parse_qs(parts.query)
+        ticker = params.get('ticker', [None])[0]
+
+        self.seq += 1
+        seq = self.seq
+
+        if endpoint == ENDPOINTS['/v1/case']:
+            if (data['period'], data['tick']) != (self.period, self.tick):
+                self.period, self.tick = data['period'], data['tick']
+                self._append('ticks', seq=seq, period=self.period, tick=self.tick)
+            self._append('case', seq=seq, period=data['period'], tick=data['tick'],
+                         ticks_per_period=data.get('ticks_per_period', 0),
+                         total_periods=data.get('total_periods', 0),
+                         status=CASE_STATUS.get(data.get('status'), 0))
+
+        elif endpoint == ENDPOINTS['/v1/securities']:
+            for sec in data:
+                self._append('securities', seq=seq, ticker=self._ticker_id(sec['ticker']),
+                             **{f: _num(sec.get(f)) for f in SECURITY_FIELDS})
+
+        elif endpoint == ENDPOINTS['/v1/securities/book']:
+            tid = self._ticker_id(ticker)
+            for side, sign in SIDES.items():
+                for level, order in enumerate(data.get(side) or []):
+                    self._append('book', seq=seq, ticker=tid, side=sign, level=level,
+                                 **{f: _num(order.get(f)) for f in BOOK_FIELDS})
+
+        elif endpoint == ENDPOINTS['/v1/news']:
+            # /news returns the whole feed each time; store each item once
+            for item in data:
+                if item['news_id'] in self.seen_news:
+                    continue
+                self.seen_news.add(item['news_id'])
+                self._append('news', seq=seq, news_id=item['news_id'], period=item.get('period', 0),
+                             tick=item.get('tick', 0), ticker=self._ticker_id(item.get('ticker') or None),
+                             headline=(item.get('headline') or '').encode()[:256],
+                             body=(item.get('body') or '').encode()[:1024])
+
+        elif endpoint == ENDPOINTS['/v1/tenders']:
+            for tender in data:
+                self._append('tenders', seq=seq, tender_id=tender['tender_id'], period=tender.get('period', 0),
+                             tick=tender.get('tick', 0), expires=tender.get('expires', 0),
+                             ticker=self._ticker_id(tender['ticker']), action=ACTIONS.get(tender['action'], 0),
+                             quantity=tender['quantity'], price=_num(tender.get('price')),
+                             is_fixed_bid=bool(tender.get('is_fixed_bid', True)))
+
+        self._append('responses', seq=seq, ts=ts, elapsed=elapsed, endpoint=endpoint, status=status,
+                     period=self.period, tick=self.tick, ticker=self._ticker_id(ticker))
+
+    def _flush(self):
+        for table, cols in SCHEMA.items():
+            rows = self.rows[table]
+            n = len(rows['seq'])
+            if not n:
+                continue
+            for col, dtype in cols:
+                np.asarray(rows[col], dtype=dtype).tofile(self.files[(table, col)])
+                rows[col].clear()
+            self.counts[table] += n
+        for fh in self.files.values():
+            fh.flush()
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {
+            'version': 1,
+            'schema': SCHEMA,
+            'endpoints': ENDPOINTS,
+            'tickers': self.tickers,
+            'counts': self.counts
+        }
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+
+class SessionRecording:
+    """
+    Read-only view of a recording. Columns are memory-mapped, and the row
+    count is taken from the file size so a recording cut off mid-flush still
+    opens cleanly.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as fh:
+            self.meta = json.load(fh)
+        self.tickers = self.meta['tickers']
+        self.ticker_ids = {t: i for i, t in enumerate(self.tickers)}
+        self.tables = {}
+        for table, cols in self.meta['schema'].items():
+            n = min(self._rows_on_disk(table, col, dtype) for col, dtype in cols)
+            self.tables[table] = {col: self._map(table, col, dtype, n) for col, dtype in cols}
+
+    def _rows_on_disk(self, table, col, dtype):
+        return os.path.getsize(os.path.join(self.path, table, f"{col}.bin")) // np.dtype(dtype).itemsize
+
+    def _map(self, table, col, dtype, n):
+        if n == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, table, f"{col}.bin"), dtype=dtype, mode='r', shape=(n,))
+
+    def __getitem__(self, table):
+        return self.tables[table]
+
+    def __len__(self):
+        return len(self.tables['responses']['seq'])
+
+    def rows(self, table, seq):
+        """Slice of table rows captured from response seq."""
+        seqs = self.tables[table]['seq']
+        lo, hi = np.searchsorted(seqs, seq, 'left'), np.searchsorted(seqs, seq, 'right')
+        return slice(lo, hi)
+
+    def seq_range(self, period, tick):
+        """(first, last) response seq recorded while the case was on (period, tick)."""
+        ticks = self.tables['ticks']
+        key = (ticks['period'].astype(np.int64) << 32) | ticks['tick'].astype(np.int64)
+        i = np.searchsorted(key, (period << 32) | tick)
+        if i >= len(key) or key[i] != (period << 32) | tick:
+            return None
+        last = ticks['seq'][i + 1] - 1 if i + 1 < len(key) else self.tables['responses']['seq'][-1]
+        return int(ticks['seq'][i]), int(last)
+
+    def ticker_rows(self, table, ticker):
+        """Row indices of table belonging to ticker."""
+        return np.flatnonzero(self.tables[table]['ticker'] == self.ticker_ids[ticker])
@@ -0,0 +1,585 @@
+# replay.py
+#
+# Deterministic replay of recorded sessions (see recorder.py) through the same
+# requests.Session interface the engines use live. ReplaySession answers the
+# RIT REST endpoints from the recording at the current virtual time and runs a
+# simulated fill model for orders, tenders and leases. The engine's sleep()
+# and time functions are pointed at a ReplayClock, so:
+#
+#   speed=None   as fast as possible; virtual time only moves on sleep() and a
+#                fixed per-call latency, which makes runs exactly repeatable
+#   speed=1.0    real time
+#   speed=N      N x real time
+#
+# Usage:
+#   python Tools/replay.py recordings/arbitrage-20250301-101500 arbitrage --speed max
+
+import argparse
+import importlib.util
+import math
+import os
+import statistics
+import sys
+import threading
+import time
+import traceback
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from recorder import SessionRecording, ENDPOINTS, CASE_STATUS, SECURITY_FIELDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENGINES = {
+    'arbitrage': 'Arbitrage/arbitrage_algo1.py',
+    'mm_algo2': 'Market Making/marketmaking_algo2.py',
+    'mm_algo2e': 'Market Making/marketmaking_algo2e.py',
+    'mm_algo2_tradeeval': 'Market Making/marketmaking_algo2_tradeeval.py',
+    'tenders_auto': 'Tenders/tenders_automatedorders.py',
+    'tenders_manual': 'Tenders/tenders_manualorders.py',
+    'commodities': 'Commodities/master.py'
+}
+
+# Every module in the Commodities folder, so new ones are reloaded too
+COMMODITIES_MODULES = sorted(name[:-3] for name in os.listdir(os.path.join(ROOT, 'Commodities'))
+                             if name.endswith('.py'))
+
+CASE_STATUS_NAMES = {v: k for k, v in CASE_STATUS.items()}
+
+class ReplayFinished(Exception):
+    pass
+
+###############################################################################
+# Clock
+###############################################################################
+class ReplayClock:
+    """Stands in for the `time` module inside a replayed engine."""
+    def __init__(self, start, speed=None, call_latency=0.005):
+        self.start = start
+        self.speed = speed
+        self.call_latency = call_latency
+        self.virtual = start
+        self.wall0 = time.perf_counter()
+
+    def now(self):
+        if self.speed is None:
+            return self.virtual
+        return self.start + (time.perf_counter() - self.wall0) * self.speed
+
+    def sleep(self, seconds):
+        if self.speed is None:
+            self.virtual += seconds
+        else:
+            time.sleep(seconds / self.speed)
+
+    def api_call(self):
+        if self.speed is None:
+            self.virtual += self.call_latency
+
+    time = now
+    monotonic = now
+    perf_counter = now
+
+###############################################################################
+# Responses
+###############################################################################
+class ReplayResponse:
+    def __init__(self, url, payload, status_code=200):
+        self.url = url
+        self.payload = payload
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def json(self):
+        return self.payload
+
+###############################################################################
+# Session
+###############################################################################
+class ReplaySession:
+    def __init__(self, recording, speed=None, call_latency=0.005, commission=0.0):
+        self.rec = recording if isinstance(recording, SessionRecording) else SessionRecording(recording)
+        self.headers = {}
+        self.hooks = {'response': []}
+        self.commission = commission
+        self.lock = threading.RLock()
+
+        responses = self.rec['responses']
+        if not len(responses['seq']):
+            raise ValueError(f"Recording {self.rec.path} is empty")
+        self.ts = np.maximum.accumulate(np.asarray(responses['ts'], dtype=np.float64))
+        self.seqs = np.asarray(responses['seq'])
+        self.endpoint = np.asarray(responses['endpoint'])
+        self.ticker = np.asarray(responses['ticker'])
+        self.end_ts = self.ts[-1]
+        self.clock = ReplayClock(self.ts[0], speed, call_latency)
+
+        # Per (endpoint, ticker) timelines of (ts, seq) for "latest as of T" lookups
+        self.timelines = {}
+        for key in set(zip(self.endpoint.tolist(), self.ticker.tolist())):
+            mask = (self.endpoint == key[0]) & (self.ticker == key[1])
+            self.timelines[key] = (self.ts[mask], self.seqs[mask])
+        self.payload_cache = {}
+
+        self.positions = {}
+        self.cash = 0.0
+        self.orders = {}
+        self.next_order_id = 1
+        self.leases = {}
+        self.next_lease_id = 1
+        self.closed_tenders = set()
+        self.fills = []
+        self.consumed = {}
+        self.decision_latency = []
+        self.last_data_wall = None
+        self.calls = 0
+        self.marked_tick = None
+        self.nlv_history = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+    ###########################################################################
+    # Recording lookups
+    ###########################################################################
+    def _latest_seq(self, endpoint, ticker=-1):
+        timeline = self.timelines.get((ENDPOINTS[endpoint], ticker))
+        if timeline is None:
+            return None
+        ts, seqs = timeline
+        i = np.searchsorted(ts, self.clock.now(), 'right') - 1
+        return int(seqs[max(i, 0)])
+
+    def _cached(self, key, build):
+        payload = self.payload_cache.get(key)
+        if payload is None:
+            payload = self.payload_cache[key] = build()
+        return payload
+
+    def _case(self):
+        seq = self._latest_seq('/v1/case')
+        if seq is None:
+            return None
+        def build():
+            case = self.rec['case']
+            i = self.rec.rows('case', seq).start
+            return {'period': int(case['period'][i]), 'tick': int(case['tick'][i]),
+                    'ticks_per_period': int(case['ticks_per_period'][i]),
+                    'total_periods': int(case['total_periods'][i]),
+                    'status': CASE_STATUS_NAMES.get(int(case['status'][i]), 'ACTIVE')}
+        return self._cached(('case', seq), build)
+
+    def _securities(self):
+        seq = self._latest_seq('/v1/securities')
+        if seq is None:
+            return []
+        def build():
+            sec = self.rec['securities']
+            rows = self.rec.rows('securities', seq)
+            out = []
+            for i in range(rows.start, rows.stop):
+                item = {'ticker': self.rec.tickers[sec['ticker'][i]]}
+                for f in SECURITY_FIELDS:
+                    item[f] = float(sec[f][i])
+                out.append(item)
+            return out
+        payload = self._cached(('securities', seq), build)
+        return [dict(item, position=self.positions.get(item['ticker'], 0)) for item in payload]
+
+    def _book(self, ticker):
+        tid = self.rec.ticker_ids.get(ticker)
+        seq = self._latest_seq('/v1/securities/book', tid) if tid is not None else None
+        if seq is None:
+            return {'bids': [], 'asks': []}, None
+        def build():
+            book = self.rec['book']
+            rows = self.rec.rows('book', seq)
+            out = {'bids': [], 'asks': []}
+            for i in range(rows.start, rows.stop):
+                side = 'bids' if book['side'][i] > 0 else 'asks'
+                out[side].append({'order_id': int(book['order_id'][i]), 'ticker': ticker,
+                                  'action': 'BUY' if side == 'bids' else 'SELL',
+                                  'price': float(book['price'][i]), 'quantity': float(book['quantity'][i]),
+                                  'quantity_filled': float(book['quantity_filled'][i])})
+            return out
+        return self._cached(('book', seq), build), seq
+
+    def _news(self):
+        seq = self._latest_seq('/v1/news')
+        news = self.rec['news']
+        n = np.searchsorted(news['seq'], seq, 'right') if seq is not None else 0
+        return [{'news_id': int(news['news_id'][i]), 'period': int(news['period'][i]),
+                 'tick': int(news['tick'][i]),
+                 'ticker': self.rec.tickers[news['ticker'][i]] if news['ticker'][i] >= 0 else '',
+                 'headline': news['headline'][i].decode(), 'body': news['body'][i].decode()}
+                for i in range(n - 1, -1, -1)]
+
+    def _tenders(self):
+        seq = self._latest_seq('/v1/tenders')
+        if seq is None:
+            return []
+        tenders = self.rec['tenders']
+        rows = self.rec.rows('tenders', seq)
+        return [{'tender_id': int(tenders['tender_id'][i]), 'period': int(tenders['period'][i]),
+                 'tick': int(tenders['tick'][i]), 'expires': int(tenders['expires'][i]),
+                 'ticker': self.rec.tickers[tenders['ticker'][i]],
+                 'action': 'BUY' if tenders['action'][i] > 0 else 'SELL',
+                 'quantity': float(tenders['quantity'][i]), 'price': float(tenders['price'][i]),
+                 'is_fixed_bid': bool(tenders['is_fixed_bid'][i])}
+                for i in range(rows.start, rows.stop)
+                if int(tenders['tender_id'][i]) not in self.closed_tenders]
+
+    def _last_price(self, ticker):
+        for sec in self._securities():
+            if sec['ticker'] == ticker:
+                return sec['last']
+        return None
+
+    ###########################################################################
+    # Fill model
+    ###########################################################################
+    def _fill(self, order, qty, price):
+        sign = 1 if order['action'] == 'BUY' else -1
+        order['quantity_filled'] += qty
+        order['vwap'] = price if not order.get('vwap') else \
+            (order['vwap'] * (order['quantity_filled'] - qty) + price * qty) / order['quantity_filled']
+        self.positions[order['ticker']] = self.positions.get(order['ticker'], 0) + sign * qty
+        self.cash -= sign * qty * price + self.commission * qty
+        self.fills.append((self.clock.now(), order['order_id'], order['ticker'], order['action'], qty, price))
+        if order['quantity_filled'] >= order['quantity']:
+            order['status'] = 'TRANSACTED'
+
+    def _match(self, order, book, book_seq):
+        """Fill what the current book allows. Each order sees each snapshot once."""
+        if book_seq is not None and order.get('matched_seq') == book_seq:
+            return
+        order['matched_seq'] = book_seq
+        side = 'asks' if order['action'] == 'BUY' else 'bids'
+        levels = book[side]
+        remaining = order['quantity'] - order['quantity_filled']
+
+        if not levels and order['type'] == 'MARKET':
+            price = self._last_price(order['ticker'])
+            if price:
+                self._fill(order, remaining, price)
+            return
+
+        for i, level in enumerate(levels):
+            if remaining <= 0:
+                break
+            if order['type'] == 'LIMIT':
+                crosses = level['price'] <= order['price'] if order['action'] == 'BUY' else level['price'] >= order['price']
+                if not crosses:
+                    break
+            # Liquidity taken from a snapshot stays taken for later orders on it
+            key = (book_seq, side, i)
+            qty = min(remaining, level['quantity'] - level['quantity_filled'] - self.consumed.get(key, 0))
+            if qty <= 0:
+                continue
+            self.consumed[key] = self.consumed.get(key, 0) + qty
+            price = level['price'] if order['type'] == 'MARKET' or order.get('aggressive') else order['price']
+            self._fill(order, qty, price)
+            remaining -= qty
+
+    def _match_resting(self):
+        books = {}
+        for order in self.orders.values():
+            if order['status'] != 'OPEN':
+                continue
+            if order['ticker'] not in books:
+                books[order['ticker']] = self._book(order['ticker'])
+            self._match(order, *books[order['ticker']])
+
+    ###########################################################################
+    # requests.Session interface
+    ###########################################################################
+    def _respond(self, url, payload, status=200):
+        resp = ReplayResponse(url, payload, status)
+        for hook in self.hooks['response']:
+            hook(resp)
+        return resp
+
+    def get(self, url, params=None, **kwargs):
+        params = params or {}
+        path = urlsplit(url).path
+        with self.lock:
+            self.calls += 1
+            self.clock.api_call()
+            if self.clock.now() > self.end_ts:
+                raise ReplayFinished()
+            self._match_resting()
+
+            if path == '/v1/case':
+                payload = self._case()
+                if payload and (payload['period'], payload['tick']) != self.marked_tick:
+                    self.marked_tick = (payload['period'], payload['tick'])
+                    self.nlv_history.append(self.nlv())
+            elif path == '/v1/securities':
+                payload = self._securities()
+                if 'ticker' in params:
+                    payload = [x for x in payload if x['ticker'] == params['ticker']]
+            elif path == '/v1/securities/book':
+                payload = self._book(params.get('ticker'))[0]
+            elif path == '/v1/news':
+                payload = self._news()
+            elif path == '/v1/tenders':
+                payload = self._tenders()
+            elif path == '/v1/orders':
+                status = params.get('status', 'OPEN')
+                payload = [dict(o) for o in sorted(self.orders.values(), key=lambda o: o['order_id'])
+                           if o['status'] == status]
+            elif path.startswith('/v1/orders/'):
+                order = self.orders.get(int(path.rsplit('/', 1)[1]))
+                payload = dict(order) if order else None
+            elif path == '/v1/leases':
+                payload = [dict(l) for l in self.leases.values()
+                           if 'ticker' not in params or l['ticker'] == params['ticker']]
+            else:
+                return self._respond(url, {'code': 'NOT_FOUND'}, 404)
+
+            if payload is None:
+                return self._respond(url, {'code': 'NOT_FOUND'}, 404)
+            self.last_data_wall = time.perf_counter()
+            return self._respond(url, payload)
+
+    def post(self, url, params=None, **kwargs):
+        params = params or {}
+        path = urlsplit(url).path
+        parts = path.strip('/').split('/')
+        with self.lock:
+            self.calls += 1
+            self.clock.api_call()
+
+            if path == '/v1/orders':
+                if self.last_data_wall is not None:
+                    self.decision_latency.append(time.perf_counter() - self.last_data_wall)
+                order = {'order_id': self.next_order_id, 'ticker': params['ticker'],
+                         'type': params.get('type', 'MARKET'), 'action': params['action'],
+                         'quantity': float(params['quantity']), 'price': float(params.get('price') or 0),
+                         'quantity_filled': 0.0, 'vwap': None, 'status': 'OPEN',
+                         'tick': (self._case() or {}).get('tick', 0)}
+                self.next_order_id += 1
+                self.orders[order['order_id']] = order
+                order['aggressive'] = True
+                self._match(order, *self._book(order['ticker']))
+                order['aggressive'] = False
+                if order['type'] == 'MARKET' and order['status'] == 'OPEN':
+                    order['status'] = 'CANCELLED'
+                return self._respond(url, dict(order))
+
+            if path == '/v1/commands/cancel':
+                ids = {int(x) for x in str(params.get('ids', '')).split(',') if x}
+                cancelled = []
+                for order in self.orders.values():
+                    if order['status'] != 'OPEN':
+                        continue
+                    if params.get('all') or order['order_id'] in ids or order['ticker'] == params.get('ticker'):
+                        order['status'] = 'CANCELLED'
+                        cancelled.append(order['order_id'])
+                return self._respond(url, {'cancelled_order_ids': cancelled})
+
+            if parts[:2] == ['v1', 'tenders'] and len(parts) == 3:
+                tender_id = int(parts[2])
+                for tender in self._tenders():
+                    if tender['tender_id'] == tender_id:
+                        sign = 1 if tender['action'] == 'BUY' else -1
+                        self.positions[tender['ticker']] = self.positions.get(tender['ticker'], 0) + sign * tender['quantity']
+                        self.cash -= sign * tender['quantity'] * tender['price']
+                        self.closed_tenders.add(tender_id)
+                        return self._respond(url, {'success': True})
+                return self._respond(url, {'code': 'NOT_FOUND'}, 404)
+
+            if path == '/v1/leases':
+                lease = {'id': self.next_lease_id, 'ticker': params['ticker'], 'containment_usage': 0,
+                         'next_lease_tick': (self._case() or {}).get('tick', 0) + 30}
+                self.next_lease_id += 1
+                self.leases[lease['id']] = lease
+                return self._respond(url, dict(lease))
+
+            if parts[:2] == ['v1', 'leases'] and len(parts) == 3:
+                lease = self.leases.get(int(parts[2]))
+                if lease is None:
+                    return self._respond(url, {'code': 'NOT_FOUND'}, 404)
+                return self._respond(url, dict(lease))
+
+            return self._respond(url, {'code': 'NOT_FOUND'}, 404)
+
+    def delete(self, url, params=None, **kwargs):
+        parts = urlsplit(url).path.strip('/').split('/')
+        with self.lock:
+            self.calls += 1
+            self.clock.api_call()
+            if len(parts) == 3 and parts[:2] == ['v1', 'orders']:
+                order = self.orders.get(int(parts[2]))
+                if order is None or order['status'] != 'OPEN':
+                    return self._respond(url, {'code': 'NOT_FOUND'}, 404)
+                order['status'] = 'CANCELLED'
+                return self._respond(url, {'success': True})
+            if len(parts) == 3 and parts[:2] == ['v1', 'tenders']:
+                self.closed_tenders.add(int(parts[2]))
+                return self._respond(url, {'success': True})
+            if len(parts) == 3 and parts[:2] == ['v1', 'leases']:
+                if self.leases.pop(int(parts[2]), None) is None:
+                    return self._respond(url, {'code': 'NOT_FOUND'}, 404)
+                return self._respond(url, {'success': True})
+            return self._respond(url, {'code': 'NOT_FOUND'}, 404)
+
+    ###########################################################################
+    # Results
+    ###########################################################################
+    def mark_price(self, ticker):
+        book, _ = self._book(ticker)
+        if book['bids'] and book['asks']:
+            return (book['bids'][0]['price'] + book['asks'][0]['price']) / 2
+        return self._last_price(ticker)
+
+    def nlv(self):
+        return self.cash + sum(qty * (self.mark_price(t) or 0.0) for t, qty in self.positions.items())
+
+    def report(self):
+        with self.lock:
+            self.clock.virtual = min(self.clock.now(), self.end_ts)
+            pnl = self.nlv()
+            peak, drawdown = float('-inf'), 0.0
+            for value in self.nlv_history + [pnl]:
+                peak = max(peak, value)
+                drawdown = max(drawdown, peak - value)
+            latency = sorted(self.decision_latency)
+            return {
+                'api_calls': self.calls,
+                'orders': len(self.orders),
+                'fills': len(self.fills),
+                'volume': sum(f[4] for f in self.fills),
+                'positions': {t: q for t, q in self.positions.items() if q},
+                'pnl': pnl,
+                'max_drawdown': drawdown,
+                'decision_latency_p50': statistics.median(latency) if latency else None,
+                'decision_latency_p99': latency[min(len(latency) - 1, math.ceil(0.99 * len(latency)) - 1)] if latency else None,
+                'virtual_seconds': self.clock.now() - self.clock.start
+            }
+
+###############################################################################
+# Engine harness
+###############################################################################
+def _load_script(path, name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _patch(module, session):
+    module.requests = SimpleNamespace(Session=lambda: session)
+    if hasattr(module, 'RECORD_DIR'):
+        module.RECORD_DIR = None
+    if hasattr(module, 'LATENCY_STATS'):
+        module.LATENCY_STATS = False
+    if hasattr(module, 'LOG_DIR'):
+        module.LOG_DIR = None
+    if hasattr(module, 'MARKET_DATA_HUB'):
+        module.MARKET_DATA_HUB = None
+    if hasattr(module, 'time'):
+        module.time = session.clock
+    if hasattr(module, 'sleep'):
+        module.sleep = session.clock.sleep
+
+def set_param(module, path, value):
+    """Set a module constant, or an entry inside one ('TICKER_CONFIG.CNR.IMPROVE')."""
+    attr, *keys = path.split('.')
+    if not keys:
+        setattr(module, attr, value)
+        return
+    target = getattr(module, attr)
+    for key in keys[:-1]:
+        target = target[key]
+    target[keys[-1]] = value
+
+def apply_params(params, module=None):
+    """
+    Override engine parameters. For a script engine paths are relative to the
+    script module; for the commodities engine they start with the module name
+    ('transport.AK_CL_MIN_PROFIT').
+    """
+    for path, value in (params or {}).items():
+        if module is None:
+            name, path = path.split('.', 1)
+            set_param(sys.modules[name], path, value)
+        else:
+            set_param(module, path, value)
+
+def fresh_commodities():
+    """Drop any loaded Commodities modules so the next import starts clean."""
+    folder = os.path.join(ROOT, 'Commodities')
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+    for name in COMMODITIES_MODULES:
+        sys.modules.pop(name, None)
+
+def load_engine(engine, session, params=None):
+    """
+    Fresh copy of an engine with its HTTP session, clock and recorder pointed at
+    the replay. Returns a zero-argument callable that runs the engine.
+    """
+    if engine == 'commodities':
+        fresh_commodities()
+        import helpers, master, refinery
+        _patch(helpers, session)
+        master.time = session.clock
+        refinery.time = session.clock
+        apply_params(params)
+        return lambda: master.MasterController('REPLAY', 0.1).run()
+
+    module = _load_script(ENGINES[engine], f"replay_{engine}_{id(session)}")
+    _patch(module, session)
+    apply_params(params, module)
+    return module.main
+
+def run_replay(recording, engine, speed=None, call_latency=0.005, commission=0.0, params=None):
+    session = ReplaySession(recording, speed, call_latency, commission)
+    run = load_engine(engine, session, params)
+    error = None
+    started = time.perf_counter()
+    try:
+        run()
+    except ReplayFinished:
+        pass
+    except Exception:
+        error = traceback.format_exc()
+    result = session.report()
+    result['engine'] = engine
+    result['wall_seconds'] = time.perf_counter() - started
+    result['error'] = error
+    return result
+
+def _parse_speed(value):
+    if value in ('max', 'afap'):
+        return None
+    if value in ('realtime', 'real'):
+        return 1.0
+    return float(value.rstrip('x'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session through an engine")
+    parser.add_argument('recording')
+    parser.add_argument('engine', choices=sorted(ENGINES))
+    parser.add_argument('--speed', default='max', help="'max', 'realtime' or a multiplier such as 4x")
+    parser.add_argument('--latency', type=float, default=0.005, help="virtual seconds per API call")
+    parser.add_argument('--commission', type=float, default=0.0)
+    args = parser.parse_args()
+
+    result = run_replay(args.recording, args.engine, _parse_speed(args.speed), args.latency, args.commission)
+    for key, value in result.items():
+        if key != 'error':
+            print(f"{key:>22}: {value}")
+    if result['error']:
+        print(result['error'])
+
+if __name__ == '__main__':
+    main()
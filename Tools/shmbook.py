@@ -0,0 +1,182 @@
+# shmbook.py
+#
+# Order-book snapshots in shared memory, for fanning one feed out to several
+# strategy processes on the same box without JSON or pickling. A
+# BookRingWriter (normally the market-data hub, mdhub.py --shm) owns one
+# shared-memory block laid out as a NumPy structured array with one record
+# per ticker:
+#
+#   latest            number of snapshots written for the ticker
+#   seq[slots]        seqlock counter per slot, odd while the slot is written
+#   ts[slots]         writer time.time() of each snapshot
+#   n_bids, n_asks    levels used in each slot
+#   levels[slots, 2 * depth]   (price, quantity, side, level); bids then asks
+#
+# Snapshots go round-robin through `slots` slots, so a reader holding a view
+# of the newest one has `slots - 1` further writes before it is overwritten.
+# Readers attach by name and either take a zero-copy view (check it with
+# still_valid() after use) or a consistent copy via the usual seqlock retry.
+#
+#   ring = BookRingReader('rit-books')
+#   version, levels = ring.view('CRZY_M')
+#   bid, ask = ring.top('CRZY_M')
+
+import atexit
+import json
+import struct
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from recorder import SIDES
+
+LEVEL = np.dtype([('price', '<f8'), ('quantity', '<f8'), ('side', 'i1'), ('level', '<i2')])
+
+META_SIZE = 4096          # JSON layout header at the start of the block
+DEPTH = 20
+SLOTS = 8
+RETRIES = 100
+
+def _ticker_dtype(depth, slots):
+    return np.dtype([('latest', '<u8'), ('seq', '<u8', (slots,)), ('ts', '<f8', (slots,)),
+                     ('n_bids', '<i4', (slots,)), ('n_asks', '<i4', (slots,)),
+                     ('levels', LEVEL, (slots, 2 * depth))])
+
+class StaleSnapshot(Exception):
+    pass
+
+class BookRingWriter:
+    def __init__(self, name, tickers, depth=DEPTH, slots=SLOTS):
+        self.name = name
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.depth = depth
+        self.slots = slots
+        dtype = _ticker_dtype(depth, slots)
+
+        meta = json.dumps({'tickers': self.tickers, 'depth': depth, 'slots': slots}).encode()
+        if len(meta) + 4 > META_SIZE:
+            raise ValueError("Too many tickers for the shared-memory header")
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=META_SIZE + dtype.itemsize * len(self.tickers))
+        self.shm.buf[:4 + len(meta)] = struct.pack('<I', len(meta)) + meta
+        self.books = np.ndarray((len(self.tickers),), dtype=dtype, buffer=self.shm.buf, offset=META_SIZE)
+        self.books[:] = np.zeros((), dtype=dtype)
+        self.closed = False
+        atexit.register(self.close)
+
+    def write(self, ticker, book):
+        """Publish a /securities/book payload ({'bids': [...], 'asks': [...]})."""
+        rec = self.books[self.index[ticker]]
+        bids = book['bids'][:self.depth]
+        asks = book['asks'][:self.depth]
+        slot = int(rec['latest']) % self.slots
+        levels = rec['levels'][slot]
+        n_bids, n_asks = len(bids), len(asks)
+
+        rec['seq'][slot] += 1                   # odd: slot is being written
+        levels['price'][:n_bids] = [l['price'] for l in bids]
+        levels['quantity'][:n_bids] = [l['quantity'] - l.get('quantity_filled', 0) for l in bids]
+        levels['side'][:n_bids] = SIDES['bids']
+        levels['level'][:n_bids] = np.arange(n_bids)
+        levels['price'][n_bids:n_bids + n_asks] = [l['price'] for l in asks]
+        levels['quantity'][n_bids:n_bids + n_asks] = [l['quantity'] - l.get('quantity_filled', 0) for l in asks]
+        levels['side'][n_bids:n_bids + n_asks] = SIDES['asks']
+        levels['level'][n_bids:n_bids + n_asks] = np.arange(n_asks)
+        rec['n_bids'][slot] = n_bids
+        rec['n_asks'][slot] = n_asks
+        rec['ts'][slot] = time.time()
+        rec['seq'][slot] += 1                   # even: slot is consistent
+        rec['latest'] += 1
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.books = None
+        self.shm.close()
+        self.shm.unlink()
+
+class BookRingReader:
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the writer's block at exit (CPython < 3.13)
+        try:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        except Exception:
+            pass
+        (size,) = struct.unpack('<I', bytes(self.shm.buf[:4]))
+        meta = json.loads(bytes(self.shm.buf[4:4 + size]))
+        self.tickers = meta['tickers']
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.depth = meta['depth']
+        self.slots = meta['slots']
+        dtype = _ticker_dtype(self.depth, self.slots)
+        self.books = np.ndarray((len(self.tickers),), dtype=dtype, buffer=self.shm.buf, offset=META_SIZE)
+
+    def _newest(self, rec):
+        latest = int(rec['latest'])
+        if not latest:
+            raise StaleSnapshot("No snapshot written yet")
+        return (latest - 1) % self.slots
+
+    def view(self, ticker):
+        """
+        (version, levels) for the newest snapshot, where levels is a view into
+        shared memory (bids then asks). Pass version to still_valid() once done.
+        """
+        rec = self.books[self.index[ticker]]
+        for _ in range(RETRIES):
+            slot = self._newest(rec)
+            seq = int(rec['seq'][slot])
+            if seq & 1:
+                continue
+            n = int(rec['n_bids'][slot]) + int(rec['n_asks'][slot])
+            return (slot, seq), rec['levels'][slot][:n]
+        raise StaleSnapshot(f"Could not read a stable snapshot of {ticker}")
+
+    def still_valid(self, ticker, version):
+        slot, seq = version
+        return int(self.books[self.index[ticker]]['seq'][slot]) == seq
+
+    def read(self, ticker):
+        """Consistent copy of the newest snapshot: (ts, bids, asks) structured arrays."""
+        rec = self.books[self.index[ticker]]
+        for _ in range(RETRIES):
+            slot = self._newest(rec)
+            seq = int(rec['seq'][slot])
+            if seq & 1:
+                continue
+            n_bids = int(rec['n_bids'][slot])
+            n_asks = int(rec['n_asks'][slot])
+            levels = rec['levels'][slot][:n_bids + n_asks].copy()
+            ts = float(rec['ts'][slot])
+            if int(rec['seq'][slot]) == seq:
+                return ts, levels[:n_bids], levels[n_bids:]
+        raise StaleSnapshot(f"Could not read a stable snapshot of {ticker}")
+
+    def top(self, ticker):
+        """Best bid and ask prices of the newest snapshot (nan for an empty side)."""
+        rec = self.books[self.index[ticker]]
+        for _ in range(RETRIES):
+            slot = self._newest(rec)
+            seq = int(rec['seq'][slot])
+            if seq & 1:
+                continue
+            n_bids = int(rec['n_bids'][slot])
+            n_asks = int(rec['n_asks'][slot])
+            levels = rec['levels'][slot]
+            bid = float(levels['price'][0]) if n_bids else float('nan')
+            ask = float(levels['price'][n_bids]) if n_asks else float('nan')
+            if int(rec['seq'][slot]) == seq:
+                return bid, ask
+        raise StaleSnapshot(f"Could not read a stable snapshot of {ticker}")
+
+    def age(self, ticker):
+        """Seconds since the newest snapshot of ticker was written."""
+        rec = self.books[self.index[ticker]]
+        return time.time() - float(rec['ts'][self._newest(rec)])
+
+    def close(self):
+        self.books = None
+        self.shm.close()
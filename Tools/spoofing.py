@@ -0,0 +1,124 @@
+# spoofing.py
+#
+# Spoofing detector over full-depth books. Every update compares each price
+# level with the previous snapshot:
+#
+#   - a level that grows by more than `threshold` shares opens an event,
+#     remembered for `window` ticks
+#   - if at least half of that added size is withdrawn within those ticks,
+#     while the price is still inside the book (so it was pulled, not traded
+#     through), the event counts as a spoof on that side
+#
+# Every update scans all levels on both sides, and the pending events on a
+# side are checked whenever any are open, so an update costs
+# O(levels + open events). The timing wheel of `window + 2` tick buckets
+# only makes expiry cheap: the events that time out are dropped without a
+# scan for them. Each side also carries a suspicion score that decays by
+# half every `halflife` ticks and adds 1 per spoof.
+#
+#   detector = SpoofDetector(threshold=20000, window=2)
+#   new = detector.update(book, tick)        # spoofs found by this update
+#   detector.score('bids'), detector.suspects['asks']
+
+THRESHOLD = 20000         # shares added at one level to open an event
+WINDOW = 2                # ticks an event stays open
+HALFLIFE = 5              # ticks for the suspicion score to halve
+SIDES = ('bids', 'asks')
+
+class SpoofEvent:
+    __slots__ = ('side', 'price', 'base', 'peak', 'tick', 'open')
+
+    def __init__(self, side, price, base, peak, tick):
+        self.side = side
+        self.price = price
+        self.base = base          # size at the level before the addition
+        self.peak = peak          # size right after it
+        self.tick = tick
+        self.open = True
+
+class SpoofDetector:
+    def __init__(self, threshold=THRESHOLD, window=WINDOW, halflife=HALFLIFE):
+        self.threshold = threshold
+        self.window = window
+        self.decay = 0.5 ** (1 / halflife)
+        self.wheel = [[] for _ in range(window + 2)]
+        self.pending = {side: {} for side in SIDES}       # price -> open SpoofEvent
+        self.levels = {side: None for side in SIDES}      # price -> size, last snapshot
+        self.scores = {side: 0.0 for side in SIDES}
+        self.suspects = {side: 0 for side in SIDES}
+        self.tick = None
+
+    def _advance(self, tick):
+        if self.tick is None:
+            self.tick = tick
+            return
+        steps = tick - self.tick
+        if steps <= 0:
+            return
+        for side in SIDES:
+            self.scores[side] *= self.decay ** steps
+        size = len(self.wheel)
+        for t in range(self.tick + 1, self.tick + 1 + min(steps, size)):
+            bucket = self.wheel[t % size]
+            for evt in bucket:
+                if evt.open:
+                    evt.open = False
+                    del self.pending[evt.side][evt.price]
+            bucket.clear()
+        self.tick = tick
+
+    def _side(self, side, prices, sizes, tick):
+        levels = dict(zip(prices, sizes))
+        last = self.levels[side]
+        self.levels[side] = levels
+        if last is None:
+            return 0
+        pending = self.pending[side]
+        found = 0
+
+        # Withdrawals before additions, so a new event is never checked
+        # against the snapshot that opened it
+        if pending:
+            touch = prices[0] if prices else None
+            closed = []
+            for price, evt in pending.items():
+                now = levels.get(price, 0)
+                if now > evt.base + (evt.peak - evt.base) / 2:
+                    continue
+                closed.append(evt)
+                inside = touch is not None and (price <= touch if side == 'bids' else price >= touch)
+                if inside:
+                    found += 1
+            for evt in closed:
+                evt.open = False
+                del pending[evt.price]
+
+        threshold = self.threshold
+        for price, size in levels.items():
+            before = last.get(price, 0)
+            if size - before > threshold:
+                old = pending.get(price)
+                if old is not None:
+                    old.open = False
+                evt = pending[price] = SpoofEvent(side, price, before, size, tick)
+                self.wheel[(tick + self.window + 1) % len(self.wheel)].append(evt)
+        return found
+
+    def update(self, book, tick):
+        """Fold in an OrderBook/Book snapshot at tick; returns the spoofs found."""
+        self._advance(tick)
+        found = 0
+        for side, prices, sizes in (('bids', book.bid_prices, book.bid_sizes),
+                                    ('asks', book.ask_prices, book.ask_sizes)):
+            n = self._side(side, prices, sizes, tick)
+            if n:
+                self.scores[side] += n
+                self.suspects[side] += n
+                found += n
+        return found
+
+    def score(self, side):
+        return self.scores[side]
+
+    def in_flight(self):
+        return len(self.pending['bids']) + len(self.pending['asks'])
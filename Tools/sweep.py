@@ -0,0 +1,222 @@
+# sweep.py
+#
+# Parallel parameter sweeps over simulated sessions. A sweep spec (JSON) names
+# an engine, the sessions to evaluate each parameter set on, and a search
+# space of engine parameters:
+#
+#   {
+#     "engine": "commodities",            # or any replay.ENGINES entry
+#     "sessions": [0, 1, 2, 3],           # backtest seeds, or recording paths
+#     "search": "grid",                   # "grid", "random" or "refine"
+#     "samples": 40, "rounds": 3, "seed": 0,
+#     "params": {
+#       "transport.AK_CL_MIN_PROFIT": [0.3, 0.4, 0.5],
+#       "transport.CL_NYC_MIN_PROFIT": {"min": 0.4, "max": 0.8}
+#     }
+#   }
+#
+# Commodities sessions run on the COM5 backtester; every other engine is
+# replayed against recordings with replay.run_replay. Parameter paths follow
+# replay.apply_params ('BASE_CROSS', 'TICKER_CONFIG.CNR.IMPROVE',
+# 'hedge_manager.HEDGE_BUCKETS').
+#
+# Every finished (parameter set, session) run is appended to <out>.jsonl as it
+# completes, so an interrupted sweep picks up where it left off when re-run
+# with the same spec. The aggregated table is written to <out>.csv.
+#
+# Usage:
+#   python Tools/sweep.py sweep.json --out sweeps/transport --workers 8
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import traceback
+from multiprocessing import Pool
+
+import replay
+
+METRICS = ['pnl', 'max_drawdown', 'orders', 'fills', 'volume', 'rejected']
+
+###############################################################################
+# Search spaces
+###############################################################################
+def _is_range(space):
+    return isinstance(space, dict) and 'min' in space and 'max' in space
+
+def _sample(space, rng):
+    if _is_range(space):
+        lo, hi = space['min'], space['max']
+        if isinstance(lo, int) and isinstance(hi, int):
+            return rng.randint(lo, hi)
+        return rng.uniform(lo, hi)
+    return rng.choice(space)
+
+def _perturb(space, value, rng, scale):
+    """Sample near value: a nudge inside a range, or a neighbouring choice."""
+    if _is_range(space):
+        lo, hi = space['min'], space['max']
+        new = min(max(value + rng.gauss(0, scale * (hi - lo)), lo), hi)
+        return round(new) if isinstance(lo, int) and isinstance(hi, int) else new
+    i = space.index(value) + rng.choice([-1, 0, 1])
+    return space[min(max(i, 0), len(space) - 1)]
+
+def grid(params):
+    names = sorted(params)
+    for space in params.values():
+        if _is_range(space):
+            raise ValueError("grid search needs explicit value lists, not min/max ranges")
+    for values in itertools.product(*(params[n] for n in names)):
+        yield dict(zip(names, values))
+
+def random_search(params, samples, rng):
+    for _ in range(samples):
+        yield {name: _sample(space, rng) for name, space in sorted(params.items())}
+
+def refine(params, best, samples, rng, scale):
+    """Next round of candidates clustered around the best parameter sets so far."""
+    for i in range(samples):
+        center = best[i % len(best)]
+        yield {name: _perturb(space, center[name], rng, scale) for name, space in sorted(params.items())}
+
+###############################################################################
+# Workers
+###############################################################################
+def run_task(task):
+    engine, session, params = task['engine'], task['session'], task['params']
+    try:
+        if engine == 'commodities':
+            replay.fresh_commodities()
+            import backtest
+            replay.apply_params(params)
+            result = backtest.run_session(seed=session)
+        else:
+            result = replay.run_replay(session, engine, params=params)
+            if result.get('error'):
+                raise RuntimeError(result['error'])
+    except Exception:
+        return dict(task, error=traceback.format_exc())
+    return dict(task, **{m: result[m] for m in METRICS if m in result})
+
+def task_key(params, session):
+    return json.dumps([params, session], sort_keys=True)
+
+###############################################################################
+# Checkpointed sweep
+###############################################################################
+class Sweep:
+    def __init__(self, spec, out, workers=None):
+        self.spec = spec
+        self.out = out
+        self.workers = workers or os.cpu_count()
+        self.checkpoint = out + '.jsonl'
+        self.results = {}
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as fh:
+                for line in fh:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue  # partial line from an interrupted write
+                    self.results[task_key(row['params'], row['session'])] = row
+            print(f"Resuming: {len(self.results)} runs already in {self.checkpoint}")
+
+    def _run(self, candidates):
+        tasks = []
+        for params in candidates:
+            for session in self.spec['sessions']:
+                if task_key(params, session) not in self.results:
+                    tasks.append({'engine': self.spec['engine'], 'session': session, 'params': params})
+        if not tasks:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint)), exist_ok=True)
+        with open(self.checkpoint, 'a') as fh, Pool(self.workers) as pool:
+            for i, row in enumerate(pool.imap_unordered(run_task, tasks), 1):
+                self.results[task_key(row['params'], row['session'])] = row
+                fh.write(json.dumps(row) + '\n')
+                fh.flush()
+                status = 'ERROR' if row.get('error') else f"pnl {row.get('pnl', 0):,.2f}"
+                print(f"[{i}/{len(tasks)}] {row['params']} session {row['session']}: {status}")
+
+    def run(self):
+        spec = self.spec
+        rng = random.Random(spec.get('seed', 0))
+        search = spec.get('search', 'grid')
+        samples = spec.get('samples', 20)
+
+        if search == 'grid':
+            self._run(list(grid(spec['params'])))
+        elif search == 'random':
+            self._run(list(random_search(spec['params'], samples, rng)))
+        elif search == 'refine':
+            # Random first round, then each round samples around the current top
+            # quartile with a shrinking step -- a cheap stand-in for Bayesian search
+            candidates = list(random_search(spec['params'], samples, rng))
+            for round_no in range(spec.get('rounds', 3)):
+                self._run(candidates)
+                top = [json.loads(r['params']) for r in self.table()[:max(1, samples // 4)]]
+                candidates = list(refine(spec['params'], top, samples, rng, 0.2 / (round_no + 1)))
+        else:
+            raise ValueError(f"Unknown search '{search}'")
+
+        table = self.table()
+        self.write_csv(table)
+        return table
+
+    def table(self):
+        """One row per parameter set, aggregated over its sessions, best mean P&L first."""
+        groups = {}
+        for row in self.results.values():
+            groups.setdefault(json.dumps(row['params'], sort_keys=True), []).append(row)
+
+        table = []
+        for params, rows in groups.items():
+            ok = [r for r in rows if not r.get('error')]
+            entry = {'params': params, 'sessions': len(ok), 'errors': len(rows) - len(ok)}
+            for metric in METRICS:
+                values = [r[metric] for r in ok if metric in r]
+                if values:
+                    entry[f"mean_{metric}"] = statistics.mean(values)
+            pnls = [r['pnl'] for r in ok if 'pnl' in r]
+            if pnls:
+                entry['std_pnl'] = statistics.pstdev(pnls)
+                entry['worst_pnl'] = min(pnls)
+            table.append(entry)
+        table.sort(key=lambda e: e.get('mean_pnl', -math.inf), reverse=True)
+        return table
+
+    def write_csv(self, table):
+        columns = []
+        for entry in table:
+            columns += [c for c in entry if c not in columns]
+        with open(self.out + '.csv', 'w', newline='') as fh:
+            writer = csv.DictWriter(fh, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over simulated sessions")
+    parser.add_argument('spec', help="JSON sweep spec")
+    parser.add_argument('--out', default=None, help="output prefix (default: next to the spec)")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.spec) as fh:
+        spec = json.load(fh)
+    out = args.out or os.path.splitext(args.spec)[0]
+
+    table = Sweep(spec, out, args.workers).run()
+    print(f"\nTop {min(args.top, len(table))} of {len(table)} parameter sets ({out}.csv):")
+    for entry in table[:args.top]:
+        print(f"  mean pnl {entry.get('mean_pnl', float('nan')):>14,.2f}  "
+              f"std {entry.get('std_pnl', float('nan')):>12,.2f}  "
+              f"dd {entry.get('mean_max_drawdown', float('nan')):>12,.2f}  {entry['params']}")
+
+if __name__ == '__main__':
+    main()